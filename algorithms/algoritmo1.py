@@ -11,7 +11,6 @@
 ##################################################################################################################
 
 import os
-import math
 import time as tiempo
 from datetime import datetime
 import logging
@@ -25,9 +24,24 @@ import googlemaps
 from googlemaps.convert import decode_polyline
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
 from sklearn.cluster import AgglomerativeClustering
+from sklearn.neighbors import BallTree
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 import folium
 from streamlit_folium import st_folium
 
+from core.geodesia import R_TIERRA_M, haversine_metros, matriz_haversine, matrices_distancia_duracion
+from core.almacen_tiempos import AlmacenTiempos, CACHE_DIR
+from core.matriz_google import LimitadorTokens
+from core.backends_viaje import crear_backend
+from core.matriz_incremental import MatrizIncremental
+from core.sitios import ajustar_por_radio, nodos_por_sitio
+from core.perfiles_tiempo import PerfilTiempos, construir_perfil
+from algorithms.vecindario import construir_vecinos, arcos_a_pedir, UMBRAL_VECINOS
+from algorithms.transitos import matriz_transito, vector_demandas
+from algorithms.flota import TIPO_BASE, nodos_de_flota, nodos_base, vehiculos_de
+from algorithms.progreso import aviso_mejoras
+
 # -------------------- INICIALIZAR FIREBASE --------------------
 ## Usa el JSON de servicio: 'lavanderia_key.json'
 #if not firebase_admin._apps:
@@ -39,13 +53,38 @@ db = firestore.client()
 GOOGLE_MAPS_API_KEY = st.secrets.get("google_maps", {}).get("api_key") or os.getenv("GOOGLE_MAPS_API_KEY")
 gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
 
+# Distancias/duraciones por par, persistentes entre reruns y días
+almacen_tiempos = AlmacenTiempos()
+# Limitador compartido por todas las descargas de este proceso
+limitador_google = LimitadorTokens()
+
+# Backend de tiempos de viaje: BACKEND_VIAJE = google | osm | haversine
+#   (por defecto google si hay clave, si no haversine; osm requiere OSM_RED_PATH)
+backend_viaje = crear_backend(
+    os.getenv("BACKEND_VIAJE") or ("google" if GOOGLE_MAPS_API_KEY else "haversine"),
+    cliente=gmaps,
+    almacen=almacen_tiempos,
+    limitador=limitador_google,
+    ruta_osm=os.getenv("OSM_RED_PATH")
+)
+
 
 # -------------------- CONSTANTES VRP --------------------
 SERVICE_TIME    = 8 * 60        # 10 minutos de servicio en cada parada (excepto depósito)
-MAX_ELEMENTS    = 100            # límite de celdas por petición Distance Matrix API
 SHIFT_START_SEC =  8 * 3600 + 30*60    # 09:00 en segundos
 SHIFT_END_SEC   = 17*3600 # 16:30 en segundos
 MARGEN = 15 * 60  # 15 minutos en segundos
+SERVICE_EXTRA_SEC = 3 * 60       # servicio adicional por cada pedido extra de un cluster
+DEPOT_SERVICE_ORTOOLS_SEC = 600  # servicio en el depósito usado por el modelo OR-Tools
+RADIO_SITIO_M   = 5              # pedidos a menos de 5 m se consultan como un solo sitio
+VEL_ESTIMADA_KMH = 20            # arcos no pedidos (modo disperso): línea recta a 20 km/h...
+FACTOR_RODEO     = 1.5           # ...y 50 % de rodeo, para que no resulten atractivos
+USAR_PERFIL_TIEMPOS = os.getenv("PERFIL_TIEMPOS", "0") == "1"   # duraciones por franja horaria
+# Ventanas suaves (OR-Tools, opcional): llegar tarde cuesta COSTO_TARDANZA_SEG por segundo y,
+# si además se permite omitir, una parada imposible queda fuera pagando PENALIDAD_OMITIR
+VENTANAS_SUAVES    = os.getenv("VENTANAS_SUAVES", "0") == "1"
+COSTO_TARDANZA_SEG = 5_000       # > coeficiente del span (1000): no conviene llegar tarde para acortar la jornada
+PENALIDAD_OMITIR   = 10**9       # solo se omite lo que no cabe ni llegando tarde
 
 # ===================== FUNCIONES AUXILIARES =====================
 
@@ -62,66 +101,34 @@ def _hora_a_segundos(hhmm):
         return None
 
 
-def _haversine_dist_dur(coords, vel_kmh=40.0):
+def _bloque_viaje(origenes, destinos, salida=None):
     """
-    Calcula matrices de distancias (en metros) y duraciones (en segundos)
-    basadas en fórmula de Haversine asumiendo velocidad vel_kmh para la duración.
-    coords = [(lat1, lon1), (lat2, lon2), ...]
+    Distancias (m) y duraciones (s) para el bloque origenes × destinos (arrays int32),
+    según el backend de viaje configurado (Google, red OSM local o Haversine).
     """
-    R = 6371e3  # radio terrestre en metros
-    n = len(coords)
-    dist = [[0]*n for _ in range(n)]
-    dur  = [[0]*n for _ in range(n)]
-    v_ms = vel_kmh * 1000 / 3600  # convertir km/h a m/s
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                continue
-            lat1, lon1 = map(math.radians, coords[i])
-            lat2, lon2 = map(math.radians, coords[j])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
-            d = 2 * R * math.asin(math.sqrt(a))
-            dist[i][j] = int(d)
-            dur[i][j]  = int(d / v_ms)
-    return dist, dur
-
-@st.cache_data(ttl=3600, show_spinner=False)
-def _distancia_duracion_matrix(coords):
+    return backend_viaje.bloque(origenes, destinos, salida=salida)
+
+# Matriz del día: al reprogramar/cancelar/agregar pedidos solo se piden las celdas nuevas.
+# Con tráfico (Google) vale solo para la franja horaria en que se pidió.
+matriz_dia = MatrizIncremental(
+    _bloque_viaje,
+    prefijo=os.path.join(CACHE_DIR, f"matriz_dia_{backend_viaje.nombre}"),
+    por_franja=backend_viaje.depende_de_hora
+)
+
+def _crear_data_model(df, vehiculos=1, capacidad_veh=None, radio_sitio_m=RADIO_SITIO_M, flota=None):
     """
-    Llama a la Distance Matrix API de Google Maps para obtener distancias (m) y duraciones (s)
-    entre cada par de coords = [(lat, lon), ...].
-    Si falta clave de la API del archivo st.secrets, usa la aproximación Haversine.
+    Data model para los solvers.
+    Sin flota: 'vehiculos' iguales que salen del nodo 0 a SHIFT_START_SEC (sin hora de regreso).
+    Con flota (lista de algorithms.flota.vehiculo): df debe venir de anteponer_bases(df, flota);
+    cada vehículo tiene su capacidad, nodo de inicio/fin (bases) y turno.
+    Los nodos del modelo son sitios, no filas de df (core.sitios.nodos_por_sitio): las rutas del
+    resultado se llevan a filas con core.sitios.expandir_resultado(res, data["filas_por_nodo"],
+    data["servicio_por_fila"]). El depósito y las bases conservan su índice de fila.
     """
-    if not GOOGLE_MAPS_API_KEY:
-        return _haversine_dist_dur(coords)
-    n = len(coords)
-    dist = [[0]*n for _ in range(n)]
-    dur  = [[0]*n for _ in range(n)]
-    # Dividimos en lotes para no exceder MAX_ELEMENTS celdas
-    batch = max(1, min(n, MAX_ELEMENTS // n))
-    for i0 in range(0, n, batch):
-        resp = gmaps.distance_matrix(
-            origins=coords[i0:i0+batch],
-            destinations=coords,
-            mode="driving",
-            units="metric",
-            departure_time=datetime.now(),
-            traffic_model="best_guess"
-        )
-        for i, row in enumerate(resp["rows"]):
-            for j, el in enumerate(row["elements"]):
-                dist[i0 + i][j] = el.get("distance", {}).get("value", 1)
-                dur[i0 + i][j]  = el.get("duration_in_traffic", {}).get(
-                    "value",
-                    el.get("duration", {}).get("value", 1)
-                )
-    return dist, dur
-
-def _crear_data_model(df, vehiculos=1, capacidad_veh=None):
     coords = list(zip(df["lat"], df["lon"]))
-    dist_m, dur_s = _distancia_duracion_matrix(coords)
+    # Pedidos a menos de radio_sitio_m comparten sitio: la matriz se pide solo por sitio
+    sitios, sitio_por_fila = ajustar_por_radio(coords, radio_sitio_m)
 
     time_windows = []
     demandas = []
@@ -130,7 +137,14 @@ def _crear_data_model(df, vehiculos=1, capacidad_veh=None):
     for _, row in df.iterrows():
         ini = _hora_a_segundos(row.get("time_start"))
         fin = _hora_a_segundos(row.get("time_end"))
-        if ini is None or fin is None:
+        ini_seg = row.get("ini_seg")
+        if row.get("tipo") == TIPO_BASE:
+            # Las bases no tienen ventana: la acota el turno de cada vehículo
+            ini, fin = 0, 24*3600
+        elif ini_seg is not None and not pd.isna(ini_seg):
+            # Cluster de agrupar_puntos_radio: intersección ya calculada con MARGEN
+            ini, fin = int(ini_seg), int(row["fin_seg"])
+        elif ini is None or fin is None:
             ini, fin = SHIFT_START_SEC, SHIFT_END_SEC
         else:
             ini = max(0, ini - MARGEN)
@@ -139,47 +153,136 @@ def _crear_data_model(df, vehiculos=1, capacidad_veh=None):
         demandas.append(row.get("demand", 1))
 
         # tiempo de servicio personalizado
-        tipo = row.get("tipo", "").strip()
+        tipo = row.get("tipo", "")
+        tipo = tipo.strip() if isinstance(tipo, str) else ""
         if tipo == "Sucursal":
-            service_times.append(10 * 60)  # 5 minutos
+            servicio = 10 * 60  # 5 minutos
         elif tipo == "Planta":
-            service_times.append(10 * 60)  # 30 minutos
+            servicio = 10 * 60  # 30 minutos
         else:
-            service_times.append(10 * 60)  # Cliente Delivery o indefinido
+            servicio = 10 * 60  # Cliente Delivery o indefinido
+        # Clusters: cada pedido adicional en la misma parada suma SERVICE_EXTRA_SEC
+        n_ped = row.get("n_pedidos", 1)
+        n_ped = 1 if pd.isna(n_ped) else max(1, int(n_ped))
+        service_times.append(servicio + SERVICE_EXTRA_SEC * (n_ped - 1))
+
+    if flota:
+        starts, ends = nodos_de_flota(df, flota)
+        capacidades = [v["capacidad"] or 10**9 for v in flota]
+        turnos = [(_hora_a_segundos(v["turno"][0]), _hora_a_segundos(v["turno"][1])) for v in flota]
+        nombres = [v["nombre"] for v in flota]
+        vehiculos = len(flota)
+    else:
+        starts, ends = [0] * vehiculos, [0] * vehiculos
+        capacidades = [capacidad_veh or 10**9] * vehiculos
+        turnos = [(SHIFT_START_SEC, 24*3600)] * vehiculos
+        nombres = [f"Vehículo {v + 1}" for v in range(vehiculos)]
+
+    # Nodos del solver: un nodo por sitio y ventana compatible, con servicios y demandas sumados;
+    # el depósito y las bases (filas iniciales) conservan su índice
+    fijos = {0} | set(starts) | set(ends)
+    nodo_de_fila, filas_por_nodo, ventanas_nodo = nodos_por_sitio(sitio_por_fila, time_windows, fijos)
+    n_nodos = len(filas_por_nodo)
+    sitio_de_nodo = sitio_por_fila[[f[0] for f in filas_por_nodo]]
+
+    # Matriz por sitio. Días grandes: solo vecinos geográficos y arcos de las bases, O(n·k)
+    # celdas; el resto es una estimación en línea recta que los solvers no usan como vecino
+    ids_sitio = [f"{lat:.6f},{lon:.6f}" for lat, lon in sitios]
+    disperso = len(sitios) >= UMBRAL_VECINOS
+    necesarias = arcos_a_pedir(sitios, {int(sitio_por_fila[f]) for f in fijos}).pares() if disperso else None
+    dist_sit, dur_sit, medidos = matriz_dia.actualizar_arcos(ids_sitio, sitios, necesarias)
+    if disperso:
+        est_d, est_t = matrices_distancia_duracion(sitios, vel_kmh=VEL_ESTIMADA_KMH)
+        dist_sit = np.where(medidos, dist_sit, (est_d * FACTOR_RODEO).astype(np.int32))
+        dur_sit = np.where(medidos, dur_sit, (est_t * FACTOR_RODEO).astype(np.int32))
+    dist_m = dist_sit[np.ix_(sitio_de_nodo, sitio_de_nodo)].tolist()
+    dur_s  = dur_sit[np.ix_(sitio_de_nodo, sitio_de_nodo)].tolist()
+    servicios_nodo = np.bincount(nodo_de_fila, weights=service_times, minlength=n_nodos).astype(int).tolist()
+    demandas_nodo = np.bincount(nodo_de_fila, weights=demandas, minlength=n_nodos).astype(int).tolist()
+    starts = [int(nodo_de_fila[s]) for s in starts]
+    ends = [int(nodo_de_fila[e]) for e in ends]
+
+    # Perfil horario (franja × n × n): los solvers evalúan cada arco según su hora de salida.
+    # La matriz estática pasa a ser el promedio de la jornada (modelos OR-Tools / CP-SAT).
+    # (no en modo disperso: el perfil pediría la matriz completa por cada franja)
+    perfil = None
+    if USAR_PERFIL_TIEMPOS and backend_viaje.depende_de_hora and not disperso:
+        perfil_sit, _ = construir_perfil(sitios, backend_viaje, SHIFT_START_SEC, SHIFT_END_SEC)
+        idx = sitio_de_nodo
+        perfil = PerfilTiempos(
+            np.ascontiguousarray(perfil_sit.duraciones[:, idx[:, None], idx[None, :]]),
+            perfil_sit.t0,
+            perfil_sit.paso
+        )
+        dur_s = perfil.promedio().tolist()
 
-    return {
+    data = {
         "distance_matrix": dist_m,
         "duration_matrix": dur_s,
-        "time_windows": time_windows,
-        "demands": demandas,
+        "time_windows": ventanas_nodo,
+        "demands": demandas_nodo,
         "num_vehicles": vehiculos,
-        "vehicle_capacities": [capacidad_veh or 10**9] * vehiculos,
+        "vehicle_capacities": capacidades,
+        "vehicle_shifts": turnos,
+        "vehicle_names": nombres,
+        "starts": starts,
+        "ends": ends,
         "depot": 0,
-        "service_times": service_times 
+        "coords": [(float(lat), float(lon)) for lat, lon in sitios[sitio_de_nodo]],
+        "service_times": servicios_nodo,
+        "duration_profile": perfil,
+        # Pedido (fila de df) <-> nodo del solver: ver core.sitios.expandir_resultado
+        "nodo_de_fila": nodo_de_fila.tolist(),
+        "filas_por_nodo": [f.tolist() for f in filas_por_nodo],
+        "servicio_por_fila": service_times,
+        "num_sitios": len(sitios),
+        "neighbors": None,
+        "initial_routes": None
     }
+    # Instancias grandes: solo los k sucesores cercanos y compatibles por nodo (y medidos)
+    if disperso:
+        data["neighbors"] = construir_vecinos(data, medidos=medidos[np.ix_(sitio_de_nodo, sitio_de_nodo)])
+    elif len(dist_m) >= UMBRAL_VECINOS:
+        data["neighbors"] = construir_vecinos(data)
+    return data
 
 #
 
-def optimizar_ruta_algoritmo22(data, tiempo_max_seg=60, reintento=False):
+def optimizar_ruta_algoritmo22(data, tiempo_max_seg=60, ventanas_suaves=VENTANAS_SUAVES, permitir_omitir=False,
+                               estrategia_inicial="PARALLEL_CHEAPEST_INSERTION", on_improvement=None,
+                               estancamiento_seg=None, reintento=False):
     """
     Intenta resolver VRPTW con OR-Tools.
-    Si falla, amplía las ventanas de tiempo y reintenta automáticamente una vez.
+    Varios vehículos: cada uno con su capacidad, nodo de inicio/fin (data["starts"]/["ends"])
+    y turno (data["vehicle_shifts"]): sale al inicio del turno y debe volver antes de su fin.
+    Con ventanas_suaves, el cierre de cada ventana y el fin de turno son cotas blandas
+    (tardanza penalizada) y, con permitir_omitir, cada parada puede quedar fuera pagando
+    PENALIDAD_OMITIR: una sola corrida devuelve siempre la mejor ruta posible y el reporte
+    de violaciones por parada en res["violaciones"] / res["clientes_excluidos"].
+    Con ventanas duras (por defecto), si no hay solución se muestran las ventanas, se amplían
+    las cortas (< 45 min) a una hora antes y después de su centro y se reintenta una vez; los
+    nodos ampliados quedan en res["ventanas_ampliadas"]. Si aun así no hay solución, retorna None.
+    Si data["initial_routes"] trae rutas (nodos sin inicio/fin, por vehículo; ver
+    algorithms.arranque.mapear_rutas), la búsqueda arranca desde ellas en vez de la
+    estrategia_inicial (nombre de routing_enums_pb2.FirstSolutionStrategy).
+    on_improvement(rutas, costo, segundos) recibe cada mejora del objetivo de OR-Tools
+    (ver algorithms.progreso); si retorna True, la búsqueda termina ahí. Con estancamiento_seg
+    también termina si en ese lapso el objetivo no mejora más de UMBRAL_MEJORA.
     """
+    flota = vehiculos_de(data)
+    bases = nodos_base(data)
     manager = pywrapcp.RoutingIndexManager(
         len(data["distance_matrix"]),
         data["num_vehicles"],
-        data["depot"]
+        [v["inicio"] for v in flota],
+        [v["fin"] for v in flota]
     )
     routing = pywrapcp.RoutingModel(manager)
 
-    def time_cb(from_index, to_index):
-        i = manager.IndexToNode(from_index)
-        j = manager.IndexToNode(to_index)
-        travel = data["duration_matrix"][i][j]
-        service = 600 if i == data["depot"] else data["service_times"][i]
-        return travel + service
-
-    transit_cb_idx = routing.RegisterTransitCallback(time_cb)
+    # Tránsito = servicio en el origen + viaje, precalculado y registrado como matriz:
+    # OR-Tools lo evalúa en C++ sin llamar a Python durante la búsqueda.
+    transito = matriz_transito(data, servicio_deposito=DEPOT_SERVICE_ORTOOLS_SEC)
+    transit_cb_idx = routing.RegisterTransitMatrix(transito.tolist())
     routing.SetArcCostEvaluatorOfAllVehicles(transit_cb_idx)
 
     routing.AddDimension(
@@ -193,26 +296,90 @@ def optimizar_ruta_algoritmo22(data, tiempo_max_seg=60, reintento=False):
     time_dim.SetGlobalSpanCostCoefficient(1000)
 
     for node, (ini, fin) in enumerate(data["time_windows"]):
+        if node in bases:
+            continue
         idx = manager.NodeToIndex(node)
-        time_dim.CumulVar(idx).SetRange(ini, fin)
-
-    depot_idx = manager.NodeToIndex(data["depot"])
-    time_dim.CumulVar(depot_idx).SetRange(SHIFT_START_SEC, SHIFT_START_SEC)
+        if ventanas_suaves:
+            # Se puede esperar (inicio duro) pero llegar tarde solo cuesta
+            time_dim.CumulVar(idx).SetMin(ini)
+            time_dim.SetCumulVarSoftUpperBound(idx, fin, COSTO_TARDANZA_SEG)
+        else:
+            time_dim.CumulVar(idx).SetRange(ini, fin)
+        if permitir_omitir and ventanas_suaves:
+            routing.AddDisjunction([idx], PENALIDAD_OMITIR)
+
+    # Turno de cada vehículo: sale al inicio y vuelve a su base antes del fin
+    for v, veh in enumerate(flota):
+        time_dim.CumulVar(routing.Start(v)).SetRange(veh["t0"], veh["t0"])
+        if ventanas_suaves:
+            time_dim.SetCumulVarSoftUpperBound(routing.End(v), veh["t_fin"], COSTO_TARDANZA_SEG)
+        else:
+            time_dim.CumulVar(routing.End(v)).SetMax(veh["t_fin"])
+
+    # Arranque en caliente: sucesor de cada nodo en las rutas iniciales
+    rutas_ini = data.get("initial_routes")
+    sucesor_ini = {}
+    for r in rutas_ini or []:
+        for a, b in zip(r, r[1:]):
+            sucesor_ini[a] = b
+
+    # Arcos dispersos: cada nodo solo puede ir a sus vecinos (o cerrar la ruta)
+    vecinos = data.get("neighbors")
+    if vecinos is not None:
+        fines = [routing.End(v) for v in range(data["num_vehicles"])]
+        for node in range(len(data["distance_matrix"])):
+            if node in bases:
+                continue
+            idx = manager.NodeToIndex(node)
+            sucesores = set(int(j) for j in vecinos.sucesores(node))
+            if node in sucesor_ini:
+                sucesores.add(sucesor_ini[node])   # el arco de la ruta inicial debe seguir permitido
+            permitidos = [manager.NodeToIndex(j) for j in sucesores if j not in bases]
+            # Un nodo omitido (disyunción) queda con NextVar == sí mismo
+            propio = [idx] if permitir_omitir and ventanas_suaves else []
+            routing.NextVar(idx).SetValues(permitidos + fines + propio)
 
     if any(data["demands"]):
-        def demand_cb(from_index):
-            return data["demands"][manager.IndexToNode(from_index)]
-        demand_cb_idx = routing.RegisterUnaryTransitCallback(demand_cb)
+        demand_cb_idx = routing.RegisterUnaryTransitVector(vector_demandas(data))
         routing.AddDimensionWithVehicleCapacity(
             demand_cb_idx, 0, data["vehicle_capacities"], True, "Capacity"
         )
 
     params = pywrapcp.DefaultRoutingSearchParameters()
     params.time_limit.FromSeconds(tiempo_max_seg)
-    params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION
+    params.first_solution_strategy = getattr(routing_enums_pb2.FirstSolutionStrategy, estrategia_inicial)
     params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
 
-    sol = routing.SolveWithParameters(params)
+    aviso = aviso_mejoras(on_improvement, estancamiento_seg)
+    if aviso is not None:
+        def _rutas_actuales():
+            rutas_cb = []
+            for v in range(data["num_vehicles"]):
+                idx, ruta_v = routing.Start(v), []
+                while not routing.IsEnd(idx):
+                    ruta_v.append(manager.IndexToNode(idx))
+                    idx = routing.NextVar(idx).Value()
+                rutas_cb.append(ruta_v)
+            return rutas_cb
+
+        def _en_solucion():
+            if aviso(routing.CostVar().Value(), _rutas_actuales):
+                routing.solver().FinishCurrentSearch()
+
+        routing.AddAtSolutionCallback(_en_solucion)
+
+    sol = None
+    if rutas_ini:
+        routing.CloseModelWithParameters(params)
+        inicial = routing.ReadAssignmentFromRoutes(
+            [[manager.NodeToIndex(n) for n in r] for r in rutas_ini], True
+        )
+        if inicial is not None:
+            sol = routing.SolveFromAssignmentWithParameters(inicial, params)
+        else:
+            st.info("ℹ️ La ruta previa no es válida para este modelo: se resuelve desde cero.")
+    if sol is None:
+        sol = routing.SolveWithParameters(params)
 
     if not sol:
         st.warning("❌ No se encontró solución con OR-Tools.")
@@ -223,8 +390,8 @@ def optimizar_ruta_algoritmo22(data, tiempo_max_seg=60, reintento=False):
             dur = fin - ini
             h_ini = f"{ini // 3600:02}:{(ini % 3600) // 60:02}"
             h_fin = f"{fin // 3600:02}:{(fin % 3600) // 60:02}"
-            label = "[DEPÓSITO]" if node == data["depot"] else f"Nodo {node}"
-            if dur < 45 * 60 and node != data["depot"]:
+            label = "[DEPÓSITO]" if node in bases else f"Nodo {node}"
+            if dur < 45 * 60 and node not in bases:
                 st.error(f"⚠️ {label:12} → {h_ini} - {h_fin}  (solo {dur // 60} min)")
                 ventanas_cortas.append(node)
             else:
@@ -235,24 +402,23 @@ def optimizar_ruta_algoritmo22(data, tiempo_max_seg=60, reintento=False):
             st.text(f"Nodo {i}: demanda = {d}")
 
         # Si aún no se ha hecho un reintento, ampliamos las ventanas cortas
-        if not reintento and ventanas_cortas:
+        if not reintento and ventanas_cortas and not ventanas_suaves:
             st.warning("🔄 Intentando nuevamente con márgenes ampliados para nodos conflictivos...")
-
-            nueva_data = data.copy()
-            nuevas_ventanas = []
-            for i, (ini, fin) in enumerate(data["time_windows"]):
-                if i in ventanas_cortas:
-                    centro = (ini + fin) // 2
-                    nuevo_ini = max(0, centro - 3600)
-                    nuevo_fin = min(86400, centro + 3600)
-                    nuevas_ventanas.append((nuevo_ini, nuevo_fin))
-                else:
-                    nuevas_ventanas.append((ini, fin))
-
-            nueva_data["time_windows"] = nuevas_ventanas
-            return optimizar_ruta_algoritmo22(nueva_data, tiempo_max_seg, reintento=True)
-
-        st.error("😕 Sin solución factible. Incluso tras reintentar.")
+            nueva_data = dict(data)
+            nueva_data["time_windows"] = [
+                (max(0, (ini + fin) // 2 - 3600), min(86400, (ini + fin) // 2 + 3600)) if i in ventanas_cortas
+                else (ini, fin)
+                for i, (ini, fin) in enumerate(data["time_windows"])
+            ]
+            res = optimizar_ruta_algoritmo22(nueva_data, tiempo_max_seg, ventanas_suaves, permitir_omitir,
+                                             estrategia_inicial, on_improvement, estancamiento_seg, reintento=True)
+            if res is not None:
+                res["ventanas_ampliadas"] = ventanas_cortas
+            return res
+
+        if not ventanas_suaves:
+            st.info("💡 Con ventanas suaves se obtiene la mejor ruta posible con su reporte de tardanzas.")
+        st.error("😕 Sin solución factible." + (" Incluso tras reintentar." if reintento else ""))
         return None
 
     rutas = []
@@ -272,16 +438,54 @@ def optimizar_ruta_algoritmo22(data, tiempo_max_seg=60, reintento=False):
         rutas.append({
             "vehicle": v,
             "route": route,
-            "arrival_sec": llegada
+            "arrival_sec": llegada,
+            "end_node": manager.IndexToNode(idx),
+            "end_sec": sol.Min(time_dim.CumulVar(idx))
         })
 
-    st.success("✅ Ruta encontrada con éxito.")
+    omitidos = [
+        node for node in range(len(data["distance_matrix"]))
+        if node not in bases
+        and sol.Value(routing.NextVar(manager.NodeToIndex(node))) == manager.NodeToIndex(node)
+    ]
+    violaciones = _reporte_violaciones(data, rutas, flota, omitidos)
+
+    if violaciones:
+        st.warning(f"⚠️ Ruta encontrada con {len(violaciones)} violación(es) de ventana/turno u omisiones.")
+    else:
+        st.success("✅ Ruta encontrada con éxito.")
     return {
         "routes": rutas,
-        "distance_total_m": dist_total_m
+        "distance_total_m": dist_total_m,
+        "violaciones": violaciones,
+        "clientes_excluidos": omitidos
     }
 
 
+def _reporte_violaciones(data, rutas, flota, omitidos):
+    """
+    Una fila por incumplimiento:
+      tipo 'ventana' (llegada después del cierre), 'turno' (regreso a la base después del fin
+      de turno) u 'omitido' (parada sin visitar). Tiempos en segundos desde medianoche.
+    """
+    reporte = []
+    for r in rutas:
+        for node, llegada in zip(r["route"][1:], r["arrival_sec"][1:]):
+            ini, fin = data["time_windows"][node]
+            if llegada > fin:
+                reporte.append({"tipo": "ventana", "node": node, "vehicle": r["vehicle"],
+                                "ventana": (ini, fin), "arrival_sec": llegada, "tardanza_seg": llegada - fin})
+        t_fin = flota[r["vehicle"]]["t_fin"]
+        if r["end_sec"] > t_fin:
+            reporte.append({"tipo": "turno", "node": r["end_node"], "vehicle": r["vehicle"],
+                            "ventana": (flota[r["vehicle"]]["t0"], t_fin), "arrival_sec": r["end_sec"],
+                            "tardanza_seg": r["end_sec"] - t_fin})
+    for node in omitidos:
+        reporte.append({"tipo": "omitido", "node": node, "vehicle": None,
+                        "ventana": tuple(data["time_windows"][node]), "arrival_sec": None, "tardanza_seg": None})
+    return reporte
+
+
 
 
 
@@ -306,12 +510,7 @@ def agregar_ventana_margen(df, margen_segundos=15*60):
 
 def _haversine_meters(lat1, lon1, lat2, lon2):
     """Retorna distancia en metros entre dos puntos (lat, lon) usando Haversine."""
-    R = 6371e3  # metros
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return 2 * R * math.asin(math.sqrt(a))
+    return float(haversine_metros(lat1, lon1, lat2, lon2))
 
 def agrupar_puntos_aglomerativo(df, eps_metros=5):
     """
@@ -327,18 +526,9 @@ def agrupar_puntos_aglomerativo(df, eps_metros=5):
         return pd.DataFrame(), df.copy()
 
     coords = df[["lat", "lon"]].to_numpy()
-    n = len(coords)
-    # 1) Construir matriz de distancias en metros
-    dist_m = np.zeros((n, n), dtype=float)
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                dist_m[i, j] = 0.0
-            else:
-                dist_m[i, j] = _haversine_meters(
-                    coords[i, 0], coords[i, 1],
-                    coords[j, 0], coords[j, 1]
-                )
+    # 1) Construir matriz de distancias en metros (vectorizada)
+    dist_m = matriz_haversine(coords).astype(float)
+    np.fill_diagonal(dist_m, 0.0)
 
     # 2) Aplicar AgglomerativeClustering con distancia precomputada
     clustering = AgglomerativeClustering(
@@ -387,6 +577,120 @@ def agrupar_puntos_aglomerativo(df, eps_metros=5):
     df_clusters = pd.DataFrame(agrupados)
     return df_clusters, df_labeled
 
+def _resumen_unicos(valores, maximo=2):
+    """'a, b...' con los primeros valores únicos (en orden de aparición)."""
+    unicos = list(pd.unique(valores))
+    return ", ".join(map(str, unicos[:maximo])) + ("..." if len(unicos) > maximo else "")
+
+def _ventanas_con_margen(df, margen=MARGEN):
+    """
+    Ventana de cada pedido en segundos con el margen aplicado (igual que _crear_data_model).
+    Pedidos sin hora cuentan como toda la jornada. Retorna (ini, fin, con_hora).
+    """
+    ini = np.array([_hora_a_segundos(t) for t in df["time_start"]], dtype=object)
+    fin = np.array([_hora_a_segundos(t) for t in df["time_end"]], dtype=object)
+    sin_hora = np.array([a is None or b is None for a, b in zip(ini, fin)], dtype=bool)
+    ini = np.maximum(np.where(sin_hora, SHIFT_START_SEC, ini).astype(np.int64) - margen, 0)
+    fin = np.minimum(np.where(sin_hora, SHIFT_END_SEC, fin).astype(np.int64) + margen, 24 * 3600)
+    return ini, fin, ~sin_hora
+
+def _dividir_por_ventanas(ini, fin, labels):
+    """
+    Parte cada cluster espacial en subgrupos cuyas ventanas (ini/fin de _ventanas_con_margen)
+    se intersectan. Barrido por fin de ventana: un pedido entra al grupo si abre antes de que
+    cierre el primero del grupo; así la intersección nunca queda vacía y el número de grupos
+    es mínimo.
+    """
+    nuevas = np.empty(len(labels), dtype=np.int64)
+    actual, label_prev, cierre = -1, None, None
+    for i in np.lexsort((fin, labels)):
+        if labels[i] != label_prev or ini[i] > cierre:
+            actual += 1
+            label_prev, cierre = labels[i], fin[i]
+        nuevas[i] = actual
+    return nuevas
+
+def _agregar_hora(horas, labels, g, como):
+    """min/max por cluster de horas 'HH:MM' (ignorando vacías); "" si el cluster no tiene."""
+    return horas.groupby(labels).agg(como).reindex(g.size().index).fillna("").to_numpy()
+
+def _segundos_a_hhmm(segs):
+    return f"{int(segs) // 3600:02}:{(int(segs) % 3600) // 60:02}"
+
+def agrupar_puntos_radio(df, eps_metros=5, respetar_ventanas=True):
+    """
+    Igual que agrupar_puntos_aglomerativo (mismo esquema de salida), pero escalable:
+      1) BallTree con métrica haversine: vecinos a ≤ eps_metros de cada pedido, ~O(n log n).
+      2) Componentes conexas del grafo de vecinos (union-find en C vía scipy) = clusters.
+      3) Si respetar_ventanas, cada cluster se parte para que sus ventanas (con MARGEN) se
+         intersecten; la ventana del cluster es esa intersección en segundos, ya con el
+         margen (columnas ini_seg/fin_seg, que _crear_data_model usa tal cual), y
+         time_start/time_end la muestran en 'HH:MM'. Nunca queda invertida.
+      4) Centroides y resúmenes con groupby vectorizado, sin filtrar el DataFrame por cluster.
+    Agrega la columna 'n_pedidos' (tamaño del cluster) para el tiempo de servicio.
+    Retorna (df_clusters, df_etiquetado).
+    """
+    if df.empty:
+        return pd.DataFrame(), df.copy()
+
+    rad = np.radians(df[["lat", "lon"]].to_numpy(dtype=float))
+    vecinos = BallTree(rad, metric="haversine").query_radius(rad, r=eps_metros / R_TIERRA_M)
+    n = len(rad)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(v) for v in vecinos])
+    adyacencia = csr_matrix(
+        (np.ones(indptr[-1], dtype=np.int8), np.concatenate(vecinos), indptr),
+        shape=(n, n)
+    )
+    _, labels = connected_components(adyacencia, directed=False)
+    if respetar_ventanas:
+        ini_m, fin_m, con_hora = _ventanas_con_margen(df)
+        labels = _dividir_por_ventanas(ini_m, fin_m, labels)
+
+    df_labeled = df.copy()
+    df_labeled["cluster"] = labels
+
+    # Ventanas vacías ("" o None) no cuentan para min/max
+    ts = df_labeled["time_start"].where(df_labeled["time_start"].astype(bool))
+    te = df_labeled["time_end"].where(df_labeled["time_end"].astype(bool))
+    g = df_labeled.groupby("cluster", sort=True)
+
+    if respetar_ventanas:
+        # Intersección con el mismo margen que el corte: inicio ≤ fin por construcción,
+        # salvo que un pedido traiga su propia ventana invertida
+        ini_c = pd.Series(ini_m).groupby(labels).max().reindex(g.size().index).to_numpy()
+        fin_c = pd.Series(fin_m).groupby(labels).min().reindex(g.size().index).to_numpy()
+        invertidas = np.flatnonzero(ini_c > fin_c)
+        if invertidas.size:
+            c = g.size().index[invertidas[0]]
+            raise ValueError(f"Ventana invertida en cluster_{c}: "
+                             f"{_segundos_a_hhmm(ini_c[invertidas[0]])} > {_segundos_a_hhmm(fin_c[invertidas[0]])}")
+        alguna = pd.Series(con_hora).groupby(labels).any().reindex(g.size().index).to_numpy()
+        ini_seg = np.where(alguna, ini_c, np.nan)
+        fin_seg = np.where(alguna, fin_c, np.nan)
+        time_start = [_segundos_a_hhmm(x) if a else "" for x, a in zip(ini_c, alguna)]
+        time_end = [_segundos_a_hhmm(x) if a else "" for x, a in zip(fin_c, alguna)]
+    else:
+        ini_seg = fin_seg = np.full(len(g.size()), np.nan)
+        time_start = _agregar_hora(ts, labels, g, "min")
+        time_end = _agregar_hora(te, labels, g, "max")
+
+    df_clusters = pd.DataFrame({
+        "id":             [f"cluster_{c}" for c in g.size().index],
+        "operacion":      "Agrupado",
+        "nombre_cliente": g["nombre_cliente"].agg(_resumen_unicos).to_numpy(),
+        "direccion":      g["direccion"].agg(_resumen_unicos).to_numpy(),
+        "lat":            g["lat"].mean().to_numpy(),
+        "lon":            g["lon"].mean().to_numpy(),
+        "time_start":     time_start,
+        "time_end":       time_end,
+        "ini_seg":        ini_seg,
+        "fin_seg":        fin_seg,
+        "demand":         g["demand"].sum().astype(int).to_numpy(),
+        "n_pedidos":      g.size().to_numpy(),
+    })
+    return df_clusters, df_labeled
+
 # ===================== CARGAR PEDIDOS DESDE FIRESTORE =====================
 
 @st.cache_data(ttl=300)
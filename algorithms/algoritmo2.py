@@ -4,15 +4,26 @@
 
 import time
 from typing import List, Dict, Any, Tuple
-from heapq import heappush, heappop
+from heapq import heappush, heappop, heapify
+import numpy as np
 import streamlit as st
 from algorithms.algoritmo1 import SERVICE_TIME, SHIFT_START_SEC  # ambos en segundos
+from core.perfiles_tiempo import tiempo_viaje
+from algorithms.flota import nodos_base, vehiculos_de
+from algorithms.progreso import aviso_mejoras
+from algorithms.holguras import Holguras
+from algorithms.busqueda_tabu import BusquedaTabu
 
 # ===================== Config servicio depósito / helper =====================
 
 #Service time primer nodo
 DEPOT_SERVICE_SEC = 8 * 60  # 10 minutos
 
+# Candidatos de ahorro por cliente en Clarke–Wright (sus más cercanos)
+K_AHORROS = 25
+# Fracción del plazo para el Tabu sobre subrutas de CW; el resto es para pulir las rutas por vehículo
+FRACCION_TABU_CW = 0.5
+
 def _svc(data: Dict[str, Any], node: int) -> int:
     """
     Devuelve el tiempo de servicio en segundos para 'node'.
@@ -29,25 +40,24 @@ def _route_distance(route: List[int], data: Dict[str, Any]) -> float:
     D = data["distance_matrix"]
     return sum(D[u][v] for u, v in zip(route, route[1:]))
 
-def _check_feasible_and_time(route: List[int], data: Dict[str, Any]) -> Tuple[bool, List[int]]:
+def _check_feasible_and_time(route: List[int], data: Dict[str, Any], t0: int = SHIFT_START_SEC) -> Tuple[bool, List[int]]:
     """
     Comprueba factibilidad con ventanas duras.
     Convención:
-      - t inicia en SHIFT_START_SEC en el depósito.
+      - t inicia en t0 (por defecto SHIFT_START_SEC) en el nodo inicial.
       - Antes de viajar de u->v se suma SIEMPRE el servicio del nodo u.
-      - Luego se suma duración de viaje.
+      - Luego se suma duración de viaje (del perfil horario si data lo trae).
       - Si llegada > w1 => infactible.
       - Si llegada < w0 => espera hasta w0.
     """
-    T = data["duration_matrix"]
     windows = data["time_windows"]
 
-    t = SHIFT_START_SEC
+    t = t0
     arrivals = [t]  # llegada al depósito (inicio)
 
     for u, v in zip(route, route[1:]):
         t += _svc(data, u)       # servicio del nodo origen
-        t += T[u][v]             # viaje u->v
+        t += tiempo_viaje(data, u, v, t)   # viaje u->v (según hora de salida)
 
         w0, w1 = windows[v]
         if t > w1:
@@ -60,24 +70,25 @@ def _check_feasible_and_time(route: List[int], data: Dict[str, Any]) -> Tuple[bo
 
 # ===================== Greedy con ventanas duras =====================
 
-def _greedy_step(current: int, t_now: int, candidates: List[int], data: Dict[str, Any]) -> Tuple[int, int]:
+def _greedy_step(current: int, t_now: int, candidates: List[int], data: Dict[str, Any], regreso=None) -> Tuple[int, int]:
     """
-    Elige el siguiente candidato factible (ventanas duras), priorizando
-    cierres próximos y ventanas cortas. Devuelve (nodo_elegido, t_llegada_efectiva).
+    Elige el siguiente candidato factible (ventanas duras y regreso a tiempo a la base),
+    priorizando cierres próximos y ventanas cortas. Devuelve (nodo_elegido, t_llegada_efectiva).
     Si ninguno es factible, devuelve (-1, t_now).
     """
-    T = data["duration_matrix"]
     W = data["time_windows"]
     heap = []
 
     for nxt in candidates:
         t_depart = t_now + _svc(data, current)       # servicio en current
-        t_arrive = t_depart + T[current][nxt]
+        t_arrive = t_depart + tiempo_viaje(data, current, nxt, t_depart)
         w0, w1 = W[nxt]
         if t_arrive > w1:  # ventana dura
             continue
 
         t_eff = max(t_arrive, w0)
+        if not _cabe_regreso(data, nxt, t_eff, regreso):
+            continue
         wait = max(0, w0 - t_arrive)
         ventana = max(1, w1 - w0)
         urgencia = 1 / ventana
@@ -90,13 +101,12 @@ def _greedy_step(current: int, t_now: int, candidates: List[int], data: Dict[str
     return chosen, t_eff
 
 
-def _insert_flexibles_between(anchor_a: int, t_at_a: int, anchor_b: int, data: Dict[str, Any], flex_pool: List[int]) -> Tuple[List[int], List[int], int]:
+def _insert_flexibles_between(anchor_a: int, t_at_a: int, anchor_b: int, data: Dict[str, Any], flex_pool: List[int], regreso=None) -> Tuple[List[int], List[int], int]:
     """
     Inserta clientes 'flexibles' entre dos anclas (citas) SIN romper la llegada a la segunda ancla.
     Devuelve (subruta, subarrivals, t_en_anchor_b_previsto).
     Si anchor_b == depot (o no hay siguiente), inserta tantos como quepan sin restricción a b.
     """
-    T = data["duration_matrix"]
     W = data["time_windows"]
     depot = data["depot"]
 
@@ -117,11 +127,13 @@ def _insert_flexibles_between(anchor_a: int, t_at_a: int, anchor_b: int, data: D
         cand_heap = []
         for nxt in flex_pool:
             t_depart = t_now + _svc(data, current)    # servicio en current (incluye depósito)
-            t_arrive = t_depart + T[current][nxt]
+            t_arrive = t_depart + tiempo_viaje(data, current, nxt, t_depart)
             w0, w1 = W[nxt]
             if t_arrive > w1:
                 continue
             t_eff = max(t_arrive, w0)
+            if not _cabe_regreso(data, nxt, t_eff, regreso):
+                continue
             wait = max(0, w0 - t_arrive)
             ventana = max(1, w1 - w0)
             urgencia = 1 / ventana
@@ -138,7 +150,7 @@ def _insert_flexibles_between(anchor_a: int, t_at_a: int, anchor_b: int, data: D
             if limit_to_b:
                 # Llegada a anchor_b luego de chosen: servicio en chosen + viaje chosen->b
                 t_after_chosen_depart = t_eff + _svc(data, chosen)
-                t_arrive_b = t_after_chosen_depart + T[chosen][anchor_b]
+                t_arrive_b = t_after_chosen_depart + tiempo_viaje(data, chosen, anchor_b, t_after_chosen_depart)
                 w0b, w1b = W[anchor_b]
                 if t_arrive_b > w1b:
                     # no cabe; intentamos otro flexible
@@ -162,36 +174,234 @@ def _insert_flexibles_between(anchor_a: int, t_at_a: int, anchor_b: int, data: D
 
 # ===================== Algoritmo principal =====================
 
-def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60) -> Dict[str, Any]:
+def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60, on_improvement=None,
+                           estancamiento_seg: float = None) -> Dict[str, Any]:
     """
     Pipeline:
       1) Clark–Wright + Tabu para obtener subrutas (solo como buen set inicial).
-      2) Extraer todos los clientes y construir UNA ruta atendiendo primero 'citas' (ventanas estrechas).
-      3) Insertar flexibles entre citas sin romperlas.
-
-    Resultado: no excluye clientes; si algo no cabe, reubica flexibles.
+      2) Repartir las subrutas entre los vehículos (capacidad y turno de cada uno) y construir
+         una ruta por vehículo atendiendo primero 'citas' (ventanas estrechas).
+      3) Insertar flexibles entre citas sin romperlas; lo que no cabe en un vehículo
+         pasa al siguiente.
+      4) Sobre las rutas por vehículo ya factibles: insertar lo que quedó sin asignar y
+         Tabu (2-opt, Or-opt, relocate, cross-exchange) con el plazo que quede.
+
+    Resultado: solo quedan en 'clientes_excluidos' los que no caben en ningún vehículo.
+    on_improvement (algorithms.progreso) recibe las subrutas de CW + Tabu con su distancia
+    total cada vez que mejoran, luego las rutas por vehículo (cambio de fase) con cada mejora
+    del paso 4 y, al final, las rutas entregadas. Con estancamiento_seg el Tabu termina si en
+    ese lapso la distancia total no mejora más de UMBRAL_MEJORA.
     """
+    aviso = aviso_mejoras(on_improvement, estancamiento_seg)
     depot = data["depot"]
     D = data["distance_matrix"]
-    T = data["duration_matrix"]
     W = data["time_windows"]
 
     n = len(D)
-    nodes = [i for i in range(n) if i != depot]
+    bases = nodos_base(data)
+    nodes = [i for i in range(n) if i not in bases]
+    # Las subrutas de CW deben caber al menos en el turno más holgado de la flota
+    t0_cw = min(v["t0"] for v in vehiculos_de(data))
+    t_fin_cw = max(v["t_fin"] for v in vehiculos_de(data))
 
     # ---------- 1) Savings + Tabu (con chequeo de ventanas) ----------
-    savings = []
-    for i in nodes:
-        for j in nodes:
-            if i < j:
-                s = D[depot][i] + D[depot][j] - D[i][j]
-                savings.append((s, i, j))
-    savings.sort(reverse=True)
+    def _feasible_route(rt: List[int]) -> bool:
+        feas, arr = _check_feasible_and_time(rt, data, t0=t0_cw)
+        return feas and arr[-1] <= t_fin_cw
+
+    # Duraciones estáticas: cada unión se valida en O(1) con segmentos (algorithms.holguras)
+    holg = Holguras(data, t0_cw, t_fin_cw, [_svc(data, u) for u in range(n)]) if Holguras.aplica(data) else None
+    initial_routes = _clarke_wright(data, nodes, holg, _feasible_route)
+
+    # Tabu sobre todas las subrutas a la vez: 2-opt, Or-opt, relocate y cross-exchange
+    # (algorithms.busqueda_tabu); una subruta puede quedar vacía si sus paradas caben en otras
+    start_ts = time.time()
+    tabu = BusquedaTabu(data, initial_routes, [holg] * len(initial_routes),
+                        factible=lambda _, rt: _feasible_route(rt))
+
+    def vista_cw(rs):
+        return [rt[:-1] for rt in rs if len(rt) > 2]
+
+    detener = aviso is not None and aviso(tabu.distancia(), lambda: vista_cw(tabu.rutas))
+    if not detener:
+        tabu.buscar(start_ts + FRACCION_TABU_CW * tiempo_max_seg, aviso, vista_cw)
+        detener = aviso is not None and aviso.detener
+
+    final_routes = []
+    for best_route in tabu.rutas:
+        if len(best_route) <= 2:
+            continue
+        _, arrival = _check_feasible_and_time(best_route, data, t0=t0_cw)
+        final_routes.append((best_route, arrival, _route_distance(best_route, data)))
+
+    # ---------- 2) Reparto entre vehículos + construcción "appointments-first" ----------
+    flota = vehiculos_de(data)
+    demandas = data.get("demands") or [0] * n
+    all_clients = [u for rt, _, _ in final_routes for u in rt if u not in bases] or nodes
+    if len(flota) > 1:
+        asignados = _repartir_subrutas(final_routes, flota, data, bases)
+    else:
+        asignados = [all_clients]
+
+    construidas = []
+    pendientes: List[int] = []
+    for v, veh in enumerate(flota):
+        # Lo que no cupo en los vehículos anteriores pasa a este, si hay capacidad
+        libre = veh["capacidad"] - sum(demandas[u] for u in asignados[v])
+        clientes = list(asignados[v])
+        resto = []
+        for u in pendientes:
+            if demandas[u] <= libre:
+                clientes.append(u)
+                libre -= demandas[u]
+            else:
+                resto.append(u)
+
+        route, arrivals, sin_asignar = _ruta_citas_primero(
+            clientes, data, veh["inicio"], veh["t0"],
+            regreso=(veh["fin"], veh["t_fin"]),
+            forzar=(v == len(flota) - 1)
+        )
+        pendientes = resto + sin_asignar
+        construidas.append((route, arrivals))
+
+    # ---------- 3) Tabu sobre las rutas por vehículo (turno, bases y capacidad de cada uno) ----------
+    # Solo entran las rutas factibles (la del último vehículo puede traer citas forzadas)
+    def _factible_vehiculo(v: int, rt: List[int]) -> bool:
+        feas, arr = _check_feasible_and_time(rt, data, t0=flota[v]["t0"])
+        return feas and arr[-1] <= flota[v]["t_fin"]
+
+    pulir = [v for v, (route, _) in enumerate(construidas) if _factible_vehiculo(v, route + [flota[v]["fin"]])]
+    if pulir and not detener:
+        svc = [_svc(data, u) for u in range(n)]
+        tabu_v = BusquedaTabu(
+            data,
+            [construidas[v][0] + [flota[v]["fin"]] for v in pulir],
+            [Holguras(data, flota[v]["t0"], flota[v]["t_fin"], svc) if holg is not None else None for v in pulir],
+            capacidades=[flota[v]["capacidad"] for v in pulir],
+            factible=lambda k, rt: _factible_vehiculo(pulir[k], rt),
+        )
+
+        def _vista_vehiculos(rs):
+            por_vehiculo = [route for route, _ in construidas]
+            for k, v in enumerate(pulir):
+                por_vehiculo[v] = rs[k][:-1]
+            return por_vehiculo
+
+        # Lo que quedó sin asignar entra donde quepa, con la menor distancia extra
+        pendientes = tabu_v.insertar(pendientes)
+        if aviso is not None:
+            # Cambio de fase: de subrutas de CW a rutas por vehículo (costos no comparables)
+            dist_construidas = tabu_v.distancia() + sum(
+                _route_distance(route + [flota[v]["fin"]], data)
+                for v, (route, _) in enumerate(construidas) if v not in pulir)
+            aviso(dist_construidas, _vista_vehiculos(tabu_v.rutas), siempre=True)
+        mejores, _ = tabu_v.buscar(start_ts + tiempo_max_seg, aviso, _vista_vehiculos)
+        for k, v in enumerate(pulir):
+            route = mejores[k][:-1]
+            construidas[v] = (route, _check_feasible_and_time(route, data, t0=flota[v]["t0"])[1])
+
+    rutas = []
+    dist_final = 0
+    for v, veh in enumerate(flota):
+        route, arrivals = construidas[v]
+
+        # Validación final
+        feas, arrival_chk = _check_feasible_and_time(route, data, t0=veh["t0"])
+        if not feas:
+            st.warning("La ruta resultante violaría alguna ventana; revisa ventanas o el turno del vehículo.")
+            if arrival_chk:
+                arrivals = arrival_chk
+
+        # Regreso a la base de fin del vehículo
+        t_sal = arrivals[-1] + _svc(data, route[-1])
+        end_sec = t_sal + tiempo_viaje(data, route[-1], veh["fin"], t_sal)
+        dist_final += _route_distance(route + [veh["fin"]], data)
+
+        rutas.append({
+            "vehicle": v,
+            "route": route,
+            "arrival_sec": arrivals,
+            "end_node": veh["fin"],
+            "end_sec": end_sec
+        })
+
+    if pendientes:
+        st.warning("No fue posible insertar algunos flexibles sin romper ventanas; considera ampliar sus ventanas o la flota.")
+    if aviso is not None:
+        aviso(dist_final, [r["route"] for r in rutas], siempre=True)
+
+    return {
+        "routes": rutas,
+        "distance_total_m": dist_final,
+        "clientes_excluidos": pendientes
+    }
+
+
+def _ahorros_perezosos(data: Dict[str, Any], clientes: List[int], es_extremo, k: int = K_AHORROS):
+    """
+    Ahorros de Clarke–Wright de mayor a menor, generados a demanda: (ahorro, i, j) para unir
+    una ruta que termina en i con otra que empieza en j,
+        ahorro = D[i][depósito] + D[depósito][j] - D[i][j].
+    Solo con los k clientes más cercanos de cada uno (NumPy, O(n·k) ahorros en vez de O(n²)).
+    Cada cliente aporta su lista ordenada (en ambos sentidos) y el heap guarda solo el siguiente
+    ahorro de cada lista; cuando es_extremo(u) es falso (u quedó en el interior de una ruta),
+    el resto de su lista ya no sirve y no se vuelve a encolar.
+    """
+    if len(clientes) < 2:
+        return
+    D = np.asarray(data["distance_matrix"], dtype=np.float64)
+    depot = data["depot"]
+    idx = np.asarray(clientes)
+    sub = D[np.ix_(idx, idx)]
+    cerca = np.minimum(sub, sub.T)
+    np.fill_diagonal(cerca, np.inf)
+    kk = min(k, len(idx) - 1)
+    vec = np.argpartition(cerca, kk - 1, axis=1)[:, :kk]            # posiciones en idx
+    filas = np.arange(len(idx))[:, None]
+    a_dep, de_dep = D[idx, depot], D[depot, idx]
+    sale = a_dep[:, None] + de_dep[vec] - sub[filas, vec]            # u -> vecino
+    entra = a_dep[vec] + de_dep[:, None] - sub[vec, filas]           # vecino -> u
+    ahorro = np.concatenate([sale, entra], axis=1)
+    orden = np.argsort(-ahorro, axis=1, kind="stable")
+    ahorro = np.take_along_axis(ahorro, orden, axis=1).tolist()
+    socio = idx[np.concatenate([vec, vec], axis=1)]
+    socio = np.take_along_axis(socio, orden, axis=1).tolist()
+    sale_u = (orden < kk).tolist()
+
+    heap = [(-ahorro[f][0], f, 0) for f in range(len(idx))]
+    heapify(heap)
+    while heap:
+        _, f, t = heappop(heap)
+        u = int(idx[f])
+        if not es_extremo(u):
+            continue
+        if t + 1 < len(ahorro[f]):
+            heappush(heap, (-ahorro[f][t + 1], f, t + 1))
+        if sale_u[f][t]:
+            yield ahorro[f][t], u, socio[f][t]
+        else:
+            yield ahorro[f][t], socio[f][t], u
+
 
+def _clarke_wright(data: Dict[str, Any], nodes: List[int], holg, feasible_fn) -> List[List[int]]:
+    """
+    Subrutas [depósito, ..., depósito] por ahorros (Clarke–Wright) con ventanas duras.
+    Union-find sobre los clientes: la raíz de cada ruta guarda su inicio, su fin y (con holg)
+    el segmento de sus paradas, así cada unión se valida y se aplica en O(1); las rutas se
+    arman al final siguiendo el sucesor de cada cliente.
+    Sin holg (perfil horario) cada unión se valida recorriendo la ruta unida.
+    """
+    depot = data["depot"]
     parent = {i: i for i in nodes}
     start_map = {i: i for i in nodes}
     end_map = {i: i for i in nodes}
-    route_map = {i: [depot, i, depot] for i in nodes}
+    siguiente: Dict[int, int] = {}
+    if holg is not None:
+        paradas = {i: holg.nodo(i) for i in nodes}
+        ida, vuelta = holg.salida(depot), holg.llegada(depot)
+    else:
+        route_map = {i: [depot, i, depot] for i in nodes}
 
     def find(i: int) -> int:
         while parent[i] != i:
@@ -199,71 +409,97 @@ def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60) -> Di
             i = parent[i]
         return i
 
-    def _feasible_route(rt: List[int]) -> bool:
-        feas, _ = _check_feasible_and_time(rt, data)
-        return feas
+    def es_extremo(u: int) -> bool:
+        r = find(u)
+        return start_map[r] == u or end_map[r] == u
 
-    for _, i, j in savings:
+    num_rutas = len(nodes)
+    for _, i, j in _ahorros_perezosos(data, nodes, es_extremo):
+        if num_rutas == 1:
+            break
         ri, rj = find(i), find(j)
-        if ri == rj:
+        if ri == rj or end_map[ri] != i or start_map[rj] != j:
             continue
-        if end_map[ri] == i and start_map[rj] == j:
+        if holg is not None:
+            # depósito → paradas de ri → paradas de rj → depósito
+            seg = holg.unir(paradas[ri], paradas[rj])
+            if holg.unir(holg.unir(ida, seg), vuelta).retraso:
+                continue
+            paradas[ri] = seg
+        else:
             merged = route_map[ri][:-1] + route_map[rj][1:]
-            if not _feasible_route(merged):
+            if not feasible_fn(merged):
                 continue
-            parent[rj] = ri
-            end_map[ri] = end_map[rj]
             route_map[ri] = merged
+        parent[rj] = ri
+        end_map[ri] = end_map[rj]
+        siguiente[i] = j
+        num_rutas -= 1
+
+    rutas = []
+    for r in {find(i) for i in nodes}:
+        ruta, u = [depot], start_map[r]
+        while u is not None:
+            ruta.append(u)
+            u = siguiente.get(u)
+        rutas.append(ruta + [depot])
+    return rutas
+
+
+def _repartir_subrutas(final_routes, flota, data: Dict[str, Any], bases) -> List[List[int]]:
+    """
+    Reparte las subrutas de CW + Tabu entre vehículos (LPT): la subruta más larga primero,
+    al vehículo con menor ocupación relativa de su turno que aún tenga capacidad.
+    """
+    demandas = data.get("demands") or [0] * len(data["distance_matrix"])
+    carga_t = [0] * len(flota)
+    carga_q = [0] * len(flota)
+    asignados: List[List[int]] = [[] for _ in flota]
+
+    def _duracion(item):
+        _, arr, _ = item
+        return arr[-1] - arr[0] if arr else 0
+
+    for rt, arr, dist in sorted(final_routes, key=_duracion, reverse=True):
+        clientes = [u for u in rt if u not in bases]
+        if not clientes:
+            continue
+        q = sum(demandas[u] for u in clientes)
+        dur = _duracion((rt, arr, dist))
+        cabe = [v for v in range(len(flota)) if carga_q[v] + q <= flota[v]["capacidad"]] or range(len(flota))
+        v = min(cabe, key=lambda k: (carga_t[k] + dur) / max(1, flota[k]["t_fin"] - flota[k]["t0"]))
+        asignados[v] += clientes
+        carga_t[v] += dur
+        carga_q[v] += q
+    return asignados
+
+
+def _cabe_regreso(data: Dict[str, Any], nodo: int, t_llegada: int, regreso) -> bool:
+    """¿Atendiendo 'nodo' (llegada efectiva t_llegada) se vuelve a la base antes del fin de turno?"""
+    if regreso is None:
+        return True
+    fin, t_fin = regreso
+    t_salida = t_llegada + _svc(data, nodo)
+    return t_salida + tiempo_viaje(data, nodo, fin, t_salida) <= t_fin
+
+
+def _ruta_citas_primero(clientes: List[int], data: Dict[str, Any], inicio: int, t0: int,
+                        regreso=None, forzar: bool = True) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Ruta de UN vehículo que sale de 'inicio' a t0: citas (ventana < 60 min) en orden de cierre
+    y flexibles entre ellas sin romperlas.
+    regreso = (nodo_fin, t_fin): no se aceptan paradas desde las que no se vuelva a tiempo.
+    forzar=False: las citas que no caben se devuelven en vez de forzarlas (con aviso).
+    Retorna (route, arrivals, sin_asignar).
+    """
+    W = data["time_windows"]
 
-    roots = {find(i) for i in nodes}
-    initial_routes = [route_map[r] for r in roots]
-
-    # Pequeño Tabu local
-    start_ts = time.time()
-    final_routes = []
-    for init in initial_routes:
-        best_route = init[:]
-        best_dist = _route_distance(best_route, data)
-        tabu_list = []
-        tabu_size = 50
-
-        while time.time() - start_ts < tiempo_max_seg:
-            improved = False
-            L = len(best_route)
-            for a in range(1, L - 2):
-                for b in range(a + 1, L - 1):
-                    move = (a, b)
-                    if move in tabu_list:
-                        continue
-                    cand = best_route[:]
-                    cand[a], cand[b] = cand[b], cand[a]
-                    if not _feasible_route(cand):
-                        continue
-                    dist_c = _route_distance(cand, data)
-                    if dist_c < best_dist - 1e-6:
-                        best_route = cand
-                        best_dist = dist_c
-                        tabu_list.append(move)
-                        if len(tabu_list) > tabu_size:
-                            tabu_list.pop(0)
-                        improved = True
-                        break
-                if improved:
-                    break
-            if not improved:
-                break
-
-        _, arrival = _check_feasible_and_time(best_route, data)
-        final_routes.append((best_route, arrival, best_dist))
-
-    # ---------- 2) Construcción "appointments-first" ----------
     # Consideramos "cita" si la ventana es estrecha (< 60 min)
     APPOINTMENT_THRESHOLD = 60 * 60  # 60 minutos
-    all_clients = [n for rt, _, _ in final_routes for n in rt if n != depot] or nodes
 
     appointments = []
     flexibles = []
-    for n in all_clients:
+    for n in clientes:
         w0, w1 = W[n]
         if (w1 - w0) <= APPOINTMENT_THRESHOLD:
             appointments.append(n)
@@ -273,11 +509,12 @@ def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60) -> Di
     # Ordena citas por cierre de ventana (EDD)
     appointments.sort(key=lambda u: W[u][1])
 
-    # Empieza la ruta en el depósito
-    route: List[int] = [depot]
-    arrivals: List[int] = [SHIFT_START_SEC]
-    current = depot
-    t_now = SHIFT_START_SEC
+    # Empieza la ruta en la base de inicio del vehículo
+    route: List[int] = [inicio]
+    arrivals: List[int] = [t0]
+    current = inicio
+    t_now = t0
+    sin_asignar: List[int] = []
 
     # Recorre citas en orden y va rellenando huecos con flexibles
     for idx, appt in enumerate(appointments):
@@ -285,7 +522,7 @@ def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60) -> Di
 
         # Inserta flexibles antes de esta cita (si cabe)
         if flexibles:
-            sub_route, sub_arr, t_now = _insert_flexibles_between(current, t_now, appt, data, flexibles)
+            sub_route, sub_arr, t_now = _insert_flexibles_between(current, t_now, appt, data, flexibles, regreso)
             # concatena (evitando duplicar el primer nodo)
             route += sub_route[1:]
             arrivals += sub_arr[1:]
@@ -293,9 +530,13 @@ def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60) -> Di
                 current = route[-1]
 
         # Viajar a la cita respetando su ventana: servicio en current + viaje
-        t_now += _svc(data, current)               # servicio del nodo origen  
-        t_arr_appt = t_now + T[current][appt]
+        t_dep = t_now + _svc(data, current)               # servicio del nodo origen
+        t_arr_appt = t_dep + tiempo_viaje(data, current, appt, t_dep)
         w0, w1 = W[appt]
+        if not forzar and (t_arr_appt > w1 or not _cabe_regreso(data, appt, max(t_arr_appt, w0), regreso)):
+            # Otro vehículo la atenderá
+            sin_asignar.append(appt)
+            continue
         if t_arr_appt > w1:
             # En principio no debería pasar por el filtro previo, pero dejamos aviso
             st.warning(f"Reajuste: cita {appt} quedaría fuera de ventana.")
@@ -306,22 +547,22 @@ def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60) -> Di
 
         # Entre esta cita y la siguiente, intenta meter flexibles
         if next_appt and flexibles:
-            sub_route, sub_arr, t_now = _insert_flexibles_between(current, t_now, next_appt, data, flexibles)
+            sub_route, sub_arr, t_now = _insert_flexibles_between(current, t_now, next_appt, data, flexibles, regreso)
             route += sub_route[1:]
             arrivals += sub_arr[1:]
             current = route[-1]
 
     # ---------- 3) Inserta los flexibles restantes después de la última cita ----------
     while flexibles:
-        chosen, t_eff = _greedy_step(current, t_now, flexibles, data)
+        chosen, t_eff = _greedy_step(current, t_now, flexibles, data, regreso)
         if chosen == -1:
             # Reintento simple: probar cada flexible individualmente
             assigned = False
             for cand in list(flexibles):
                 t_depart = t_now + _svc(data, current)
-                t_arr = t_depart + T[current][cand]
+                t_arr = t_depart + tiempo_viaje(data, current, cand, t_depart)
                 w0, w1 = W[cand]
-                if t_arr > w1:
+                if t_arr > w1 or not _cabe_regreso(data, cand, max(t_arr, w0), regreso):
                     continue
                 t_eff2 = max(t_arr, w0)
                 route.append(cand)
@@ -332,7 +573,6 @@ def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60) -> Di
                 assigned = True
                 break
             if not assigned:
-                st.warning("No fue posible insertar algunos flexibles sin romper ventanas; considera ampliar sus ventanas.")
                 break
         else:
             route.append(chosen)
@@ -341,29 +581,4 @@ def optimizar_ruta_cw_tabu(data: Dict[str, Any], tiempo_max_seg: int = 60) -> Di
             current = chosen
             t_now = t_eff
 
-    # (Opcional) cerrar en depósito:
-    # t_now += _svc(data, current)
-    # t_now += T[current][depot]
-    # w0d, w1d = W[depot]
-    # t_now = max(t_now, w0d) 
-    # route.append(depot)
-    # arrivals.append(t_now)
-
-    # Validación final
-    feas, arrival_chk = _check_feasible_and_time(route, data)
-    if not feas:
-        st.warning("La ruta resultante violaría alguna ventana; revisa ventanas o SHIFT_START_SEC.")
-        if arrival_chk:
-            arrivals = arrival_chk
-
-    dist_final = _route_distance(route, data)
-
-    return {
-        "routes": [{
-            "vehicle": 0,
-            "route": route,
-            "arrival_sec": arrivals
-        }],
-        "distance_total_m": dist_final,
-        "clientes_excluidos": []  # no excluimos: reacomodamos
-    }
+    return route, arrivals, sin_asignar + flexibles
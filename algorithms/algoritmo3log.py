@@ -1,8 +1,15 @@
 # algorithms/algoritmo3_hybrid.py
 
+import threading
+
+import numpy as np
 from ortools.sat.python import cp_model
 from typing import Dict, Any
 
+from core.perfiles_tiempo import tiempo_viaje
+from algorithms.flota import nodos_base, vehiculos_de
+from algorithms.progreso import aviso_mejoras
+
 # ----------------------------------
 #  CONSTANTES DE JORNADA Y SERVICIO
 # ----------------------------------
@@ -16,169 +23,378 @@ MAX_WAIT       = 35 * 60           # penalizar esperas 35 minutos
 # pesos
 WAIT_WEIGHT    = 100                # 1 segundo de espera = 1 unidad de penalización
 
-def optimizar_ruta_cp_sat(
-    data: Dict[str, Any],
-    tiempo_max_seg: int = 120
-) -> Dict[str, Any]:
-    
-    D       = data["distance_matrix"]
-    T       = data["duration_matrix"]
-    windows = data["time_windows"]
-    service = data.get("service_times", [SERVICE_TIME]*len(windows))
-    n       = len(D)
+REGRET_K       = 3                  # variante regret-k de la semilla por inserción
 
-     
-    visitados = [0]
-    restantes = set(range(1, n))
-    while restantes:
-        best_cost, best_j, best_pos = float('inf'), None, None
-        for j in restantes:
-            for pos in range(1, len(visitados)+1):
-                a = visitados[pos-1]
-                b = visitados[pos] if pos < len(visitados) else None
-
-                 
-                t_acc = SHIFT_START
-                for idx,node in enumerate(visitados[:pos]):
-                    if idx>0:
-                        prev = visitados[idx-1]
-                        t_acc += service[prev] + T[prev][node]
-
-                 
-                t_arr0 = t_acc + service[a] + T[a][j]
-
-                ini, fin = windows[j]
-                 
-                if t_arr0 < ini:
-                    wait_time = ini - t_arr0
-                    t_arr = ini
-                else:
-                    wait_time = 0
-                    t_arr = t_arr0
-
-                # si llega después de la franja horaria, descartar
-                if t_arr > fin + ALLOWED_LATE:
-                    continue
-
-                # coste  : distancia + tiempo + penalización por espera
-                penalty = min(wait_time, MAX_WAIT) * WAIT_WEIGHT
-                score = t_arr + D[a][j] + penalty
-
-                
-                if b is not None:
-                    score += D[j][b] - D[a][b]
-
-                if score < best_cost:
-                    best_cost, best_j, best_pos = score, j, pos
-
-        if best_j is None:
-            # no quedan nodos que visitar
+
+def _jornada(data: Dict[str, Any]):
+    """
+    Vehículo 0 del data model (algorithms.flota.vehiculos_de): (inicio, fin, t0, t_fin, fuera).
+    Sale de 'inicio' a t0 y debe llegar a 'fin' antes de t_fin; 'fuera' son las bases de otros
+    vehículos, que no se visitan. Sin turno en el data model: SHIFT_START / SHIFT_END.
+    """
+    v = vehiculos_de(data)[0]
+    if not data.get("vehicle_shifts"):
+        v["t0"], v["t_fin"] = SHIFT_START, SHIFT_END
+    fuera = nodos_base(data) - {v["inicio"], v["fin"]}
+    return v["inicio"], v["fin"], v["t0"], v["t_fin"], fuera
+
+
+def _seguir_circuito(siguiente: Dict[int, int], inicio: int = 0, fin: int = 0):
+    """Ruta [inicio, ...] siguiendo el sucesor de cada nodo (sin la base de fin ni el regreso)."""
+    ruta, cur = [inicio], siguiente.get(inicio)
+    while cur is not None and cur not in (inicio, fin):
+        ruta.append(cur)
+        cur = siguiente.get(cur)
+    return ruta
+
+
+class _AvisoCpSat(cp_model.CpSolverSolutionCallback):
+    """Pasa cada solución de CP-SAT (siempre mejora el objetivo) a un AvisoMejoras."""
+
+    def __init__(self, aviso, x, inicio=0, fin=0):
+        super().__init__()
+        self.aviso = aviso
+        self.x = x
+        self.inicio, self.fin = inicio, fin
+
+    def _ruta(self):
+        sucesor = {i: j for (i, j), b in self.x.items() if i != j and self.Value(b)}
+        return [_seguir_circuito(sucesor, self.inicio, self.fin)]
+
+    def on_solution_callback(self):
+        if self.aviso(self.ObjectiveValue(), self._ruta):
+            self.StopSearch()
+
+
+def _vigilar_estancamiento(solver, aviso, terminado: threading.Event, cada_seg=0.5):
+    """Hilo aparte: CP-SAT solo llama al callback con soluciones, no mientras se estanca."""
+    while not terminado.wait(cada_seg):
+        if aviso.estancado():
+            solver.StopSearch()
+            return
+
+# ----------------------------------
+#  SEMILLA POR INSERCIÓN (hint)
+# ----------------------------------
+
+def _tiempos_ruta(ruta, T, windows, service, t0=SHIFT_START, regreso=None):
+    """
+    Por posición de la ruta (sale de ruta[0] a t0, tiempos estáticos como el modelo):
+      llegada  → llegada efectiva (tras esperar a que abra la ventana)
+      espera   → cuánto se esperó ahí
+      holgura  → cuánto puede retrasarse esa llegada sin pasar ningún fin + ALLOWED_LATE
+                 desde ahí hasta el final de la ruta (las esperas absorben retraso) ni,
+                 con regreso = (fin, t_fin), llegar a la base de fin después de t_fin
+    """
+    llegada, espera = [t0], [0]
+    for prev, cur in zip(ruta, ruta[1:]):
+        t = llegada[-1] + service[prev] + T[prev][cur]
+        llegada.append(max(t, windows[cur][0]))
+        espera.append(llegada[-1] - t)
+    holgura = [0] * len(ruta)
+    sig = float("inf")
+    if regreso is not None:
+        fin, t_fin = regreso
+        sig = t_fin - (llegada[-1] + service[ruta[-1]] + T[ruta[-1]][fin])
+    for p in range(len(ruta) - 1, -1, -1):
+        holgura[p] = min(windows[ruta[p]][1] + ALLOWED_LATE - llegada[p], sig)
+        sig = espera[p] + holgura[p]
+    return llegada, espera, holgura
+
+
+def _insertar_en_tiempos(ruta, pos, tiempos, T, windows, service, regreso):
+    """
+    Actualiza en el lugar (llegada, espera, holgura) de _tiempos_ruta tras insertar ruta[pos]:
+    llegadas hacia adelante desde pos hasta la primera que no cambia (de ahí en adelante la
+    ruta es la misma) y holguras hacia atrás desde ese punto hasta el inicio.
+    """
+    llegada, espera, holgura = tiempos
+    for lista in tiempos:
+        lista.insert(pos, 0)
+    q = pos
+    while q < len(ruta):
+        prev, cur = ruta[q - 1], ruta[q]
+        t = llegada[q - 1] + service[prev] + T[prev][cur]
+        nueva = max(t, windows[cur][0])
+        igual = q > pos and nueva == llegada[q]
+        llegada[q], espera[q] = nueva, nueva - t
+        if igual:
             break
+        q += 1
+    if q < len(ruta):
+        sig = espera[q] + holgura[q]
+        q -= 1
+    else:
+        fin, t_fin = regreso
+        q = len(ruta) - 1
+        sig = t_fin - (llegada[q] + service[ruta[q]] + T[ruta[q]][fin])
+    for p in range(q, -1, -1):
+        holgura[p] = min(windows[ruta[p]][1] + ALLOWED_LATE - llegada[p], sig)
+        sig = espera[p] + holgura[p]
+
+
+def _semilla_insercion(data: Dict[str, Any], regret_k: int = 1):
+    """
+    Ruta [0, ...] por inserción con ventanas: en cada paso se evalúan a la vez (NumPy) todas
+    las paradas pendientes en todas las posiciones usando llegada / holgura de la ruta actual,
+    así cada par (parada, posición) cuesta O(1) y también se respetan las paradas siguientes.
+    Puntaje de una inserción, en las unidades del objetivo del modelo: distancia agregada +
+    WAIT_WEIGHT · (llegada a la parada + corrimiento de la siguiente × paradas que siguen).
+      regret_k = 1 → la inserción más barata;
+      regret_k > 1 → la parada con mayor arrepentimiento (suma de diferencias entre su mejor
+                     posición y las k-1 siguientes): primero las que se quedan sin opciones.
+    Las paradas que no caben en ninguna posición quedan fuera. La ruta sale de la base de
+    inicio del vehículo a la hora de su turno y debe poder llegar a su base de fin (_jornada).
+    """
+    inicio, fin, t0, t_fin, fuera = _jornada(data)
+    D = np.asarray(data["distance_matrix"], dtype=np.float64)
+    T = np.asarray(data["duration_matrix"], dtype=np.int64)
+    windows = data["time_windows"]
+    n = len(D)
+    service = np.asarray(data.get("service_times", [SERVICE_TIME] * n), dtype=np.int64)
+    w0 = np.asarray([w[0] for w in windows], dtype=np.int64)
+    w1 = np.asarray([w[1] for w in windows], dtype=np.int64) + ALLOWED_LATE
+    T_l, s_l = T.tolist(), service.tolist()
+
+    ruta = [inicio]
+    restantes = np.asarray([j for j in range(n) if j not in {inicio, fin} | fuera], dtype=np.int64)
+    tiempos = _tiempos_ruta(ruta, T_l, windows, s_l, t0, (fin, t_fin))
+    llegada, _, holgura = tiempos
+    while len(restantes):
+        nodos = np.asarray(ruta)
+        lleg = np.asarray(llegada, dtype=np.int64)
+        # Insertar j después de la posición p (a = ruta[p], b = ruta[p+1] si existe): L × m
+        t_raw = (lleg + service[nodos])[:, None] + T[np.ix_(nodos, restantes)]
+        t_j = np.maximum(t_raw, w0[restantes])
+        ok = t_raw <= w1[restantes]
+        # Al final de la ruta: desde j aún se llega a la base de fin dentro del turno
+        ok[-1] &= t_j[-1] + service[restantes] + T[restantes, fin] <= t_fin
+        puntaje = (D[np.ix_(nodos, restantes)] + WAIT_WEIGHT * t_j).astype(np.float64)
+        if len(ruta) > 1:
+            b = nodos[1:]
+            t_b = (t_j[:-1] + service[restantes]) + T[np.ix_(restantes, b)].T
+            corrimiento = np.maximum(t_b, w0[b][:, None]) - lleg[1:, None]
+            ok[:-1] &= corrimiento <= np.asarray(holgura[1:], dtype=np.float64)[:, None]
+            despues = np.arange(len(ruta) - 1, 0, -1)[:, None]
+            puntaje[:-1] += (D[np.ix_(restantes, b)].T - D[nodos[:-1], b][:, None]
+                             + WAIT_WEIGHT * np.maximum(corrimiento, 0) * despues)
+        puntaje[~ok] = np.inf
+
+        mejor_pos = puntaje.argmin(axis=0)
+        mejor = puntaje[mejor_pos, np.arange(len(restantes))]
+        factibles = np.isfinite(mejor)
+        if not factibles.any():
+            break
+        if regret_k > 1 and len(ruta) > 1:
+            kk = min(regret_k, puntaje.shape[0])
+            top = np.partition(puntaje, kk - 1, axis=0)[:kk]
+            base = np.where(factibles, mejor, 0.0)
+            top = np.where(np.isfinite(top), top, base + 1e12)
+            arrepentimiento = np.where(factibles, (top - base).sum(axis=0), -np.inf)
+            col = int(np.lexsort((mejor, -arrepentimiento))[0])
+        else:
+            col = int(np.where(factibles, mejor, np.inf).argmin())
 
-        visitados.insert(best_pos, best_j)
-        restantes.remove(best_j)
+        pos = int(mejor_pos[col]) + 1
+        ruta.insert(pos, int(restantes[col]))
+        restantes = np.delete(restantes, col)
+        _insertar_en_tiempos(ruta, pos, tiempos, T_l, windows, s_l, (fin, t_fin))
+    return ruta
 
-    init_route = visitados
 
-    #Modelo CP-SAT
-    model = cp_model.CpModel()
+def _costo_hint(ruta, D, T, windows, service, t0=SHIFT_START, fin=0):
+    """Objetivo del modelo para la ruta (distancia con regreso a fin + WAIT_WEIGHT · suma de llegadas)."""
+    eta, costo = t0, WAIT_WEIGHT * t0
+    for prev, cur in zip(ruta, ruta[1:]):
+        eta = max(eta + service[prev] + T[prev][cur], windows[cur][0])
+        costo += D[prev][cur] + WAIT_WEIGHT * eta
+    return costo + D[ruta[-1]][fin]
 
-    # Bool x[i,j] = 1 si voy de i a j
-    x = {}
-    for i in range(n):
-        for j in range(n):
-            if i == j: continue
-            b = model.NewBoolVar(f"x_{i}_{j}")
-            # bloqueo de arcos muy largos
-            if T[i][j] > MAX_TRAVEL:
-                model.Add(b == 0)
-            x[i,j] = b
-
-    # Tiempo de llegada t[i]
-    horizon = SHIFT_END + ALLOWED_LATE
-    t = [model.NewIntVar(0, horizon, f"t_{i}") for i in range(n)]
-
-    # MTZ para subtours
-    u = [model.NewIntVar(0, n-1, f"u_{i}") for i in range(n)]
-
-    # flujos de grado
-    for j in range(1, n):
-        model.Add(sum(x[i,j] for i in range(n) if i!=j) == 1)
-    for i in range(1, n):
-        model.Add(sum(x[i,j] for j in range(n) if j!=i) == 1)
-    model.Add(sum(x[0,j] for j in range(1,n)) == 1)
-    model.Add(sum(x[i,0] for i in range(1,n)) == 1)
-
-    # ventana del depósito
-    model.Add(t[0] == SHIFT_START)
-
-    # ventanas de tiempo (con tardanza hasta ALLOWED_LATE)
-    for i, (ini, fin) in enumerate(windows):
-        model.Add(t[i] >= ini)
-        model.Add(t[i] <= fin + ALLOWED_LATE)
-
-    # secuencia temporal si x[i,j]==1
+
+# ----------------------------------
+#  MODELO CP-SAT
+# ----------------------------------
+
+def _arcos_admisibles(data: Dict[str, Any], service):
+    """
+    Arcos i -> j que pueden estar en una ruta del vehículo de _jornada:
+      - entre paradas, viaje ≤ MAX_TRAVEL;
+      - compatibles con las ventanas: saliendo de i lo antes posible se llega a j antes de
+        su fin + ALLOWED_LATE;
+      - salir de la base de inicio o ir a la de fin siempre (su hora límite la lleva el modelo);
+        si son distintas, la de fin solo cierra el circuito hacia la de inicio;
+      - las bases de otros vehículos no tienen arcos;
+      - si data trae "neighbors", solo sus arcos.
+    Retorna (arcos, cota inferior de llegada por nodo).
+    """
+    T = data["duration_matrix"]
+    windows = data["time_windows"]
+    vecinos = data.get("neighbors")
+    n = len(T)
+    inicio, fin, t0, _, fuera = _jornada(data)
+    temprano = [windows[i][0] for i in range(n)]
+    temprano[inicio] = t0
+    arcos = []
+    if fin != inicio:
+        arcos.append((fin, inicio))
     for i in range(n):
+        if i in fuera or (i == fin and fin != inicio):
+            continue
+        sale = temprano[i] + service[i]
+        fila = T[i]
         for j in range(n):
-            if i==j: continue
-            model.Add(
-                t[j] >= t[i] + service[i] + T[i][j]
-            ).OnlyEnforceIf(x[i,j])
-
-    # MTZ subtours
-    model.Add(u[0] == 0)
-    for i in range(1,n):
-        for j in range(1,n):
-            if i!=j:
-                model.Add(u[i] + 1 <= u[j] + n*(1 - x[i,j]))
+            if i == j or j in fuera or (j == inicio and fin != inicio):
+                continue
+            if vecinos is not None and not vecinos.contiene(i, j):
+                continue
+            if j == fin:
+                arcos.append((i, j))
+                continue
+            if i != inicio and fila[j] > MAX_TRAVEL:
+                continue
+            if sale + fila[j] > windows[j][1] + ALLOWED_LATE:
+                continue
+            arcos.append((i, j))
+    # Cota de llegada: la ventana o lo antes que se llega desde algún predecesor admisible
+    desde = [None] * n
+    for i, j in arcos:
+        if j != inicio:
+            llega = temprano[i] + service[i] + T[i][j]
+            desde[j] = llega if desde[j] is None else min(desde[j], llega)
+    cota = [max(temprano[j], desde[j] or 0) for j in range(n)]
+    cota[inicio] = t0
+    return arcos, cota
+
+
+def _modelo_circuito(data: Dict[str, Any], service):
+    """
+    Modelo de un vehículo con AddCircuit (sin MTZ): un literal por arco admisible
+    (_arcos_admisibles) y la secuencia temporal t[j] >= t[i] + servicio + viaje solo si el arco
+    se usa. El vehículo sale de su base de inicio al comienzo del turno y llega a su base de fin
+    (regreso) antes del fin del turno (_jornada); las bases de otros vehículos quedan fuera del
+    circuito. Cada parada tiene además un intervalo de servicio [t, t + servicio) y
+    AddNoOverlap sobre todos ellos: redundante con las implicaciones por arco, pero CP-SAT
+    propaga mejor las ventanas con él.
+    Retorna (model, x, t, regreso), o None si alguna parada no tiene arcos de entrada o de salida.
+    """
+    D = data["distance_matrix"]
+    T = data["duration_matrix"]
+    windows = data["time_windows"]
+    n = len(D)
+    inicio, fin, t0, t_fin, fuera = _jornada(data)
+    paradas = [i for i in range(n) if i not in {inicio, fin} | fuera]
+    arcos, cota = _arcos_admisibles(data, service)
+    entra, sale = [0] * n, [0] * n
+    for i, j in arcos:
+        sale[i] += 1
+        entra[j] += 1
+    if paradas and min(min(entra[i], sale[i]) for i in paradas) == 0:
+        return None
+
+    model = cp_model.CpModel()
+    x = {(i, j): model.NewBoolVar(f"x_{i}_{j}") for i, j in arcos}
+    for i in fuera:
+        x[i, i] = model.NewConstant(1)   # lazo: el nodo no está en el circuito
+    if len(x) > 1:
+        model.AddCircuit([(i, j, b) for (i, j), b in x.items()])
+
+    # Llegada t[i] dentro de su ventana (con tardanza hasta ALLOWED_LATE) y antes del fin del turno
+    t = [None] * n
+    t[inicio] = model.NewConstant(t0)
+    for i in paradas:
+        t[i] = model.NewIntVar(cota[i], max(cota[i], min(windows[i][1] + ALLOWED_LATE, t_fin)), f"t_{i}")
+    regreso = model.NewIntVar(t0, max(t0, t_fin), "regreso")
+    for (i, j), b in x.items():
+        if i == j or i == fin != inicio:
+            continue
+        llega = regreso if j == fin else t[j]
+        model.Add(llega >= t[i] + service[i] + T[i][j]).OnlyEnforceIf(b)
+    model.AddNoOverlap([
+        model.NewFixedSizeIntervalVar(t[i], max(1, int(service[i])), f"servicio_{i}") for i in [inicio] + paradas
+    ])
 
     # objetivo: distancia + penalización por tiempo total (esperas + tardanzas)
     model.Minimize(
-        sum(D[i][j] * x[i,j] for (i,j) in x)
-        + WAIT_WEIGHT * sum(t[i] for i in range(n))
+        sum(D[i][j] * b for (i, j), b in x.items() if i != j)
+        + WAIT_WEIGHT * sum(t[i] for i in [inicio] + paradas)
     )
+    return model, x, t, regreso
 
-    
-    for a,b in zip(init_route, init_route[1:]):
-        model.AddHint(x[a,b], 1)
-    for pos, node in enumerate(init_route):
-        model.AddHint(u[node], pos)
-    eta = SHIFT_START
-    model.AddHint(t[0], eta)
+
+def optimizar_ruta_cp_sat(
+    data: Dict[str, Any],
+    tiempo_max_seg: int = 120,
+    num_workers: int = None,
+    on_improvement=None,
+    estancamiento_seg: float = None
+) -> Dict[str, Any]:
+    """
+    Un vehículo: semilla por inserción + modelo CP-SAT (circuito) con la semilla como hint.
+    on_improvement (algorithms.progreso) recibe la semilla y cada solución de CP-SAT,
+    con el mismo objetivo (distancia + WAIT_WEIGHT · suma de llegadas). Con estancamiento_seg
+    la búsqueda termina si en ese lapso el objetivo no mejora más de UMBRAL_MEJORA.
+    """
+    aviso = aviso_mejoras(on_improvement, estancamiento_seg)
+
+    D       = data["distance_matrix"]
+    T       = data["duration_matrix"]
+    windows = data["time_windows"]
+    service = data.get("service_times", [SERVICE_TIME]*len(windows))
+    inicio, fin, t0, _, _ = _jornada(data)
+
+    # Semilla: inserción más barata y regret-k; se queda la que visita más paradas y,
+    # a igualdad, la de menor objetivo
+    semillas = [_semilla_insercion(data, regret_k=k) for k in (1, REGRET_K)]
+    visitados = min(semillas, key=lambda r: (-len(r), _costo_hint(r, D, T, windows, service, t0, fin)))
+
+    init_route = visitados
+
+    # Modelo CP-SAT (circuito sobre arcos admisibles)
+    modelo = _modelo_circuito(data, service)
+    if modelo is None:
+        # Alguna parada sin arcos de entrada o salida admisibles: el modelo sería infactible
+        return _fallback_insertion(data)
+    model, x, t, regreso = modelo
+
+    cierre = [fin, inicio] if fin != inicio else [fin]
+    for a, b in zip(init_route, init_route[1:] + cierre):
+        if (a, b) in x:
+            model.AddHint(x[a, b], 1)
+    eta = t0
     for prev, curr in zip(init_route, init_route[1:]):
         eta = max(eta + service[prev] + T[prev][curr], windows[curr][0])
         model.AddHint(t[curr], eta)
+    if on_improvement is not None:
+        aviso(_costo_hint(init_route, D, T, windows, service, t0, fin), [init_route])
 
     # 4) Resolver
     solver = cp_model.CpSolver()
     solver.parameters.max_time_in_seconds = tiempo_max_seg
-    status = solver.Solve(model)
+    if num_workers:
+        solver.parameters.num_workers = num_workers   # p. ej. al correr en paralelo con otros motores
+    terminado = threading.Event()
+    if estancamiento_seg is not None:
+        threading.Thread(target=_vigilar_estancamiento, args=(solver, aviso, terminado), daemon=True).start()
+    try:
+        status = solver.Solve(model, _AvisoCpSat(aviso, x, inicio, fin) if aviso is not None else None)
+    finally:
+        terminado.set()
 
     # 5) Si falla, se reintenta
     if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
         return _fallback_insertion(data)
 
     # 6) Extraer la ruta
-    ruta, llegada = [0], [solver.Value(t[0])]
-    cur = 0
-    seen = {0}
-    while True:
-        nxt = next(
-            (j for j in range(n)
-             if j not in seen and solver.Value(x[cur,j])==1),
-            None
-        )
-        if nxt is None:
-            break
-        ruta.append(nxt)
-        llegada.append(solver.Value(t[nxt]))
-        seen.add(nxt)
-        cur = nxt
+    ruta = _seguir_circuito({i: j for (i, j), b in x.items() if i != j and solver.Value(b)}, inicio, fin)
+    llegada = [solver.Value(t[i]) for i in ruta]
+    # 'regreso' solo es una cota (no está en el objetivo): la llegada a la base se recalcula
+    regreso = llegada[-1] + service[ruta[-1]] + T[ruta[-1]][fin]
 
     dist_total = sum(D[a][b] for a,b in zip(ruta, ruta[1:]))
 
     return {
-        "routes":[{"vehicle":0,"route":ruta,"arrival_sec":llegada}],
+        "routes":[{"vehicle":0,"route":ruta,"arrival_sec":llegada,
+                   "end_node":fin,"end_sec":regreso}],
         "distance_total_m": dist_total
     }
 
@@ -189,13 +405,15 @@ def _fallback_insertion(data: Dict[str, Any]) -> Dict[str, Any]:
     windows  = data["time_windows"]
     service  = data.get("service_times", [SERVICE_TIME] * len(windows))
     n        = len(D)
+    # (las variables ini / fin de abajo son ventanas: la base de fin queda en nodo_fin)
+    inicio, nodo_fin, t0, _, fuera = _jornada(data)
 
-    visitados = [0]
-    llegada   = [SHIFT_START]
-    restantes = set(range(1, n))
+    visitados = [inicio]
+    llegada   = [t0]
+    restantes = set(range(n)) - {inicio, nodo_fin} - fuera
 
-    t_actual = SHIFT_START
-    nodo_act = 0
+    t_actual = t0
+    nodo_act = inicio
 
     AJUSTADA_MAX   = 30*60   # 30 minutos
     INSERCION_MAX  = 30*60   # puede esperar 30 min si falta poco para que abra una ventana de tiempo
@@ -211,7 +429,7 @@ def _fallback_insertion(data: Dict[str, Any]) -> Dict[str, Any]:
 
         if ajustadas_pendientes:
             ini_v, j_v = ajustadas_pendientes[0]
-            travel_v   = T[nodo_act][j_v]
+            travel_v   = tiempo_viaje(data, nodo_act, j_v, t_actual + service[nodo_act])
             eta_v      = t_actual + service[nodo_act] + travel_v
             espera_v   = ini_v - eta_v
 
@@ -228,7 +446,7 @@ def _fallback_insertion(data: Dict[str, Any]) -> Dict[str, Any]:
          
         candidatos = []
         for j in restantes:
-            travel     = T[nodo_act][j]
+            travel     = tiempo_viaje(data, nodo_act, j, t_actual + service[nodo_act])
             eta        = t_actual + service[nodo_act] + travel
             ini, fin   = windows[j]
             t_llegada  = max(eta, ini)
@@ -243,7 +461,7 @@ def _fallback_insertion(data: Dict[str, Any]) -> Dict[str, Any]:
         if not candidatos:
             # último recurso
             for j in restantes:
-                eta = t_actual + service[nodo_act] + T[nodo_act][j]
+                eta = t_actual + service[nodo_act] + tiempo_viaje(data, nodo_act, j, t_actual + service[nodo_act])
                 t_llegada = max(eta, windows[j][0])
                 best_j = j
                 break
@@ -259,21 +477,27 @@ def _fallback_insertion(data: Dict[str, Any]) -> Dict[str, Any]:
 
     # recalcular ruta final
     llegada_final = []
-    t_now = SHIFT_START
+    t_now = t0
     for idx, node in enumerate(visitados):
         if idx > 0:
             prev = visitados[idx - 1]
-            t_now += service[prev] + T[prev][node]
+            t_now += service[prev]
+            t_now += tiempo_viaje(data, prev, node, t_now)
         t_now = max(t_now, windows[node][0])
         llegada_final.append(t_now)
 
+    # Regreso a la base de fin (como en el camino principal, tras el servicio de la última parada)
+    t_sal = llegada_final[-1] + service[visitados[-1]]
+    regreso = t_sal + tiempo_viaje(data, visitados[-1], nodo_fin, t_sal)
+
     dist_total = sum(
         D[visitados[i]][visitados[i + 1]]
         for i in range(len(visitados) - 1)
     )
 
     return {
-        "routes": [{"vehicle": 0, "route": visitados, "arrival_sec": llegada_final}],
+        "routes": [{"vehicle": 0, "route": visitados, "arrival_sec": llegada_final,
+                    "end_node": nodo_fin, "end_sec": regreso}],
         "distance_total_m": dist_total
     }
 
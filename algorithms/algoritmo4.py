@@ -3,6 +3,9 @@ import copy
 import math
 from datetime import datetime
 
+from algorithms.flota import vehiculos_de
+from algorithms.progreso import aviso_mejoras
+
 # Configuración de la ruta
 SERVICE_TIME = 8 * 60  # 10 minutos en segundos
 SHIFT_START_SEC = 8 * 3600 + 30*60 # 8:30 AM
@@ -11,17 +14,25 @@ MAX_TIEMPO_ENTRE_PUNTOS = 25 * 60
 PENALIZACION_SALTOS_LARGOS = 50
 
 class LNSOptimizer:
-    def __init__(self, dist_matrix, dur_matrix, time_windows, vehiculos=1, tiempo_max=120):
+    def __init__(self, dist_matrix, dur_matrix, time_windows, vehiculos=1, tiempo_max=120, perfil=None, vecinos=None,
+                 flota=None, demandas=None, on_improvement=None, estancamiento_seg=None):
         # Validar matrices de entrada
         if len(dist_matrix) != len(dur_matrix) or len(dist_matrix) != len(time_windows):
             raise ValueError("Las matrices y ventanas de tiempo deben tener el mismo tamaño")
         
         self.dist_matrix = dist_matrix
         self.dur_matrix = dur_matrix
+        self.perfil = perfil  # PerfilTiempos opcional: duración según hora de salida
         self.time_windows = time_windows
         self.n = len(dist_matrix)  # Número total de nodos (incluyendo depósito)
         self.vehiculos = vehiculos
         self.tiempo_max = tiempo_max
+        # VecinosCSR opcional: al reinsertar un punto solo se prueban posiciones junto a sus vecinos
+        self.cercanos = None
+        if vecinos is not None:
+            self.cercanos = [set(vecinos.sucesores(p).tolist()) for p in range(self.n)]
+            for p, pred in enumerate(vecinos.predecesores()):
+                self.cercanos[p].update(pred)
         
         # Solución
         self.mejor_solucion = None
@@ -34,13 +45,49 @@ class LNSOptimizer:
         self.hora_inicio = SHIFT_START_SEC
         self.hora_fin = SHIFT_END_SEC
 
-    def calcular_costo_ruta(self, ruta, strict=False):
+        # Flota (algorithms.flota.vehiculos_de): cada ruta sale de su base de inicio al comienzo
+        # de su turno y vuelve a su base de fin; las rutas solo contienen paradas.
+        self.flota = flota
+        self.demandas = demandas
+        # algorithms.progreso: se avisa cada vez que baja mejor_costo
+        self.on_improvement = on_improvement
+        self.estancamiento_seg = estancamiento_seg   # algorithms.presupuesto: corte por estancamiento
+        self.bases = set()
+        if flota is not None:
+            self.vehiculos = len(flota)
+            self.bases = {v["inicio"] for v in flota} | {v["fin"] for v in flota}
+
+    def _duracion(self, i, j, t_salida):
+        if self.perfil is not None:
+            return self.perfil.duracion(i, j, t_salida)
+        return self.dur_matrix[i][j]
+
+    def _ruta_completa(self, ruta, v):
+        """Ruta del vehículo v con sus bases: [inicio] + paradas + [fin]; sin flota, la ruta tal cual."""
+        if self.flota is None or v is None:
+            return ruta
+        return [self.flota[v]["inicio"]] + ruta + [self.flota[v]["fin"]]
+
+    def calcular_costo_ruta(self, ruta, strict=False, v=None):
+        if self.flota is not None and v is not None:
+            veh = self.flota[v]
+            hora_inicio, hora_fin = veh["t0"], veh["t_fin"]
+            penalizacion = 0
+            if self.demandas is not None:
+                exceso = sum(self.demandas[p] for p in ruta) - veh["capacidad"]
+                if exceso > 0:
+                    if strict:
+                        return float('inf')
+                    penalizacion += exceso * 1000
+            ruta = self._ruta_completa(ruta, v)
+        else:
+            hora_inicio, hora_fin = self.hora_inicio, self.hora_fin
+            penalizacion = 0
         if len(ruta) < 1:
             return float('inf')
     
         costo = 0
-        penalizacion = 0
-        tiempo_actual = self.hora_inicio
+        tiempo_actual = hora_inicio
         
         for i in range(len(ruta)):
             punto = ruta[i]
@@ -48,7 +95,7 @@ class LNSOptimizer:
             
             # Tiempo de llegada al punto
             if i > 0:
-                tiempo_viaje = self.dur_matrix[ruta[i-1]][punto]
+                tiempo_viaje = self._duracion(ruta[i-1], punto, tiempo_actual)
                 tiempo_actual += tiempo_viaje
                 costo += tiempo_viaje
                 
@@ -68,15 +115,15 @@ class LNSOptimizer:
             tiempo_actual += self.tiempo_servicio
             
             # Verificar fin de jornada
-            if tiempo_actual > self.hora_fin:
+            if tiempo_actual > hora_fin:
                 if strict:
                     return float('inf')
-                penalizacion += (tiempo_actual - self.hora_fin) * 5
+                penalizacion += (tiempo_actual - hora_fin) * 5
         
         return costo + penalizacion
     
     def construir_solucion_inicial(self):
-        puntos = list(range(self.n))
+        puntos = [p for p in range(self.n) if p not in self.bases]
         random.shuffle(puntos)
         
         rutas = []
@@ -136,15 +183,25 @@ class LNSOptimizer:
     
         return solucion_dest, removidos
 
+    def _posiciones(self, ruta, punto):
+        """Posiciones de inserción a evaluar: todas, o solo las contiguas a vecinos del punto."""
+        todas = range(len(ruta) + 1)
+        if self.cercanos is None:
+            return todas
+        cerca = self.cercanos[punto]
+        pos = [j for j in todas
+               if (j > 0 and ruta[j-1] in cerca) or (j < len(ruta) and ruta[j] in cerca)]
+        return pos or todas
+
     def reparar_solucion(self, solucion, removidos):
         for punto in removidos:
             mejor_costo = float('inf')
             mejor_posicion = (0, 0)   
             
             for i_ruta, ruta in enumerate(solucion):
-                for j in range(len(ruta) + 1):
+                for j in self._posiciones(ruta, punto):
                     ruta_temp = ruta[:j] + [punto] + ruta[j:]
-                    costo = self.calcular_costo_ruta(ruta_temp, strict=False)
+                    costo = self.calcular_costo_ruta(ruta_temp, strict=False, v=i_ruta)
                     
                     if costo < mejor_costo:
                         mejor_costo = costo
@@ -158,18 +215,21 @@ class LNSOptimizer:
     def optimizar(self):
         """Algoritmo LNS con garantía de cobertura completa"""
         solucion_actual = self.construir_solucion_inicial()
-        costo_actual = sum(self.calcular_costo_ruta(r, strict=False) for r in solucion_actual)
+        costo_actual = self._costo_total(solucion_actual)
         
         self.mejor_solucion = copy.deepcopy(solucion_actual)
         self.mejor_costo = costo_actual
+        aviso = aviso_mejoras(self.on_improvement, self.estancamiento_seg)
+        detener = aviso is not None and aviso(self.mejor_costo, lambda: self._rutas_con_inicio(self.mejor_solucion))
         
         inicio = datetime.now()
         iteracion = 0
         
-        while (datetime.now() - inicio).seconds < self.tiempo_max and iteracion < self.iteraciones:
+        while (not detener and (datetime.now() - inicio).seconds < self.tiempo_max
+               and iteracion < self.iteraciones and not (aviso is not None and aviso.estancado())):
             solucion_dest, removidos = self.destruir_solucion(solucion_actual)
             nueva_solucion = self.reparar_solucion(solucion_dest, removidos)
-            nuevo_costo = sum(self.calcular_costo_ruta(r, strict=False) for r in nueva_solucion)
+            nuevo_costo = self._costo_total(nueva_solucion)
             
             if nuevo_costo < costo_actual or random.random() < 0.1:
                 solucion_actual = nueva_solucion
@@ -178,11 +238,13 @@ class LNSOptimizer:
                 if nuevo_costo < self.mejor_costo:
                     self.mejor_solucion = copy.deepcopy(nueva_solucion)
                     self.mejor_costo = nuevo_costo
+                    if aviso is not None:
+                        detener = aviso(self.mejor_costo, lambda: self._rutas_con_inicio(self.mejor_solucion))
             
             iteracion += 1
         
         # Verificación final de cobertura
-        puntos_cubiertos = {p for ruta in self.mejor_solucion for p in ruta}
+        puntos_cubiertos = {p for ruta in self.mejor_solucion for p in ruta} | self.bases
         if len(puntos_cubiertos) != self.n:
             puntos_faltantes = set(range(self.n)) - puntos_cubiertos
             for punto in puntos_faltantes:
@@ -190,6 +252,14 @@ class LNSOptimizer:
         
         return self._formatear_solucion()
 
+    def _rutas_con_inicio(self, solucion):
+        """Rutas como en el resultado: con flota, cada una empieza en su base de inicio."""
+        if self.flota is None:
+            return solucion
+        return [[self.flota[v]["inicio"]] + r for v, r in enumerate(solucion)]
+
+    def _costo_total(self, solucion):
+        return sum(self.calcular_costo_ruta(r, strict=False, v=i) for i, r in enumerate(solucion))
 
     def _insertar_punto_forzado(self, punto):
         """Inserta un punto en la posición menos mala (último recurso)"""
@@ -199,7 +269,7 @@ class LNSOptimizer:
         for i_ruta, ruta in enumerate(self.mejor_solucion):
             for j in range(len(ruta) + 1):
                 ruta_temp = ruta[:j] + [punto] + ruta[j:]
-                costo = self.calcular_costo_ruta(ruta_temp, strict=False)
+                costo = self.calcular_costo_ruta(ruta_temp, strict=False, v=i_ruta)
                 
                 if costo < mejor_costo:
                     mejor_costo = costo
@@ -225,27 +295,38 @@ class LNSOptimizer:
         for i, ruta in enumerate(self.mejor_solucion):
             if not ruta:  # Si la ruta está vacía
                 continue
-                
-            tiempos = []
+
+            fin = None
             tiempo_actual = self.hora_inicio
-            
+            if self.flota is not None:
+                # La ruta reportada empieza en la base de inicio; la base de fin va aparte
+                tiempo_actual = self.flota[i]["t0"]
+                fin = self.flota[i]["fin"]
+                ruta = [self.flota[i]["inicio"]] + ruta
+
+            tiempos = []
             for j in range(len(ruta)):
                 # Calcular tiempo de llegada
                 if j > 0:
                     distancia_total += self.dist_matrix[ruta[j-1]][ruta[j]]
-                    tiempo_actual += self.dur_matrix[ruta[j-1]][ruta[j]]
+                    tiempo_actual += self._duracion(ruta[j-1], ruta[j], tiempo_actual)
                 
                 tw_start, _ = self.time_windows[ruta[j]]
                 tiempo_actual = max(tiempo_actual, tw_start)
                 tiempos.append(tiempo_actual)
                 tiempo_actual += self.tiempo_servicio
             
-            rutas_formateadas.append({
+            ruta_fmt = {
                 'vehicle': i,
                 'route': ruta,
                 'arrival_sec': tiempos,
                 'num_points': len(ruta)
-            })
+            }
+            if fin is not None:
+                distancia_total += self.dist_matrix[ruta[-1]][fin]
+                ruta_fmt['end_node'] = fin
+                ruta_fmt['end_sec'] = tiempo_actual + self._duracion(ruta[-1], fin, tiempo_actual)
+            rutas_formateadas.append(ruta_fmt)
         
         return {
             'routes': rutas_formateadas,
@@ -253,8 +334,8 @@ class LNSOptimizer:
             'distance_total_m': distancia_total,
         }
 
-def optimizar_ruta_lns(data, tiempo_max_seg=120):
-    """Función principal para integración"""
+def optimizar_ruta_lns(data, tiempo_max_seg=120, on_improvement=None, estancamiento_seg=None):
+    """Función principal para integración (on_improvement / estancamiento_seg: ver algorithms.progreso)"""
     required = ['distance_matrix', 'duration_matrix', 'time_windows']
     if not all(k in data for k in required):
         raise ValueError(f"Faltan datos requeridos: {required}")
@@ -265,7 +346,13 @@ def optimizar_ruta_lns(data, tiempo_max_seg=120):
         dur_matrix=data['duration_matrix'],
         time_windows=data['time_windows'],
         vehiculos=data.get('num_vehicles', 1),
-        tiempo_max=tiempo_max_seg
+        tiempo_max=tiempo_max_seg,
+        perfil=data.get('duration_profile'),
+        vecinos=data.get('neighbors'),
+        flota=vehiculos_de(data) if 'starts' in data else None,
+        demandas=data.get('demands'),
+        on_improvement=on_improvement,
+        estancamiento_seg=estancamiento_seg
     )
     
     return optimizador.optimizar()
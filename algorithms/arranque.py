@@ -0,0 +1,139 @@
+# algorithms/arranque.py
+# Arranque en caliente: una ruta ya resuelta (corrida anterior del mismo día o ruta del día
+# previo, desde el almacén local o la colección 'rutas' de Firestore) se proyecta sobre los
+# nodos actuales y se entrega a OR-Tools como asignación inicial (ReadAssignmentFromRoutes).
+#   → las paradas se reconocen por pedidoId y, si no, por coordenada redondeada (~11 m);
+#   → las que ya no existen se quitan; las nuevas se insertan donde menos alargan la ruta;
+#   → se respeta la capacidad de cada vehículo (el sobrante se reinserta en otro).
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from core.almacen_tiempos import CACHE_DIR
+from algorithms.flota import nodos_base, vehiculos_de
+
+DECIMALES_CLAVE = 4                      # ~11 m: el mismo cliente aunque cambie el pedido
+DIR_RUTAS = os.path.join(CACHE_DIR, "rutas")
+
+
+def clave_coord(lat, lon, decimales=DECIMALES_CLAVE) -> str:
+    return f"{round(float(lat), decimales):.{decimales}f},{round(float(lon), decimales):.{decimales}f}"
+
+
+# ===================== ALMACÉN LOCAL =====================
+
+def _ruta_archivo(fecha) -> str:
+    return os.path.join(DIR_RUTAS, f"rutas_{fecha}.json")
+
+
+def rutas_de_resultado(df_nodos, res) -> List[List[Dict[str, Any]]]:
+    """Paradas (sin bases) de cada vehículo de un resultado, como dicts pedidoId/lat/lon."""
+    rutas = []
+    for r in res["routes"]:
+        rutas.append([
+            {"pedidoId": str(df_nodos.loc[n, "id"]), "lat": float(df_nodos.loc[n, "lat"]), "lon": float(df_nodos.loc[n, "lon"])}
+            for n in r["route"] if df_nodos.loc[n, "tipo"] != "Base"
+        ])
+    return rutas
+
+
+def guardar_ruta_local(fecha, df_nodos, res) -> None:
+    """Guarda la última ruta resuelta del día en .cache/rutas/rutas_<fecha>.json."""
+    os.makedirs(DIR_RUTAS, exist_ok=True)
+    doc = {"fecha": str(fecha), "creado_en": datetime.now().isoformat(timespec="seconds"),
+           "rutas": rutas_de_resultado(df_nodos, res)}
+    tmp = _ruta_archivo(fecha) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False)
+    os.replace(tmp, _ruta_archivo(fecha))
+
+
+def cargar_ruta_local(fecha) -> Optional[List[List[Dict[str, Any]]]]:
+    try:
+        with open(_ruta_archivo(fecha), encoding="utf-8") as f:
+            return json.load(f)["rutas"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def rutas_desde_doc(doc) -> Optional[List[List[Dict[str, Any]]]]:
+    """Documento de la colección 'rutas' (paradas con orden y, opcional, vehiculo) -> rutas."""
+    if not doc or not doc.get("paradas"):
+        return None
+    por_veh = {}
+    for p in sorted(doc["paradas"], key=lambda p: p.get("orden", 0)):
+        por_veh.setdefault(int(p.get("vehiculo", 0)), []).append(p)
+    return [por_veh[v] for v in sorted(por_veh)]
+
+
+# ===================== PROYECCIÓN + REPARACIÓN =====================
+
+def mapear_rutas(rutas_previas, df_nodos, data: Dict[str, Any]) -> Optional[List[List[int]]]:
+    """
+    Rutas previas -> nodos actuales: una lista de nodos (sin inicio/fin) por vehículo,
+    lista para ReadAssignmentFromRoutes. None si ninguna parada previa sigue existiendo.
+    Las filas de df_nodos se llevan a nodos del solver con data["nodo_de_fila"] (varios
+    pedidos de un mismo sitio son un solo nodo).
+    """
+    if not rutas_previas:
+        return None
+    bases = nodos_base(data)
+    flota = vehiculos_de(data)
+    n_nodos = len(data["distance_matrix"])
+    demandas = data.get("demands") or [0] * n_nodos
+    nodo_de_fila = data.get("nodo_de_fila") or list(range(len(df_nodos)))
+
+    por_id = {}
+    por_coord = {}
+    for f in range(len(df_nodos)):
+        n = nodo_de_fila[f]
+        if n in bases:
+            continue
+        por_id[str(df_nodos.loc[f, "id"])] = n
+        por_coord.setdefault(clave_coord(df_nodos.loc[f, "lat"], df_nodos.loc[f, "lon"]), []).append(n)
+
+    usados = set()
+    rutas: List[List[int]] = [[] for _ in flota]
+    sobrantes: List[int] = []
+    for v, paradas in enumerate(rutas_previas):
+        for p in paradas:
+            n = por_id.get(str(p.get("pedidoId")))
+            if n is None or n in usados:
+                libres = [m for m in por_coord.get(clave_coord(p["lat"], p["lon"]), []) if m not in usados]
+                n = libres[0] if libres else None
+            if n is None:
+                continue          # la parada ya no existe
+            usados.add(n)
+            (rutas[v] if v < len(flota) else sobrantes).append(n)
+    if not usados:
+        return None
+
+    # Capacidad: lo que excede se reinserta como si fuera nuevo
+    for v, veh in enumerate(flota):
+        while rutas[v] and sum(demandas[n] for n in rutas[v]) > veh["capacidad"]:
+            sobrantes.append(rutas[v].pop())
+
+    nuevos = [n for n in range(n_nodos) if n not in bases and n not in usados] + sobrantes
+    for n in nuevos:
+        _insertar_mas_barato(n, rutas, flota, data, demandas)
+    return rutas
+
+
+def _insertar_mas_barato(n, rutas, flota, data, demandas) -> None:
+    """Inserta n donde menos aumenta la duración (entre inicio y fin de su vehículo)."""
+    T = data["duration_matrix"]
+    mejor = None
+    for v, veh in enumerate(flota):
+        if sum(demandas[m] for m in rutas[v]) + demandas[n] > veh["capacidad"]:
+            continue
+        sec = [veh["inicio"]] + rutas[v] + [veh["fin"]]
+        for pos in range(1, len(sec)):
+            a, b = sec[pos - 1], sec[pos]
+            delta = T[a][n] + T[n][b] - T[a][b]
+            if mejor is None or delta < mejor[0]:
+                mejor = (delta, v, pos - 1)
+    if mejor is not None:          # si no cabe en ningún vehículo lo decide el solver
+        _, v, pos = mejor
+        rutas[v].insert(pos, n)
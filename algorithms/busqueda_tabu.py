@@ -0,0 +1,375 @@
+# algorithms/busqueda_tabu.py
+# Búsqueda Tabu sobre varias rutas a la vez (fase de mejora de CW + Tabu, algoritmo2).
+# Vecindarios:
+#   2-opt           → invertir un tramo de una ruta;
+#   Or-opt          → mover un tramo de 1..MAX_TRAMO paradas a otro punto de la misma ruta;
+#   relocate        → moverlo a otra ruta (si cabe en su capacidad);
+#   cross-exchange  → intercambiar tramos de 1..MAX_TRAMO paradas entre dos rutas.
+# Listas granulares: solo se generan movimientos que crean un arco entre una parada y una de
+# sus K_GRANULAR más cercanas. El delta de distancia es O(1) (2-opt usa sumas acumuladas en
+# ambos sentidos, por si la matriz no es simétrica) y la factibilidad de ventanas se evalúa
+# con segmentos (algorithms.holguras) solo para los candidatos que se examinan, en orden de
+# delta. Con perfil horario se recorre la ruta candidata (función factible).
+# Cada iteración aplica el mejor movimiento admisible aunque empeore; los arcos que quita
+# quedan tabú TENENCIA iteraciones (salvo que el movimiento dé un nuevo mejor global).
+
+import time
+from collections import deque
+from operator import itemgetter
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+K_GRANULAR      = 10     # cercanas por parada
+MAX_TRAMO       = 3      # paradas por tramo en Or-opt / relocate / cross-exchange
+TENENCIA        = 15     # iteraciones que un arco quitado no puede volver
+ITER_SIN_MEJORA = 100    # iteraciones seguidas sin nuevo mejor antes de terminar
+EPS             = 1e-6
+
+# Tipos de movimiento (primer campo tras el delta)
+DOS_OPT, MOVER, CRUCE = 0, 1, 2
+
+
+def _cercanos(D, clientes: List[int], k: int = K_GRANULAR) -> Dict[int, List[int]]:
+    """Para cada cliente, sus k clientes más cercanos (distancia mínima en cualquier sentido)."""
+    if len(clientes) < 2:
+        return {u: [] for u in clientes}
+    idx = np.asarray(clientes)
+    sub = np.asarray(D, dtype=np.float64)[np.ix_(idx, idx)]
+    sub = np.minimum(sub, sub.T)
+    np.fill_diagonal(sub, np.inf)
+    kk = min(k, len(idx) - 1)
+    mejores = np.argpartition(sub, kk - 1, axis=1)[:, :kk]
+    return {u: idx[fila].tolist() for u, fila in zip(clientes, mejores)}
+
+
+class BusquedaTabu:
+    """
+    rutas[k] = [inicio, ..., fin] (ambos extremos incluidos, pueden ser el mismo depósito).
+    holguras[k] = Holguras con el turno de la ruta k, o None (entonces factible(k, ruta) decide).
+    capacidades[k] = capacidad de la ruta k o None (sin límite).
+    """
+
+    def __init__(self, data: Dict[str, Any], rutas: List[List[int]], holguras: List,
+                 capacidades: Optional[List] = None, factible=None):
+        self.D = data["distance_matrix"]
+        self.dem = data.get("demands") or [0] * len(self.D)
+        self.rutas = [list(r) for r in rutas]
+        self.holg = list(holguras)
+        self.usar_holg = all(h is not None for h in self.holg)
+        self.cap = list(capacidades) if capacidades is not None else [None] * len(rutas)
+        self.factible = factible
+        self.cercanos = _cercanos(self.D, sorted({u for r in self.rutas for u in r[1:-1]}))
+        self.pos: Dict[int, tuple] = {}
+        m = len(self.rutas)
+        self.F, self.B = [None] * m, [None] * m
+        self.pref, self.suf = [None] * m, [None] * m
+        self.tramos, self.cortes = [None] * m, [None] * m
+        self.carga = [0] * m
+        for k in range(m):
+            self._indexar(k)
+
+    # ---------- estado por ruta ----------
+
+    def _indexar(self, k: int):
+        """Posiciones, sumas acumuladas (ida y vuelta), carga y segmentos de la ruta k."""
+        r, D = self.rutas[k], self.D
+        F, B = [0.0], [0.0]
+        for t in range(len(r) - 1):
+            F.append(F[-1] + D[r[t]][r[t + 1]])
+            B.append(B[-1] + D[r[t + 1]][r[t]])
+        self.F[k], self.B[k] = F, B
+        for t in range(1, len(r) - 1):
+            self.pos[r[t]] = (k, t)
+        self.carga[k] = sum(self.dem[u] for u in r[1:-1])
+        self.tramos[k], self.cortes[k] = {}, {}
+        if self.usar_holg:
+            self.pref[k] = self.holg[k].prefijos(r)
+            self.suf[k] = self.holg[k].sufijos(r)
+
+    def distancia(self) -> float:
+        return sum(F[-1] for F in self.F)
+
+    def _tramo(self, k: int, a: int, b: int, invertido: bool = False):
+        """
+        Segmento de rutas[k][a..b] (paradas interiores), en orden o invertido; memorizado.
+        None si ya tiene retraso: alargarlo no lo reduce, así que se recuerda desde qué b
+        ninguna ruta que lo contenga es factible.
+        """
+        memo = self.tramos[k]
+        seg = memo.get((a, b, invertido))
+        if seg is not None:
+            return seg
+        corte = self.cortes[k].get((a, invertido))
+        if corte is not None and b >= corte:
+            return None
+        h, r = self.holg[k], self.rutas[k]
+        seg = h.nodo(r[a])
+        for t in range(a + 1, b + 1):
+            sig = memo.get((a, t, invertido))
+            if sig is None:
+                sig = h.unir(h.nodo(r[t]), seg) if invertido else h.unir(seg, h.nodo(r[t]))
+                if sig.retraso:
+                    self.cortes[k][(a, invertido)] = t
+                    return None
+                memo[(a, t, invertido)] = sig
+            seg = sig
+        return seg
+
+    # ---------- vecindarios ----------
+
+    def _movimientos(self) -> List[tuple]:
+        """Todos los movimientos granulares con su delta de distancia (sin revisar factibilidad)."""
+        D, rutas, pos, dem, cap, carga = self.D, self.rutas, self.pos, self.dem, self.cap, self.carga
+        movs = []
+        agregar = movs.append
+        for u, cerca in self.cercanos.items():
+            ku, i = pos[u]
+            ru = rutas[ku]
+            nu = len(ru)
+            for v in cerca:
+                kv, j = pos[v]
+                rv = rutas[kv]
+                if ku == kv:
+                    # 2-opt: invertir ru[a+1..b] crea el arco ru[a]-ru[b] (u-v)
+                    a, b = (i, j) if i < j else (j, i)
+                    if b - a >= 2:
+                        x, x1, y, y1 = ru[a], ru[a + 1], ru[b], ru[b + 1]
+                        F, B = self.F[ku], self.B[ku]
+                        d = (D[x][y] + D[x1][y1] - D[x][x1] - D[y][y1]
+                             + (B[b] - B[a + 1]) - (F[b] - F[a + 1]))
+                        agregar((d, DOS_OPT, ku, a, b))
+                    continue
+                # cross-exchange: ru[i+1..e1] <-> rv[j..e2], crea el arco u->v
+                nv = len(rv)
+                p2 = rv[j - 1]
+                q_uv = D[u][ru[i + 1]]
+                d_p2v = D[p2][v]
+                q1 = 0
+                for e1 in range(i + 1, min(i + MAX_TRAMO, nu - 2) + 1):
+                    s1f, s1l, q1_nodo = ru[i + 1], ru[e1], ru[e1 + 1]
+                    q1 += dem[ru[e1]]
+                    q2 = 0
+                    for e2 in range(j, min(j + MAX_TRAMO - 1, nv - 2) + 1):
+                        s2l, q2_nodo = rv[e2], rv[e2 + 1]
+                        q2 += dem[s2l]
+                        if cap[ku] is not None and carga[ku] - q1 + q2 > cap[ku]:
+                            continue
+                        if cap[kv] is not None and carga[kv] - q2 + q1 > cap[kv]:
+                            continue
+                        d = (D[u][v] + D[s2l][q1_nodo] + D[p2][s1f] + D[s1l][q2_nodo]
+                             - q_uv - D[s1l][q1_nodo] - d_p2v - D[s2l][q2_nodo])
+                        agregar((d, CRUCE, ku, i + 1, e1, kv, j, e2))
+
+            # Or-opt / relocate: tramo que empieza en u, a continuación de una cercana v (arco v->u),
+            # y tramo que termina en u, justo antes de una cercana v (arco u->v)
+            for l in range(1, MAX_TRAMO + 1):
+                for inicio, antes in ((i, False), (i - l + 1, True)):
+                    fin = inicio + l - 1
+                    if inicio < 1 or fin > nu - 2:
+                        continue
+                    s0, sl = ru[inicio], ru[fin]
+                    p, q = ru[inicio - 1], ru[fin + 1]
+                    quitar = D[p][q] - D[p][s0] - D[sl][q]
+                    qs = None
+                    for v in cerca:
+                        kv, j = pos[v]
+                        j_ins = j - 1 if antes else j   # antes de v / después de v
+                        if kv == ku:
+                            if inicio - 1 <= j_ins <= fin:
+                                continue
+                        elif cap[kv] is not None:
+                            if qs is None:
+                                qs = sum(dem[w] for w in ru[inicio:fin + 1])
+                            if carga[kv] + qs > cap[kv]:
+                                continue
+                        rv = rutas[kv]
+                        x, y = rv[j_ins], rv[j_ins + 1]
+                        d = quitar + D[x][s0] + D[sl][y] - D[x][y]
+                        agregar((d, MOVER, ku, inicio, fin, kv, j_ins))
+        return movs
+
+    def _arcos(self, mov):
+        """(arcos que crea, arcos que quita) el movimiento."""
+        tipo = mov[1]
+        if tipo == DOS_OPT:
+            _, _, k, a, b = mov
+            r = self.rutas[k]
+            return ((r[a], r[b]), (r[a + 1], r[b + 1])), ((r[a], r[a + 1]), (r[b], r[b + 1]))
+        if tipo == MOVER:
+            _, _, ku, ini, fin, kv, j = mov
+            ru, rv = self.rutas[ku], self.rutas[kv]
+            p, s0, sl, q = ru[ini - 1], ru[ini], ru[fin], ru[fin + 1]
+            x, y = rv[j], rv[j + 1]
+            return ((p, q), (x, s0), (sl, y)), ((p, s0), (sl, q), (x, y))
+        _, _, ku, i1, e1, kv, j, e2 = mov
+        ru, rv = self.rutas[ku], self.rutas[kv]
+        p1, s1f, s1l, q1 = ru[i1 - 1], ru[i1], ru[e1], ru[e1 + 1]
+        p2, s2f, s2l, q2 = rv[j - 1], rv[j], rv[e2], rv[e2 + 1]
+        return (((p1, s2f), (s2l, q1), (p2, s1f), (s1l, q2)),
+                ((p1, s1f), (s1l, q1), (p2, s2f), (s2l, q2)))
+
+    def _nuevas(self, mov) -> Dict[int, List[int]]:
+        """Rutas que cambian con el movimiento: {k: nueva_ruta}."""
+        tipo = mov[1]
+        if tipo == DOS_OPT:
+            _, _, k, a, b = mov
+            r = self.rutas[k]
+            return {k: r[:a + 1] + r[b:a:-1] + r[b + 1:]}
+        if tipo == MOVER:
+            _, _, ku, ini, fin, kv, j = mov
+            ru = self.rutas[ku]
+            tramo = ru[ini:fin + 1]
+            if ku == kv:
+                if j > fin:
+                    return {ku: ru[:ini] + ru[fin + 1:j + 1] + tramo + ru[j + 1:]}
+                return {ku: ru[:j + 1] + tramo + ru[j + 1:ini] + ru[fin + 1:]}
+            rv = self.rutas[kv]
+            return {ku: ru[:ini] + ru[fin + 1:], kv: rv[:j + 1] + tramo + rv[j + 1:]}
+        _, _, ku, i1, e1, kv, j, e2 = mov
+        ru, rv = self.rutas[ku], self.rutas[kv]
+        return {ku: ru[:i1] + rv[j:e2 + 1] + ru[e1 + 1:],
+                kv: rv[:j] + ru[i1:e1 + 1] + rv[e2 + 1:]}
+
+    def _factible_holg(self, mov) -> bool:
+        """
+        Factibilidad con segmentos: O(1) con prefijos/sufijos y tramos de hasta MAX_TRAMO;
+        el tramo intermedio de 2-opt / Or-opt se arma (memorizado) solo si pasan los
+        filtros O(1) de sus extremos.
+        """
+        tipo = mov[1]
+        pref, suf, tramo = self.pref, self.suf, self._tramo
+        if tipo == DOS_OPT:
+            _, _, k, a, b = mov
+            h, r = self.holg[k], self.rutas[k]
+            if h.unir(pref[k][a], h.nodo(r[b])).retraso or h.unir(h.nodo(r[a + 1]), suf[k][b + 1]).retraso:
+                return False
+            inv = tramo(k, a + 1, b, True)
+            return inv is not None and not h.unir(h.unir(pref[k][a], inv), suf[k][b + 1]).retraso
+        if tipo == MOVER:
+            _, _, ku, ini, fin, kv, j = mov
+            hu, hv = self.holg[ku], self.holg[kv]
+            s = tramo(ku, ini, fin)
+            if s is None:
+                return False
+            if ku == kv:
+                if j > fin:
+                    if hu.unir(s, suf[ku][j + 1]).retraso:
+                        return False
+                    medio = tramo(ku, fin + 1, j)
+                    if medio is None:
+                        return False
+                    seg = hu.unir(hu.unir(hu.unir(pref[ku][ini - 1], medio), s), suf[ku][j + 1])
+                else:
+                    if hu.unir(pref[ku][j], s).retraso:
+                        return False
+                    medio = tramo(ku, j + 1, ini - 1)
+                    if medio is None:
+                        return False
+                    seg = hu.unir(hu.unir(hu.unir(pref[ku][j], s), medio), suf[ku][fin + 1])
+                return not seg.retraso
+            if hu.unir(pref[ku][ini - 1], suf[ku][fin + 1]).retraso:
+                return False
+            return not hv.unir(hv.unir(pref[kv][j], s), suf[kv][j + 1]).retraso
+        _, _, ku, i1, e1, kv, j, e2 = mov
+        hu, hv = self.holg[ku], self.holg[kv]
+        s1, s2 = tramo(ku, i1, e1), tramo(kv, j, e2)
+        if s1 is None or s2 is None:
+            return False
+        if hu.unir(hu.unir(pref[ku][i1 - 1], s2), suf[ku][e1 + 1]).retraso:
+            return False
+        return not hv.unir(hv.unir(pref[kv][j - 1], s1), suf[kv][e2 + 1]).retraso
+
+    def insertar(self, paradas: List[int]) -> List[int]:
+        """
+        Inserta cada parada (fuera de toda ruta), en orden, donde menos distancia agregue sin
+        romper ventanas ni capacidad. Retorna las que no caben en ninguna ruta.
+        """
+        D, sobran = self.D, []
+        for u in paradas:
+            mejor = None
+            for k, r in enumerate(self.rutas):
+                if self.cap[k] is not None and self.carga[k] + self.dem[u] > self.cap[k]:
+                    continue
+                for j in range(len(r) - 1):
+                    d = D[r[j]][u] + D[u][r[j + 1]] - D[r[j]][r[j + 1]]
+                    if mejor is not None and d >= mejor[0]:
+                        continue
+                    if self.usar_holg:
+                        h = self.holg[k]
+                        if h.unir(h.unir(self.pref[k][j], h.nodo(u)), self.suf[k][j + 1]).retraso:
+                            continue
+                    elif not self.factible(k, r[:j + 1] + [u] + r[j + 1:]):
+                        continue
+                    mejor = (d, k, j)
+            if mejor is None:
+                sobran.append(u)
+                continue
+            _, k, j = mejor
+            self.rutas[k] = self.rutas[k][:j + 1] + [u] + self.rutas[k][j + 1:]
+            self._indexar(k)
+        if len(sobran) < len(paradas):
+            self.cercanos = _cercanos(self.D, sorted({u for r in self.rutas for u in r[1:-1]}))
+        return sobran
+
+    # ---------- búsqueda ----------
+
+    def buscar(self, limite_ts: float, aviso=None, vista=None, iter_sin_mejora: int = ITER_SIN_MEJORA):
+        """
+        Tabu hasta limite_ts (time.time()), iter_sin_mejora iteraciones sin nuevo mejor o
+        estancamiento de aviso. Cada nuevo mejor se avisa con aviso(distancia, vista(rutas))
+        (vista adapta las rutas al formato de on_improvement). Retorna (mejores rutas, distancia).
+        """
+        dist = self.distancia()
+        mejor, mejor_dist = [r[:] for r in self.rutas], dist
+        tabu: Dict[tuple, int] = {}      # arco -> iteración en que deja de ser tabú
+        vencimientos = deque()           # (iteración, arco) en orden de vencimiento
+        it = sin_mejora = 0
+        while sin_mejora < iter_sin_mejora and time.time() < limite_ts:
+            if aviso is not None and aviso.estancado():
+                break
+            movs = self._movimientos()
+            movs.sort(key=itemgetter(0))
+            elegido = nuevas = None
+            for mov in movs:
+                creados, quitados = self._arcos(mov)
+                if dist + mov[0] >= mejor_dist - EPS and any(tabu.get(a, -1) > it for a in creados):
+                    continue
+                if self.usar_holg:
+                    if not self._factible_holg(mov):
+                        continue
+                    nuevas = self._nuevas(mov)
+                else:
+                    nuevas = self._nuevas(mov)
+                    if not all(self.factible(k, r) for k, r in nuevas.items()):
+                        continue
+                elegido = mov
+                break
+            if elegido is None:
+                break
+
+            for k, r in nuevas.items():
+                self.rutas[k] = r
+                self._indexar(k)
+            dist += elegido[0]
+            it += 1
+            for a in quitados:
+                tabu[a] = it + TENENCIA
+                vencimientos.append((it + TENENCIA, a))
+            while vencimientos and vencimientos[0][0] <= it:
+                vence, a = vencimientos.popleft()
+                if tabu.get(a) == vence:
+                    del tabu[a]
+
+            if dist < mejor_dist - EPS:
+                mejor, mejor_dist = [r[:] for r in self.rutas], dist
+                sin_mejora = 0
+                if aviso is not None and aviso(mejor_dist, lambda: vista(mejor) if vista else mejor):
+                    break
+            else:
+                sin_mejora += 1
+
+        self.rutas = mejor
+        for k in range(len(mejor)):
+            self._indexar(k)
+        return mejor, self.distancia()
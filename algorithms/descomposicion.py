@@ -0,0 +1,384 @@
+# algorithms/descomposicion.py
+# Días muy grandes (cientos de paradas): primero sectores, después rutas.
+#   1) Las paradas se parten en sectores geográficos (~TAMANO_SECTOR paradas cada uno):
+#      barrido angular alrededor de la Planta o k-means sobre coordenadas; cada sector recibe
+#      vehículos según su número de paradas, o, si hay más sectores que vehículos, los
+#      sectores vecinos comparten un vehículo que los recorre uno tras otro, con un tramo
+#      del turno para cada uno.
+#   2) Cada sector es una sub-instancia (bases + sus paradas) que un motor existente resuelve
+#      en su propio proceso, todos a la vez; si el motor falla o no halla solución, el sector
+#      se resuelve con el motor de respaldo.
+#   3) Las rutas se unen en la instancia completa (las de un vehículo con varios sectores se
+#      encadenan en orden) y una búsqueda local final (relocate entre sectores distintos o
+#      dentro de una ruta encadenada + reinserción de omitidas) arregla las fronteras.
+# El modelo de cada motor crece con el sector, no con el día: el tiempo crece ~linealmente.
+
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as PlazoAgotado
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from core.perfiles_tiempo import PerfilTiempos, tiempo_viaje
+from core.trabajos import procesos_disponibles
+from algorithms.algoritmo1 import optimizar_ruta_algoritmo22, _reporte_violaciones
+from algorithms.algoritmo2 import optimizar_ruta_cw_tabu
+from algorithms.flota import PLANTA, nodos_base, vehiculos_de
+from algorithms.portafolio import _cerrar_pool, _correr_motor, GRACIA_SEG
+from algorithms.progreso import aviso_mejoras
+from algorithms.vecindario import construir_vecinos, K_VECINOS, UMBRAL_VECINOS
+
+TAMANO_SECTOR    = 80       # paradas por sector (objetivo)
+METODOS          = ("barrido", "kmeans")
+FRACCION_SECTORES = 0.8     # del plazo para resolver sectores; el resto, fronteras
+PESO_TARDANZA    = 1_000    # costo por segundo de tardanza en la búsqueda local (vs. metros)
+
+
+# ===================== SECTORES =====================
+
+def _barrido(data, paradas, k) -> List[List[int]]:
+    """Ordena por ángulo alrededor de la Planta (desde el mayor hueco angular) y corta en k tramos iguales."""
+    coords = np.asarray(data["coords"], dtype=float)[paradas]
+    ang = np.arctan2(coords[:, 0] - PLANTA["lat"],
+                     (coords[:, 1] - PLANTA["lon"]) * math.cos(math.radians(PLANTA["lat"])))
+    orden = np.argsort(ang)
+    huecos = np.diff(np.concatenate([ang[orden], ang[orden[:1]] + 2 * math.pi]))
+    orden = np.roll(orden, -(int(np.argmax(huecos)) + 1))
+    return [[paradas[i] for i in tramo] for tramo in np.array_split(orden, k)]
+
+
+def _kmeans(data, paradas, k) -> List[List[int]]:
+    from sklearn.cluster import KMeans
+    coords = np.asarray(data["coords"], dtype=float)[paradas]
+    xy = np.column_stack([coords[:, 0], coords[:, 1] * math.cos(math.radians(coords[:, 0].mean()))])
+    etiquetas = KMeans(n_clusters=k, n_init=4, random_state=0).fit_predict(xy)
+    sectores = [[paradas[i] for i in np.flatnonzero(etiquetas == c)] for c in range(k)]
+    return [s for s in sectores if s]
+
+
+def sectores(data: Dict[str, Any], k: int, metodo: str = "barrido") -> List[List[int]]:
+    """Partición de las paradas (nodos que no son base) en a lo más k sectores."""
+    if metodo not in METODOS:
+        raise ValueError(f"Método de sectores desconocido: {metodo} (usar {METODOS})")
+    bases = nodos_base(data)
+    paradas = [n for n in range(len(data["time_windows"])) if n not in bases]
+    if k <= 1 or len(paradas) <= k:
+        return [paradas]
+    return _barrido(data, paradas, k) if metodo == "barrido" else _kmeans(data, paradas, k)
+
+
+def repartir_vehiculos(tamanos: List[int], m: int) -> List[List[int]]:
+    """
+    Vehículos 0..m-1 por sector. k ≤ m: proporcional a sus paradas (resto mayor, ≥1 por sector).
+    k > m: un vehículo por sector, compartido por sectores consecutivos (m grupos parejos).
+    """
+    if len(tamanos) > m:
+        return [[v] for v, grupo in enumerate(np.array_split(np.arange(len(tamanos)), m)) for _ in grupo]
+    total = sum(tamanos)
+    cuota = [m * t / total for t in tamanos]
+    cuantos = [max(1, int(c)) for c in cuota]
+    while sum(cuantos) > m:
+        cuantos[max(range(len(cuantos)), key=lambda s: (cuantos[s] - cuota[s], cuantos[s]))] -= 1
+    while sum(cuantos) < m:
+        cuantos[max(range(len(cuantos)), key=lambda s: cuota[s] - cuantos[s])] += 1
+    asignados, v = [], 0
+    for c in cuantos:
+        asignados.append(list(range(v, v + c)))
+        v += c
+    return asignados
+
+
+def repartir_turnos(data: Dict[str, Any], tamanos: List[int], vehiculos: List[List[int]]) -> List[List[Tuple[int, int]]]:
+    """
+    Turno (t0, t_fin) de cada vehículo en cada sector: el completo si el vehículo tiene un solo
+    sector; si recorre varios, uno tras otro, a cada uno le toca un tramo del turno
+    proporcional a sus paradas.
+    """
+    flota = vehiculos_de(data)
+    turnos = [[(flota[v]["t0"], flota[v]["t_fin"]) for v in vs] for vs in vehiculos]
+    for v, veh in enumerate(flota):
+        propios = [s for s, vs in enumerate(vehiculos) if vs == [v]]
+        if len(propios) < 2:
+            continue
+        total = sum(tamanos[s] for s in propios)
+        t, largo = veh["t0"], veh["t_fin"] - veh["t0"]
+        for s in propios:
+            fin = t + largo * tamanos[s] / total
+            turnos[s] = [(int(t), int(fin))]
+            t = fin
+    return turnos
+
+
+def _subinstancia(data: Dict[str, Any], paradas: List[int], vehiculos: List[int],
+                  turnos: List[Tuple[int, int]] = None) -> Tuple[Dict[str, Any], List[int]]:
+    """
+    Data model del sector: bases + paradas (índices locales) y el mapa local -> global.
+    turnos reemplaza el turno de cada vehículo (ver repartir_turnos).
+    """
+    mapa = sorted(nodos_base(data)) + list(paradas)
+    local = {g: i for i, g in enumerate(mapa)}
+    idx = np.asarray(mapa)
+    flota = vehiculos_de(data)
+
+    def _filas(clave):
+        return [data[clave][g] for g in mapa] if data.get(clave) is not None else None
+
+    sub = {
+        "distance_matrix": np.asarray(data["distance_matrix"])[np.ix_(idx, idx)].tolist(),
+        "duration_matrix": np.asarray(data["duration_matrix"])[np.ix_(idx, idx)].tolist(),
+        "time_windows": _filas("time_windows"),
+        "demands": _filas("demands") or [0] * len(mapa),
+        "service_times": _filas("service_times"),
+        "coords": _filas("coords"),
+        "num_vehicles": len(vehiculos),
+        "vehicle_capacities": [flota[v]["capacidad"] for v in vehiculos],
+        "vehicle_shifts": turnos or [(flota[v]["t0"], flota[v]["t_fin"]) for v in vehiculos],
+        "starts": [local[flota[v]["inicio"]] for v in vehiculos],
+        "ends": [local[flota[v]["fin"]] for v in vehiculos],
+        "depot": local[data["depot"]],
+        "duration_profile": None,
+        "neighbors": None,
+        "initial_routes": None,
+    }
+    perfil = data.get("duration_profile")
+    if perfil is not None:
+        sub["duration_profile"] = PerfilTiempos(
+            np.ascontiguousarray(perfil.duraciones[:, idx[:, None], idx[None, :]]), perfil.t0, perfil.paso
+        )
+    if len(mapa) >= UMBRAL_VECINOS:
+        sub["neighbors"] = construir_vecinos(sub)
+    return sub, mapa
+
+
+# ===================== FRONTERAS =====================
+
+class _Fronteras:
+    """Evaluación de rutas completas (distancia + tardanza ponderada) y relocate entre sectores."""
+
+    def __init__(self, data, sectores_de_vehiculo):
+        self.data = data
+        self.D = data["distance_matrix"]
+        self.W = data["time_windows"]
+        self.svc = data.get("service_times") or [0] * len(self.W)
+        self.dem = data.get("demands") or [0] * len(self.W)
+        self.flota = vehiculos_de(data)
+        self.sectores = sectores_de_vehiculo
+        vecinos = data.get("neighbors")
+        if vecinos is not None:
+            self.cercanos = [set(vecinos.sucesores(p).tolist()) for p in range(len(self.W))]
+            for p, pred in enumerate(vecinos.predecesores()):
+                self.cercanos[p].update(pred)
+        else:
+            D = np.asarray(self.D)
+            kk = min(K_VECINOS, len(D) - 1)
+            self.cercanos = [set(np.argpartition(D[p], kk)[:kk + 1].tolist()) - {p} for p in range(len(D))]
+
+    def simular(self, v, paradas):
+        """(distancia, tardanza, llegadas desde la base de inicio, hora de llegada a la base de fin)."""
+        veh = self.flota[v]
+        t, prev = veh["t0"], veh["inicio"]
+        llegadas, dist, tard = [t], 0, 0
+        for u in paradas:
+            t_sal = t + self.svc[prev]
+            t = max(t_sal + tiempo_viaje(self.data, prev, u, t_sal), self.W[u][0])
+            tard += max(0, t - self.W[u][1])
+            dist += self.D[prev][u]
+            llegadas.append(t)
+            prev = u
+        t_sal = t + self.svc[prev]
+        fin = t_sal + tiempo_viaje(self.data, prev, veh["fin"], t_sal)
+        dist += self.D[prev][veh["fin"]]
+        tard += max(0, fin - veh["t_fin"])
+        return dist, tard, llegadas, fin
+
+    def costo(self, v, paradas):
+        dist, tard, _, _ = self.simular(v, paradas)
+        return dist + PESO_TARDANZA * tard
+
+    def _mejor_insercion(self, u, rutas, cargas, candidatos, sin_tardanza_extra=False):
+        """(delta, v, pos) de la mejor inserción de u junto a sus vecinos en las rutas candidatas."""
+        mejor = None
+        for v in candidatos:
+            if cargas[v] + self.dem[u] > self.flota[v]["capacidad"]:
+                continue
+            ruta = rutas[v]
+            posiciones = {0, len(ruta)}
+            for p, w in enumerate(ruta):
+                if w in self.cercanos[u]:
+                    posiciones.update((p, p + 1))
+            base = self.costo(v, ruta)
+            tard_base = self.simular(v, ruta)[1] if sin_tardanza_extra else None
+            for p in posiciones:
+                nueva = ruta[:p] + [u] + ruta[p:]
+                if sin_tardanza_extra and self.simular(v, nueva)[1] > tard_base:
+                    continue
+                delta = self.costo(v, nueva) - base
+                if mejor is None or delta < mejor[0]:
+                    mejor = (delta, v, p)
+        return mejor
+
+    def mejorar(self, rutas, excluidos, limite_ts):
+        """
+        Relocate de paradas hacia rutas de otros sectores (o dentro de la misma ruta, si une
+        varios sectores) y reinserción de omitidas (sin nueva tardanza).
+        """
+        cargas = [sum(self.dem[u] for u in r) for r in rutas]
+        for u in list(excluidos):
+            mejor = self._mejor_insercion(u, rutas, cargas, range(len(rutas)), sin_tardanza_extra=True)
+            if mejor is not None:
+                _, v, p = mejor
+                rutas[v].insert(p, u)
+                cargas[v] += self.dem[u]
+                excluidos.remove(u)
+
+        mejoro = True
+        while mejoro and time.time() < limite_ts:
+            mejoro = False
+            for a in range(len(rutas)):
+                for u in list(rutas[a]):
+                    if time.time() >= limite_ts:
+                        return rutas, excluidos
+                    otras = [b for b in range(len(rutas))
+                             if (self.sectores[b] != self.sectores[a] or (b == a and len(self.sectores[a]) > 1))
+                             and any(w in self.cercanos[u] for w in rutas[b])]
+                    if not otras:
+                        continue
+                    antes = rutas[a]
+                    sin_u = [w for w in antes if w != u]
+                    ahorro = self.costo(a, antes) - self.costo(a, sin_u)
+                    rutas[a] = sin_u
+                    cargas[a] -= self.dem[u]
+                    mejor = self._mejor_insercion(u, rutas, cargas, otras)
+                    if mejor is not None and mejor[0] < ahorro - 1e-6:
+                        _, b, p = mejor
+                        rutas[b].insert(p, u)
+                        cargas[b] += self.dem[u]
+                        mejoro = True
+                    else:
+                        rutas[a] = antes
+                        cargas[a] += self.dem[u]
+        return rutas, excluidos
+
+
+# ===================== PRINCIPAL =====================
+
+def optimizar_ruta_sectores(data: Dict[str, Any], tiempo_max_seg: int = 60, metodo: str = "barrido",
+                            motor=optimizar_ruta_algoritmo22, tamano_sector: int = TAMANO_SECTOR,
+                            max_procesos: int = None, on_improvement=None,
+                            estancamiento_seg: float = None, ventanas_suaves: bool = False,
+                            permitir_omitir: bool = False,
+                            motor_respaldo=optimizar_ruta_cw_tabu) -> Dict[str, Any]:
+    """
+    Resuelve por sectores (ver cabecera): ceil(paradas / tamano_sector) sectores, aunque haya
+    un solo vehículo; con un solo sector (día chico) es lo mismo que llamar al motor directamente.
+    Un sector cuyo proceso muere, cuyo motor falla o no halla solución se resuelve aquí con
+    motor_respaldo; los que siguen corriendo al vencer el plazo se terminan y sus paradas
+    pasan a la reinserción de omitidas.
+    res["sectores"] indica método, paradas y vehículos de cada sector.
+    on_improvement (algorithms.progreso) recibe las rutas unidas y, luego, las de la
+    búsqueda de fronteras, con costo = distancia + PESO_TARDANZA · tardanza.
+    ventanas_suaves / permitir_omitir se pasan al motor (firma de optimizar_ruta_algoritmo22).
+    """
+    opciones = {"ventanas_suaves": ventanas_suaves, "permitir_omitir": permitir_omitir}
+    n_paradas = len(data["time_windows"]) - len(nodos_base(data))
+    k = math.ceil(n_paradas / tamano_sector)
+    if k <= 1:
+        return motor(data, tiempo_max_seg=tiempo_max_seg, on_improvement=on_improvement,
+                     estancamiento_seg=estancamiento_seg, **opciones)
+
+    t_inicio = time.time()
+    partes = sectores(data, k, metodo)
+    vehiculos = repartir_vehiculos([len(p) for p in partes], data["num_vehicles"])
+    procesos = max_procesos or min(len(partes), procesos_disponibles())
+    rondas = math.ceil(len(partes) / procesos)
+    presupuesto = max(1, int(tiempo_max_seg * FRACCION_SECTORES / rondas))
+    kwargs = {"estancamiento_seg": estancamiento_seg} if estancamiento_seg is not None else {}
+    kwargs.update(opciones)
+
+    # Por vehículo, un tramo (sector, [paradas]) por cada sector que resuelve
+    tramos = [[] for _ in range(data["num_vehicles"])]
+    excluidos = []
+
+    def _tomar(s, res, mapa):
+        vistos = set()
+        for r in res["routes"]:
+            tramo = [mapa[u] for u in r["route"][1:]]
+            tramos[vehiculos[s][r["vehicle"]]].append((s, tramo))
+            vistos.update(tramo)
+        excluidos.extend(u for u in partes[s] if u not in vistos)
+
+    turnos = repartir_turnos(data, [len(p) for p in partes], vehiculos)
+    subinstancias = [_subinstancia(data, paradas, vs, turno) for paradas, vs, turno in zip(partes, vehiculos, turnos)]
+    respaldo = []
+    ex = ProcessPoolExecutor(max_workers=procesos)
+    try:
+        futuros = {ex.submit(_correr_motor, motor, sub, presupuesto, kwargs): s
+                   for s, (sub, _) in enumerate(subinstancias)}
+        pendientes = set(futuros)
+        try:
+            for fut in as_completed(futuros, timeout=tiempo_max_seg + GRACIA_SEG):
+                pendientes.discard(fut)
+                s = futuros[fut]
+                try:
+                    res, _, _ = fut.result()
+                except Exception:   # p. ej. BrokenProcessPool: murió el proceso del sector
+                    res = None
+                if res:
+                    _tomar(s, res, subinstancias[s][1])
+                else:
+                    respaldo.append(s)
+        except PlazoAgotado:
+            pass
+        for fut in pendientes:
+            excluidos.extend(partes[futuros[fut]])
+    finally:
+        # Los sectores que siguen corriendo tras el plazo no siguen ocupando núcleos
+        _cerrar_pool(ex)
+
+    # Sectores sin resultado: motor de respaldo en este proceso, con lo que quede del plazo
+    for i, s in enumerate(respaldo):
+        restante = t_inicio + tiempo_max_seg * FRACCION_SECTORES - time.time()
+        plazo = max(1, int(min(presupuesto, restante / (len(respaldo) - i))))
+        sub, mapa = subinstancias[s]
+        res, _, _ = _correr_motor(motor_respaldo, sub, plazo, {})
+        if res:
+            _tomar(s, res, mapa)
+        else:
+            excluidos.extend(partes[s])
+
+    # Un vehículo con varios sectores los recorre en orden (consecutivos en el barrido); la
+    # simulación de _Fronteras recalcula las horas desde el final del sector anterior
+    rutas = [[u for _, tramo in sorted(tramos_v) for u in tramo] for tramos_v in tramos]
+    sectores_de_vehiculo = [{s for s, vs in enumerate(vehiculos) if v in vs} for v in range(data["num_vehicles"])]
+    fronteras = _Fronteras(data, sectores_de_vehiculo)
+    aviso = aviso_mejoras(on_improvement)
+
+    def _avisar():
+        if aviso is not None:
+            costo = sum(fronteras.costo(v, r) for v, r in enumerate(rutas))
+            aviso(costo, lambda: [[fronteras.flota[v]["inicio"]] + r for v, r in enumerate(rutas)])
+
+    _avisar()
+    rutas, excluidos = fronteras.mejorar(rutas, excluidos, t_inicio + tiempo_max_seg)
+    _avisar()
+
+    salida, dist_total = [], 0
+    for v, paradas in enumerate(rutas):
+        dist, _, llegadas, fin = fronteras.simular(v, paradas)
+        dist_total += dist if paradas else 0
+        salida.append({
+            "vehicle": v,
+            "route": [fronteras.flota[v]["inicio"]] + paradas,
+            "arrival_sec": llegadas,
+            "end_node": fronteras.flota[v]["fin"],
+            "end_sec": fin,
+        })
+    return {
+        "routes": salida,
+        "distance_total_m": dist_total,
+        "violaciones": _reporte_violaciones(data, salida, fronteras.flota, excluidos),
+        "clientes_excluidos": excluidos,
+        "sectores": [{"sector": s, "metodo": metodo, "paradas": len(p), "vehiculos": len(vs)}
+                     for s, (p, vs) in enumerate(zip(partes, vehiculos))],
+    }
@@ -0,0 +1,93 @@
+# algorithms/flota.py
+# Flota de varios vehículos: cada vehículo tiene capacidad, punto de inicio, punto de fin
+# (Cochera, Planta, ...) y turno propios.
+# Los puntos de la flota ("bases") se anteponen como filas 0..m-1 del DataFrame de nodos,
+# así el depósito (nodo 0) es siempre una base y los pedidos vienen después.
+
+from typing import Dict, Any, List, Tuple
+
+import pandas as pd
+
+# Puntos fijos de la operación (mismas coordenadas que core.constants.PUNTOS_FIJOS_COMPLETOS)
+COCHERA = {"direccion": "Cochera", "lat": -16.4141434959913,  "lon": -71.51839574233342}
+PLANTA  = {"direccion": "Planta",  "lat": -16.398605226701633, "lon": -71.4376266111019}
+BASES   = {"Cochera": COCHERA, "Planta": PLANTA}
+
+TURNO_DEFECTO = ("08:00", "17:00")
+TIPO_BASE     = "Base"     # valor de la columna 'tipo' en las filas de bases
+
+
+def vehiculo(nombre: str, capacidad: int = None, inicio: Dict = COCHERA, fin: Dict = COCHERA,
+             turno: Tuple[str, str] = TURNO_DEFECTO) -> Dict[str, Any]:
+    """Un vehículo: dict con nombre, capacidad (None = sin límite), inicio, fin y turno ('HH:MM', 'HH:MM')."""
+    return {"nombre": nombre, "capacidad": capacidad, "inicio": inicio, "fin": fin, "turno": tuple(turno)}
+
+
+def flota_uniforme(n: int, capacidad: int = None, inicio: Dict = COCHERA, fin: Dict = COCHERA,
+                   turno: Tuple[str, str] = TURNO_DEFECTO) -> List[Dict[str, Any]]:
+    """n vehículos iguales: 'Vehículo 1', 'Vehículo 2', ..."""
+    return [vehiculo(f"Vehículo {k + 1}", capacidad, inicio, fin, turno) for k in range(n)]
+
+
+def clave_base(punto: Dict) -> str:
+    return f"{punto['lat']:.6f},{punto['lon']:.6f}"
+
+
+def bases_de_flota(flota: List[Dict[str, Any]]) -> List[Dict]:
+    """Puntos únicos de inicio/fin de la flota, en orden de aparición."""
+    vistas = {}
+    for v in flota:
+        for punto in (v["inicio"], v["fin"]):
+            vistas.setdefault(clave_base(punto), punto)
+    return list(vistas.values())
+
+
+def anteponer_bases(df: pd.DataFrame, flota: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    DataFrame de nodos = bases de la flota (filas 0..m-1) + pedidos (df), con índice 0..N-1.
+    Las bases llevan tipo='Base', demanda 0, sin ventana propia (la define el turno del vehículo)
+    y la columna 'base' con su clave; en los pedidos 'base' queda vacía.
+    """
+    filas = [{
+        "id":             f"BASE-{p['direccion']}",
+        "operacion":      TIPO_BASE,
+        "nombre_cliente": p["direccion"],
+        "direccion":      p["direccion"],
+        "lat":            p["lat"],
+        "lon":            p["lon"],
+        "time_start":     None,
+        "time_end":       None,
+        "demand":         0,
+        "tipo":           TIPO_BASE,
+        "n_pedidos":      1,
+        "base":           clave_base(p),
+    } for p in bases_de_flota(flota)]
+    out = pd.concat([pd.DataFrame(filas), df.assign(base=None)], ignore_index=True)
+    return out
+
+
+def nodos_de_flota(df_nodos: pd.DataFrame, flota: List[Dict[str, Any]]) -> Tuple[List[int], List[int]]:
+    """(starts, ends): nodo de inicio y de fin de cada vehículo dentro de df_nodos."""
+    fila = {b: i for i, b in enumerate(df_nodos["base"]) if isinstance(b, str)}
+    starts = [fila[clave_base(v["inicio"])] for v in flota]
+    ends = [fila[clave_base(v["fin"])] for v in flota]
+    return starts, ends
+
+
+def nodos_base(data: Dict[str, Any]) -> set:
+    """Nodos que son inicio/fin de algún vehículo (o el depósito): no son paradas a visitar."""
+    return set(data.get("starts") or []) | set(data.get("ends") or []) | {data["depot"]}
+
+
+def vehiculos_de(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Vista por vehículo del data model: nodo de inicio/fin, turno (seg) y capacidad.
+    Data models sin flota (antiguos): todos salen y vuelven al depósito.
+    """
+    n_v = data.get("num_vehicles", 1)
+    starts = data.get("starts") or [data["depot"]] * n_v
+    ends = data.get("ends") or [data["depot"]] * n_v
+    turnos = data.get("vehicle_shifts") or [data["time_windows"][data["depot"]]] * n_v
+    caps = data.get("vehicle_capacities") or [10**9] * n_v
+    return [{"inicio": starts[v], "fin": ends[v], "t0": int(turnos[v][0]), "t_fin": int(turnos[v][1]),
+             "capacidad": int(caps[v])} for v in range(n_v)]
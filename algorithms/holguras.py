@@ -0,0 +1,80 @@
+# algorithms/holguras.py
+# Factibilidad de ventanas en O(1) por movimiento (CW + Tabu).
+# Cada tramo de ruta se resume en un Segmento (Vidal et al., concatenación de ventanas):
+#   duracion → tiempo mínimo de recorrerlo (servicios + viajes + esperas forzadas)
+#   retraso  → "time warp": cuánto habría que retroceder el reloj para cumplir todas sus ventanas
+#   temprano / tarde → rango de horas de inicio en el primer nodo que minimizan duración/retraso
+# Unir dos segmentos es O(1); con prefijos y sufijos precalculados por ruta, una unión de
+# rutas (CW), un intercambio o una reubicación se evalúan sin recorrer la ruta.
+# Misma convención que _check_feasible_and_time: la ruta sale de su primer nodo a t0, antes
+# de cada viaje se suma el servicio del origen y se puede esperar a que abra la ventana.
+# Solo vale con duraciones estáticas: con perfil horario (data["duration_profile"]) el viaje
+# depende de la hora de salida y los solvers deben recorrer la ruta.
+
+from typing import Dict, Any, List, NamedTuple
+
+
+class Segmento(NamedTuple):
+    duracion: int
+    retraso: int
+    temprano: int
+    tarde: int
+    primero: int
+    ultimo: int
+
+
+class Holguras:
+    """Segmentos de una instancia: por nodo, por prefijos/sufijos de ruta y su concatenación."""
+
+    def __init__(self, data: Dict[str, Any], t0: int, t_fin: int, svc: List[int]):
+        self.T = data["duration_matrix"]
+        self.W = data["time_windows"]
+        self.svc = svc
+        self.t0 = t0
+        self.t_fin = t_fin
+        self._nodos = [Segmento(0, 0, w0, w1, v, v) for v, (w0, w1) in enumerate(self.W)]
+
+    @staticmethod
+    def aplica(data: Dict[str, Any]) -> bool:
+        return data.get("duration_profile") is None
+
+    def nodo(self, v: int) -> Segmento:
+        return self._nodos[v]
+
+    def salida(self, v: int) -> Segmento:
+        """Primer nodo de la ruta: se sale exactamente a t0 (sin revisar su ventana)."""
+        return Segmento(0, 0, self.t0, self.t0, v, v)
+
+    def llegada(self, v: int) -> Segmento:
+        """Último nodo de la ruta (regreso): su ventana y el fin de turno."""
+        w0, w1 = self.W[v]
+        return Segmento(0, 0, w0, min(w1, self.t_fin), v, v)
+
+    def unir(self, a: Segmento, b: Segmento) -> Segmento:
+        delta_arco = self.svc[a.ultimo] + self.T[a.ultimo][b.primero]
+        delta = a.duracion - a.retraso + delta_arco
+        espera = max(b.temprano - delta - a.tarde, 0)
+        retraso = max(a.temprano + delta - b.tarde, 0)
+        return Segmento(
+            a.duracion + b.duracion + delta_arco + espera,
+            a.retraso + b.retraso + retraso,
+            max(b.temprano - delta, a.temprano) - espera,
+            min(b.tarde - delta, a.tarde) + retraso,
+            a.primero,
+            b.ultimo,
+        )
+
+    def prefijos(self, ruta: List[int]) -> List[Segmento]:
+        """P[i] = segmento de ruta[0..i] (ruta[0] sale a t0)."""
+        pref = [self.salida(ruta[0])]
+        for k, v in enumerate(ruta[1:], start=1):
+            pref.append(self.unir(pref[-1], self.llegada(v) if k == len(ruta) - 1 else self.nodo(v)))
+        return pref
+
+    def sufijos(self, ruta: List[int]) -> List[Segmento]:
+        """S[i] = segmento de ruta[i..] (el último nodo con el límite de fin de turno)."""
+        suf = [self.llegada(ruta[-1])]
+        for v in reversed(ruta[:-1]):
+            suf.append(self.unir(self.nodo(v), suf[-1]))
+        suf.reverse()
+        return suf
@@ -0,0 +1,160 @@
+# algorithms/portafolio.py
+# Portafolio de solvers: varios motores/estrategias corren a la vez en procesos separados
+# (ProcessPoolExecutor) con un mismo plazo de reloj; se devuelve el mejor resultado y un
+# marcador por motor. Así se usan todos los núcleos del servidor en vez de uno (o, dentro de
+# un trabajo de core.trabajos, su parte de ellos).
+
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as PlazoAgotado
+from typing import Dict, Any, List, Tuple
+
+from core.trabajos import procesos_disponibles
+from algorithms.algoritmo1 import optimizar_ruta_algoritmo22
+from algorithms.algoritmo2 import optimizar_ruta_cw_tabu
+from algorithms.algoritmo3log import optimizar_ruta_cp_sat
+from algorithms.algoritmo4 import optimizar_ruta_lns
+from algorithms.flota import nodos_base
+from algorithms.progreso import aviso_mejoras
+
+# Estrategias iniciales de OR-Tools que entran al portafolio (cada una en su proceso)
+ESTRATEGIAS_ORTOOLS = ("PARALLEL_CHEAPEST_INSERTION", "PATH_CHEAPEST_ARC", "SAVINGS")
+FRACCION_PLAZO = 0.85    # cada motor recibe este % del plazo (arranque de procesos + armado del resultado)
+GRACIA_SEG     = 5       # espera extra antes de dar por perdido a un motor
+# Costo escalar del portafolio (para on_improvement): mismo orden que _clave_orden en la práctica
+PESO_OMITIDA   = 10**9
+PESO_TARDANZA  = 1_000
+
+
+def motores_portafolio(data: Dict[str, Any]) -> List[Tuple[str, Any, Dict[str, Any]]]:
+    """(nombre, función, kwargs extra) de cada participante. CP-SAT solo resuelve un vehículo."""
+    motores = [(f"OR-Tools {e}", optimizar_ruta_algoritmo22, {"estrategia_inicial": e}) for e in ESTRATEGIAS_ORTOOLS]
+    motores.append(("CW + Tabu", optimizar_ruta_cw_tabu, {}))
+    if data.get("num_vehicles", 1) == 1:
+        motores.append(("CP-SAT", optimizar_ruta_cp_sat, {"num_workers": 1}))
+    motores.append(("LNS", optimizar_ruta_lns, {}))
+    return motores
+
+
+def _correr_motor(fn, data, tiempo_max_seg, kwargs):
+    """Se ejecuta en el proceso hijo: (resultado, segundos, error)."""
+    t0 = time.time()
+    try:
+        return fn(data, tiempo_max_seg=tiempo_max_seg, **kwargs), time.time() - t0, None
+    except Exception as exc:   # un motor que falla no tumba al portafolio
+        return None, time.time() - t0, f"{type(exc).__name__}: {exc}"
+
+
+def _cerrar_pool(ex: ProcessPoolExecutor):
+    """
+    Cancela lo que no empezó y termina los procesos que siguen corriendo (motores fuera de
+    plazo o que ya no hacen falta): shutdown no detiene una tarea en curso.
+    """
+    procesos = list((getattr(ex, "_processes", None) or {}).values())
+    ex.shutdown(wait=False, cancel_futures=True)
+    for proceso in procesos:
+        if proceso.is_alive():
+            proceso.terminate()
+    for proceso in procesos:
+        proceso.join()
+
+
+def evaluar_resultado(data: Dict[str, Any], res: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Métricas comparables entre motores: paradas omitidas, tardanza total (según las llegadas
+    reportadas) y distancia. Factible = sin omisiones ni tardanzas.
+    """
+    bases = nodos_base(data)
+    W = data["time_windows"]
+    visitados = set()
+    tardanza = 0
+    for r in res.get("routes", []):
+        for n, t in zip(r["route"], r["arrival_sec"]):
+            if n in bases:
+                continue
+            visitados.add(n)
+            tardanza += max(0, t - W[n][1])
+    omitidas = sum(1 for n in range(len(W)) if n not in bases and n not in visitados)
+    return {
+        "omitidas": omitidas,
+        "tardanza_seg": int(tardanza),
+        "distancia_m": float(res.get("distance_total_m", 0)),
+        "factible": omitidas == 0 and tardanza == 0,
+    }
+
+
+def _clave_orden(ev: Dict[str, Any]):
+    return (ev["omitidas"], ev["tardanza_seg"], ev["distancia_m"])
+
+
+def costo_portafolio(ev: Dict[str, Any]) -> float:
+    return ev["omitidas"] * PESO_OMITIDA + ev["tardanza_seg"] * PESO_TARDANZA + ev["distancia_m"]
+
+
+def optimizar_ruta_portafolio(data: Dict[str, Any], tiempo_max_seg: int = 45, max_procesos: int = None,
+                              on_improvement=None, estancamiento_seg: float = None,
+                              ventanas_suaves: bool = False, permitir_omitir: bool = False) -> Dict[str, Any]:
+    """
+    Corre todos los motores de motores_portafolio(data) en paralelo bajo el mismo plazo.
+    Retorna el mejor resultado (primero factibles, luego menos omisiones/tardanza, luego
+    menor distancia) con res["motor"] y res["scoreboard"] (una fila por motor), o None.
+    on_improvement (algorithms.progreso) se llama cuando un motor termina con un resultado
+    mejor que los anteriores (costo_portafolio); los motores corren en otros procesos y no
+    reportan sus mejoras intermedias. Si retorna True no se espera a los motores restantes.
+    estancamiento_seg se pasa a cada motor (cada uno corta por su cuenta al estancarse);
+    ventanas_suaves / permitir_omitir, a los de OR-Tools (ver optimizar_ruta_algoritmo22).
+    """
+    aviso = aviso_mejoras(on_improvement)
+    motores = [(nombre, fn, {**kw, "ventanas_suaves": ventanas_suaves, "permitir_omitir": permitir_omitir}
+                if fn is optimizar_ruta_algoritmo22 else kw)
+               for nombre, fn, kw in motores_portafolio(data)]
+    if estancamiento_seg is not None:
+        motores = [(nombre, fn, {**kw, "estancamiento_seg": estancamiento_seg}) for nombre, fn, kw in motores]
+    procesos = max_procesos or min(len(motores), procesos_disponibles())
+    # Con menos procesos que motores corren por rondas: el plazo común se reparte entre ellas
+    rondas = math.ceil(len(motores) / procesos)
+    presupuesto = max(1, int(tiempo_max_seg * FRACCION_PLAZO / rondas))
+
+    scoreboard = []
+    mejor = None
+    ex = ProcessPoolExecutor(max_workers=procesos)
+    try:
+        futuros = {ex.submit(_correr_motor, fn, data, presupuesto, kw): nombre for nombre, fn, kw in motores}
+        hechos = set()
+        try:
+            for fut in as_completed(futuros, timeout=tiempo_max_seg + GRACIA_SEG):
+                hechos.add(fut)
+                nombre = futuros[fut]
+                try:
+                    res, segundos, error = fut.result()
+                except Exception as exc:   # p. ej. BrokenProcessPool
+                    res, segundos, error = None, None, f"{type(exc).__name__}: {exc}"
+                fila = {"motor": nombre, "estado": "ok" if res else (error or "sin solución"),
+                        "tiempo_s": round(segundos, 2) if segundos is not None else None}
+                scoreboard.append(fila)
+                if not res:
+                    continue
+                ev = evaluar_resultado(data, res)
+                fila.update(ev)
+                if mejor is None or _clave_orden(ev) < _clave_orden(mejor[1]):
+                    mejor = (nombre, ev, res)
+                    if aviso is not None and aviso(costo_portafolio(ev), [r["route"] for r in res["routes"]]):
+                        break
+        except PlazoAgotado:
+            pass
+        no_esperado = "detenido" if aviso is not None and aviso.detener else "fuera de plazo"
+        for fut in futuros:
+            if fut not in hechos:
+                scoreboard.append({"motor": futuros[fut], "estado": no_esperado, "tiempo_s": None})
+    finally:
+        # Los motores fuera de plazo (o tras detener) no siguen ocupando núcleos
+        _cerrar_pool(ex)
+
+    scoreboard.sort(key=lambda f: (f.get("estado") != "ok", _clave_orden(f) if "omitidas" in f else ()))
+    if mejor is None:
+        return None
+    nombre, _, res = mejor
+    res = dict(res)
+    res["motor"] = nombre
+    res["scoreboard"] = scoreboard
+    return res
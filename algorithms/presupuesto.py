@@ -0,0 +1,46 @@
+# algorithms/presupuesto.py
+# Presupuesto de tiempo adaptativo para los motores:
+#   → plazo inicial según el número de paradas y qué tan estrechas son sus ventanas
+#     (un día de 12 paradas no necesita 45 s; uno de 250 necesita más);
+#   → corte por estancamiento: si en estancamiento_seg ningún costo mejora más de
+#     UMBRAL_MEJORA (relativo), el motor termina antes del plazo (ver algorithms.progreso).
+
+import os
+from typing import Dict, Any
+
+from algorithms.flota import nodos_base
+
+MIN_SEG            = 5
+MAX_SEG            = int(os.getenv("PRESUPUESTO_MAX_SEG", "180"))
+SEG_BASE           = 3
+SEG_POR_PARADA     = 0.35
+PESO_VENTANAS      = 1.0     # ventanas muy estrechas => hasta (1 + PESO_VENTANAS) × tiempo
+UMBRAL_MEJORA      = 0.005   # mejoras menores al 0.5 % no reinician el reloj de estancamiento
+FRACCION_ESTANCAMIENTO = 0.25
+MIN_ESTANCAMIENTO_SEG  = 3
+
+
+def estrechez_ventanas(data: Dict[str, Any]) -> float:
+    """
+    0 = todas las paradas aceptan cualquier hora de la jornada, 1 = ventanas puntuales.
+    Promedio de 1 - ancho/jornada sobre las paradas (jornada = turno más largo de la flota).
+    """
+    bases = nodos_base(data)
+    turnos = data.get("vehicle_shifts") or [data["time_windows"][data["depot"]]]
+    jornada = max(1, max(int(fin) - int(ini) for ini, fin in turnos))
+    anchos = [min(1.0, (fin - ini) / jornada) for n, (ini, fin) in enumerate(data["time_windows"]) if n not in bases]
+    if not anchos:
+        return 0.0
+    return 1.0 - sum(anchos) / len(anchos)
+
+
+def presupuesto_inicial(data: Dict[str, Any]) -> int:
+    """Plazo en segundos: SEG_BASE + SEG_POR_PARADA·n, escalado por la estrechez de ventanas."""
+    n = len(data["time_windows"]) - len(nodos_base(data))
+    seg = (SEG_BASE + SEG_POR_PARADA * n) * (1 + PESO_VENTANAS * estrechez_ventanas(data))
+    return int(min(MAX_SEG, max(MIN_SEG, round(seg))))
+
+
+def estancamiento_para(tiempo_max_seg: float) -> int:
+    """Ventana de estancamiento por defecto para un plazo dado."""
+    return int(max(MIN_ESTANCAMIENTO_SEG, round(FRACCION_ESTANCAMIENTO * tiempo_max_seg)))
@@ -0,0 +1,64 @@
+# algorithms/progreso.py
+# Soluciones "anytime": todos los motores avisan cada mejora con el mismo callback
+#     on_improvement(rutas, costo, segundos)
+#   rutas    → lista de nodos por vehículo, empezando en su nodo de inicio (como
+#              res["routes"][v]["route"]); sin la base de fin.
+#   costo    → objetivo propio del motor (menor es mejor; no comparable entre motores).
+#   segundos → tiempo desde que el motor empezó a resolver.
+# Si el callback retorna True, el motor corta la búsqueda y devuelve lo mejor que tiene.
+# Con estancamiento_seg (ver algorithms.presupuesto) también corta si en ese lapso ningún
+# costo mejoró más de UMBRAL_MEJORA.
+
+import time
+from typing import Callable, List, Optional
+
+from algorithms.presupuesto import UMBRAL_MEJORA
+
+OnImprovement = Callable[[List[List[int]], float, float], Optional[bool]]
+
+
+class AvisoMejoras:
+    """
+    Filtro común de los motores: solo llama a on_improvement cuando el costo baja
+    estrictamente. rutas puede ser una función (se evalúa solo si hay mejora).
+    Los motores consultan estancado() en sus bucles para el corte por estancamiento.
+    """
+
+    def __init__(self, on_improvement: Optional[OnImprovement] = None, estancamiento_seg: float = None,
+                 umbral: float = UMBRAL_MEJORA):
+        self.on_improvement = on_improvement
+        self.estancamiento_seg = estancamiento_seg
+        self.umbral = umbral
+        self.t0 = time.time()
+        self.mejor = None
+        self.detener = False
+        self._ref = None           # costo de la última mejora significativa (> umbral)
+        self._t_ref = self.t0
+
+    def estancado(self) -> bool:
+        return self.estancamiento_seg is not None and time.time() - self._t_ref > self.estancamiento_seg
+
+    def __call__(self, costo, rutas, siempre=False) -> bool:
+        """
+        Registra una solución; retorna True si hay que detener la búsqueda.
+        siempre=True avisa aunque el costo no baje (cambio de fase del motor, p. ej. de
+        subrutas a rutas por vehículo, donde los costos no son comparables).
+        """
+        if self._ref is None or costo < self._ref - abs(self._ref) * self.umbral:
+            self._ref, self._t_ref = costo, time.time()
+        if not siempre and self.mejor is not None and costo >= self.mejor:
+            return self.detener or self.estancado()
+        self.mejor = costo
+        if self.on_improvement is not None:
+            if callable(rutas):
+                rutas = rutas()
+            if self.on_improvement([list(r) for r in rutas], costo, time.time() - self.t0):
+                self.detener = True
+        return self.detener or self.estancado()
+
+
+def aviso_mejoras(on_improvement: Optional[OnImprovement], estancamiento_seg: float = None) -> Optional[AvisoMejoras]:
+    """AvisoMejoras, o None sin callback ni corte por estancamiento (los motores no pagan nada)."""
+    if on_improvement is None and estancamiento_seg is None:
+        return None
+    return AvisoMejoras(on_improvement, estancamiento_seg)
@@ -0,0 +1,27 @@
+# algorithms/transitos.py
+# Matrices de tránsito precalculadas (NumPy) para registrarlas en OR-Tools con
+# RegisterTransitMatrix / RegisterUnaryTransitVector: la búsqueda (GLS) evalúa los arcos
+# en C++ sin volver a Python en cada llamada.
+
+from typing import Dict, Any, List
+
+import numpy as np
+
+
+def matriz_transito(data: Dict[str, Any], servicio_deposito: int = None) -> np.ndarray:
+    """
+    Tránsito i -> j = servicio en i + viaje i -> j (int64, n×n), la misma convención del
+    callback time_cb. Si servicio_deposito no es None, reemplaza el servicio del depósito
+    y de los nodos de inicio de cada vehículo (data["starts"]).
+    """
+    T = np.asarray(data["duration_matrix"], dtype=np.int64)
+    n = len(T)
+    svc = np.array(data.get("service_times") or [0] * n, dtype=np.int64)
+    if servicio_deposito is not None:
+        svc[[data["depot"]] + list(data.get("starts") or [])] = servicio_deposito
+    return T + svc[:, None]
+
+
+def vector_demandas(data: Dict[str, Any]) -> List[int]:
+    """Demanda por nodo como enteros Python (lo que espera RegisterUnaryTransitVector)."""
+    return [int(d) for d in data["demands"]]
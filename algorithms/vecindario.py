@@ -0,0 +1,164 @@
+# algorithms/vecindario.py
+# Conjunto disperso de arcos: para cada nodo solo sus k sucesores más cercanos
+# (en tiempo) que además sean compatibles con las ventanas de tiempo.
+# Se guarda en formato CSR (indptr, indices) y los solvers lo usan, si viene en
+# data["neighbors"], para no crear variables/movimientos sobre arcos inútiles.
+# En instancias grandes tampoco se pide la matriz completa: arcos_a_pedir lista los
+# vecinos geográficos (BallTree) y los arcos de las bases, O(n·k) celdas.
+
+from typing import Dict, Any, List
+
+import numpy as np
+
+from algorithms.flota import nodos_base
+
+K_VECINOS       = 20     # sucesores por nodo
+UMBRAL_VECINOS  = 60     # por debajo de este tamaño los solvers usan la matriz completa
+K_PEDIR         = 2 * K_VECINOS   # vecinos geográficos por nodo cuyas duraciones se piden
+
+
+class VecinosCSR:
+    """
+    Lista de sucesores por nodo en CSR:
+      indices[indptr[i]:indptr[i+1]] = sucesores de i, ordenados por duración creciente.
+    """
+
+    def __init__(self, indptr, indices):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.n = len(self.indptr) - 1
+        self._arcos = None
+
+    def sucesores(self, i: int) -> np.ndarray:
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def predecesores(self) -> List[List[int]]:
+        """Lista de predecesores por nodo (transpuesta del CSR)."""
+        pred = [[] for _ in range(self.n)]
+        for i in range(self.n):
+            for j in self.sucesores(i):
+                pred[int(j)].append(i)
+        return pred
+
+    def contiene(self, i: int, j: int) -> bool:
+        if self._arcos is None:
+            filas, cols = self.pares()
+            self._arcos = set((filas * self.n + cols).tolist())
+        return i * self.n + j in self._arcos
+
+    def pares(self):
+        """Arcos como dos arrays int64 (origen, destino), en el orden del CSR."""
+        filas = np.repeat(np.arange(self.n, dtype=np.int64), np.diff(self.indptr))
+        return filas, self.indices.astype(np.int64)
+
+    def arcos(self):
+        for i in range(self.n):
+            for j in self.sucesores(i):
+                yield i, int(j)
+
+    @property
+    def num_arcos(self) -> int:
+        return int(self.indptr[-1])
+
+
+def _a_csr(listas):
+    indptr = np.zeros(len(listas) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(l) for l in listas])
+    indices = np.concatenate([np.asarray(l, dtype=np.int32) for l in listas]) if listas else np.zeros(0, np.int32)
+    return VecinosCSR(indptr, indices)
+
+
+def _csr_de_arcos(n, filas, cols, costo=None):
+    """
+    CSR a partir de arcos sueltos (con repetidos): deja cada arco una vez y ordena cada fila
+    por 'costo' creciente (empates por destino) o, sin costo, por destino. Memoria O(arcos).
+    """
+    filas = np.asarray(filas, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    clave = np.unique(filas * n + cols)          # ordenado por fila y destino
+    filas, cols = clave // n, clave % n
+    if costo is not None:
+        orden = np.lexsort((cols, costo(filas, cols), filas))
+        filas, cols = filas[orden], cols[orden]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(filas, minlength=n))
+    return VecinosCSR(indptr, cols)
+
+
+def construir_vecinos(data: Dict[str, Any], k: int = K_VECINOS, medidos=None) -> VecinosCSR:
+    """
+    A partir de data["duration_matrix"], data["time_windows"] y data["service_times"]:
+      - arco i->j compatible si saliendo lo antes posible de i se llega a j antes de que cierre:
+            w0_i + servicio_i + T[i][j] <= w1_j
+      - se quedan los k compatibles más cercanos de cada nodo, unidos con los k predecesores
+        más cercanos de cada nodo (así todo nodo tiene entradas y salidas);
+      - el depósito y las bases de la flota (inicio/fin de cada vehículo) conservan
+        todos sus arcos de salida y entrada;
+      - con 'medidos' (bool n×n), solo arcos cuya duración se pidió al backend (el resto de
+        la matriz es una estimación).
+    """
+    T = np.asarray(data["duration_matrix"], dtype=np.int64)
+    n = len(T)
+    bases = np.asarray(sorted(nodos_base(data)), dtype=np.int64)
+    W = np.asarray(data["time_windows"], dtype=np.int64).reshape(n, 2)
+    svc = np.asarray(data.get("service_times") or [0] * n, dtype=np.int64)
+
+    llegada_min = (W[:, 0] + svc)[:, None] + T
+    compatible = llegada_min <= W[None, :, 1]
+    np.fill_diagonal(compatible, False)
+
+    # Coste para ordenar: duración; los incompatibles quedan al final (inf)
+    if medidos is not None:
+        compatible &= np.asarray(medidos, dtype=bool)
+    costo = np.where(compatible, T, np.iinfo(np.int64).max)
+    kk = min(k, n - 1)
+    if kk <= 0:
+        return _a_csr([[] for _ in range(n)])
+
+    mejores_suc = np.argpartition(costo, kk - 1, axis=1)[:, :kk]
+    mejores_pred = np.argpartition(costo, kk - 1, axis=0)[:kk, :]
+
+    # Arcos candidatos fila a fila, sin máscara n×n: k sucesores y k predecesores compatibles,
+    # más todos los arcos de las bases
+    todos = np.arange(n, dtype=np.int64)
+    filas = np.concatenate([np.repeat(todos, kk), mejores_pred.ravel()])
+    cols = np.concatenate([mejores_suc.ravel(), np.tile(todos, kk)])
+    ok = compatible[filas, cols]
+    filas = np.concatenate([filas[ok], np.repeat(bases, n), np.tile(todos, len(bases))])
+    cols = np.concatenate([cols[ok], np.tile(todos, len(bases)), np.repeat(bases, n)])
+    ok = filas != cols
+    if medidos is not None:
+        ok &= np.asarray(medidos, dtype=bool)[filas, cols]
+    return _csr_de_arcos(n, filas[ok], cols[ok], costo=lambda f, c: T[f, c])
+
+
+def vecinos_geograficos(coords, k: int = K_VECINOS) -> VecinosCSR:
+    """
+    k vecinos más cercanos en línea recta con un BallTree (métrica haversine):
+    memoria O(n·k), sin matriz n×n. Sirve para decidir qué arcos pedir al backend.
+    """
+    from sklearn.neighbors import BallTree
+
+    rad = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+    n = len(rad)
+    kk = min(k + 1, n)
+    _, idx = BallTree(rad, metric="haversine").query(rad, k=kk)
+    listas = [[int(j) for j in fila if j != i][:k] for i, fila in enumerate(idx)]
+    return _a_csr(listas)
+
+
+def arcos_a_pedir(coords, fijos=(), k: int = K_PEDIR) -> VecinosCSR:
+    """
+    Celdas a pedir al backend, como CSR: i->j y j->i para los k vecinos geográficos de
+    cada nodo, más todas las filas y columnas de los nodos 'fijos' (depósito y bases).
+    O(n·k) celdas; la diagonal no se incluye.
+    """
+    vecinos = vecinos_geograficos(coords, k)
+    n = vecinos.n
+    filas, cols = vecinos.pares()
+    fijos = np.asarray(sorted(fijos), dtype=np.int64)
+    todos = np.arange(n, dtype=np.int64)
+    origen = np.concatenate([filas, cols, np.repeat(fijos, n), np.tile(todos, len(fijos))])
+    destino = np.concatenate([cols, filas, np.tile(todos, len(fijos)), np.repeat(fijos, n)])
+    ok = origen != destino
+    return _csr_de_arcos(n, origen[ok], destino[ok])
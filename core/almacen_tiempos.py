@@ -0,0 +1,188 @@
+# core/almacen_tiempos.py
+# Almacén persistente (SQLite) de distancias/duraciones por PAR de puntos.
+# Clave: (origen redondeado, destino redondeado, franja horaria). Así, agregar o quitar
+# un pedido solo obliga a pedir a Google las celdas nuevas, no las n² de toda la matriz.
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+CACHE_DIR         = os.getenv("LAVANDERIA_CACHE_DIR", os.path.join(os.getcwd(), ".cache"))
+DECIMALES_COORD   = 5          # ~1.1 m en latitud
+MINUTOS_FRANJA    = 60         # tamaño de la franja horaria (bucket)
+VIGENCIA_DIAS     = 30         # las celdas más antiguas se vuelven a consultar
+
+_SQL_CREAR = """
+CREATE TABLE IF NOT EXISTS tiempos (
+    o_lat  INTEGER NOT NULL,
+    o_lon  INTEGER NOT NULL,
+    d_lat  INTEGER NOT NULL,
+    d_lon  INTEGER NOT NULL,
+    franja INTEGER NOT NULL,
+    dist_m INTEGER NOT NULL,
+    dur_s  INTEGER NOT NULL,
+    creado REAL    NOT NULL,
+    PRIMARY KEY (o_lat, o_lon, d_lat, d_lon, franja)
+) WITHOUT ROWID
+"""
+
+
+def franja_horaria(momento, minutos=MINUTOS_FRANJA):
+    """Índice de franja del día para un datetime (0 = 00:00-00:59 con franjas de 60 min)."""
+    return (momento.hour * 60 + momento.minute) // minutos
+
+
+def agrupar_faltantes(faltan, densidad=0.5):
+    """
+    Agrupa las celdas faltantes (máscara booleana n×m) en bloques rectangulares filas×columnas.
+      1) Filas "densas" (faltan ≥ densidad de las columnas pendientes) van en un solo bloque.
+      2) Igual con columnas densas entre lo que queda.
+      3) El resto se agrupa por patrón idéntico de columnas faltantes.
+    Matriz vacía -> un solo bloque n×n; un pedido nuevo k -> {k}×todas + resto×{k}, O(n) celdas.
+    """
+    pendiente = np.array(faltan, dtype=bool, copy=True)
+    bloques = []
+
+    for transpuesta in (False, True):
+        m = pendiente.T if transpuesta else pendiente
+        cols = np.flatnonzero(m.any(axis=0))
+        if cols.size == 0:
+            return bloques
+        frac = m[:, cols].sum(axis=1) / cols.size
+        densas = np.flatnonzero(frac >= densidad)
+        if densas.size:
+            bloques.append((cols, densas) if transpuesta else (densas, cols))
+            m[densas, :] = False   # m es una vista: actualiza 'pendiente'
+
+    filas = np.flatnonzero(pendiente.any(axis=1))
+    if filas.size == 0:
+        return bloques
+    patrones, inverso = np.unique(pendiente[filas], axis=0, return_inverse=True)
+    inverso = np.asarray(inverso).reshape(-1)
+    for p, patron in enumerate(patrones):
+        bloques.append((filas[inverso == p], np.flatnonzero(patron)))
+    return bloques
+
+
+class AlmacenTiempos:
+    """
+    Tabla SQLite (un archivo bajo CACHE_DIR) con una fila por par origen→destino y franja.
+    Cada operación abre su propia conexión: Streamlit ejecuta los reruns en hilos distintos.
+    """
+
+    def __init__(self, ruta=None, decimales=DECIMALES_COORD, vigencia_dias=VIGENCIA_DIAS):
+        self.ruta = ruta or os.path.join(CACHE_DIR, "tiempos_viaje.sqlite")
+        self.escala = 10 ** decimales
+        self.vigencia_seg = vigencia_dias * 86400
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        with self._conectar() as con:
+            con.execute(_SQL_CREAR)
+
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with con:  # commit / rollback
+                yield con
+        finally:
+            con.close()
+
+    def _claves(self, coords):
+        """Coordenadas redondeadas a enteros (lat·10^d, lon·10^d)."""
+        arr = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        return np.rint(arr * self.escala).astype(np.int64)
+
+    def consultar(self, orig_coords, dest_coords, franja):
+        """
+        Arma la matriz orig×dest a partir de lo guardado.
+        Retorna (dist, dur, faltan): arrays int32 (-1 donde no hay dato) y máscara de celdas faltantes.
+        Los pares con origen = destino nunca faltan (distancia 0).
+        """
+        co = self._claves(orig_coords)
+        cd = self._claves(dest_coords)
+        dist = np.full((len(co), len(cd)), -1, dtype=np.int32)
+        dur = np.full((len(co), len(cd)), -1, dtype=np.int32)
+        limite = time.time() - self.vigencia_seg
+
+        with self._conectar() as con:
+            con.execute("CREATE TEMP TABLE IF NOT EXISTS nodos (lado INTEGER, idx INTEGER, lat INTEGER, lon INTEGER)")
+            con.execute("DELETE FROM nodos")
+            con.executemany(
+                "INSERT INTO nodos VALUES (?, ?, ?, ?)",
+                [(0, i, int(la), int(lo)) for i, (la, lo) in enumerate(co)]
+                + [(1, j, int(la), int(lo)) for j, (la, lo) in enumerate(cd)]
+            )
+            filas = con.execute(
+                """
+                SELECT o.idx, d.idx, t.dist_m, t.dur_s
+                FROM nodos o CROSS JOIN nodos d
+                JOIN tiempos t
+                  ON t.o_lat = o.lat AND t.o_lon = o.lon
+                 AND t.d_lat = d.lat AND t.d_lon = d.lon
+                 AND t.franja = ?
+                WHERE o.lado = 0 AND d.lado = 1 AND t.creado >= ?
+                """,
+                (int(franja), limite)
+            ).fetchall()
+
+        if filas:
+            res = np.asarray(filas, dtype=np.int64)
+            dist[res[:, 0], res[:, 1]] = res[:, 2]
+            dur[res[:, 0], res[:, 1]] = res[:, 3]
+        mismo = (co[:, None, :] == cd[None, :, :]).all(axis=2)
+        dist[mismo] = 0
+        dur[mismo] = 0
+        return dist, dur, dist < 0
+
+    def guardar(self, orig_coords, dest_coords, franja, dist, dur):
+        """Guarda (o reemplaza) el bloque orig×dest de distancias y duraciones."""
+        co = self._claves(orig_coords)
+        cd = self._claves(dest_coords)
+        dist = np.asarray(dist)
+        dur = np.asarray(dur)
+        ahora = time.time()
+        filas = [
+            (int(co[i, 0]), int(co[i, 1]), int(cd[j, 0]), int(cd[j, 1]), int(franja),
+             int(dist[i, j]), int(dur[i, j]), ahora)
+            for i in range(len(co)) for j in range(len(cd))
+            if dist[i, j] >= 0
+        ]
+        if not filas:
+            return 0
+        with self._lock, self._conectar() as con:
+            con.executemany("INSERT OR REPLACE INTO tiempos VALUES (?, ?, ?, ?, ?, ?, ?, ?)", filas)
+        return len(filas)
+
+    def _unicas(self, coords):
+        """Coordenadas sin repetir (misma clave) y el índice para expandirlas de vuelta."""
+        _, primeros, inv = np.unique(self._claves(coords), axis=0, return_index=True, return_inverse=True)
+        return [coords[i] for i in primeros], np.asarray(inv).reshape(-1)
+
+    def bloque(self, orig_coords, dest_coords, franja, consultar_bloque):
+        """
+        Devuelve (dist, dur) completas para orig×dest. Solo pide a consultar_bloque(orig, dest)
+        -> (dist, dur) las celdas que no están en el almacén, y las guarda.
+        """
+        orig_u, inv_o = self._unicas([tuple(c) for c in orig_coords])
+        dest_u, inv_d = self._unicas([tuple(c) for c in dest_coords])
+
+        dist, dur, faltan = self.consultar(orig_u, dest_u, franja)
+        for filas, cols in agrupar_faltantes(faltan):
+            orig = [orig_u[i] for i in filas]
+            dest = [dest_u[j] for j in cols]
+            d_blk, t_blk = consultar_bloque(orig, dest)
+            d_blk = np.asarray(d_blk, dtype=np.int32)
+            t_blk = np.asarray(t_blk, dtype=np.int32)
+            dist[np.ix_(filas, cols)] = d_blk
+            dur[np.ix_(filas, cols)] = t_blk
+            self.guardar(orig, dest, franja, d_blk, t_blk)
+        return dist[np.ix_(inv_o, inv_d)], dur[np.ix_(inv_o, inv_d)]
+
+    def matriz(self, coords, franja, consultar_bloque):
+        """Matriz cuadrada n×n: atajo de bloque(coords, coords, ...)."""
+        return self.bloque(coords, coords, franja, consultar_bloque)
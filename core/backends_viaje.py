@@ -0,0 +1,279 @@
+# core/backends_viaje.py
+# Backends intercambiables de tiempos de viaje. Todos exponen:
+#     bloque(origenes, destinos, salida=None) -> (dist_m, dur_s)   int32 len(orig) × len(dest)
+#     matriz(coords, salida=None)             -> (dist_m, dur_s)   int32 n × n
+#   'salida' (datetime) solo la usan los backends dependientes del tráfico; los demás la ignoran.
+#   → BackendGoogle:    Distance Matrix API (teselas concurrentes + almacén persistente por par).
+#   → BackendHaversine: línea recta a velocidad constante (sin red, el fallback de siempre).
+#   → BackendRedLocal:  grafo vial construido desde un extracto OSM en disco; consultas
+#                       muchos-a-muchos con Dijkstra en bloque (scipy.sparse.csgraph, en C).
+#                       Sin red, determinista: útil también para benchmarks y pruebas.
+
+import bz2
+import gzip
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import numpy as np
+
+from core.almacen_tiempos import franja_horaria
+from core.geodesia import haversine_metros, matrices_distancia_duracion
+from core.matriz_google import descargar_matriz
+
+# Velocidades urbanas (km/h) por tipo de vía OSM cuando la vía no trae maxspeed
+VELOCIDADES_KMH = {
+    "motorway": 70, "motorway_link": 45,
+    "trunk": 50, "trunk_link": 35,
+    "primary": 40, "primary_link": 30,
+    "secondary": 35, "secondary_link": 28,
+    "tertiary": 30, "tertiary_link": 25,
+    "unclassified": 25, "residential": 20,
+    "living_street": 10, "service": 15, "road": 20,
+}
+VEL_ACCESO_KMH = 15     # tramo recto punto -> nodo de la red más cercano
+FUENTES_POR_LOTE = 16   # orígenes por llamada a Dijkstra (acota la memoria)
+
+
+class BackendViaje:
+    """Interfaz común. Las subclases implementan bloque()."""
+
+    nombre = "base"
+    depende_de_hora = False
+
+    def bloque(self, origenes, destinos, salida=None):
+        raise NotImplementedError
+
+    def matriz(self, coords, salida=None):
+        return self.bloque(coords, coords, salida=salida)
+
+
+class BackendHaversine(BackendViaje):
+    nombre = "haversine"
+
+    def __init__(self, vel_kmh=40.0):
+        self.vel_kmh = vel_kmh
+
+    def bloque(self, origenes, destinos, salida=None):
+        return matrices_distancia_duracion(origenes, destinos, vel_kmh=self.vel_kmh)
+
+    def matriz(self, coords, salida=None):
+        return matrices_distancia_duracion(coords, vel_kmh=self.vel_kmh)
+
+
+class BackendGoogle(BackendViaje):
+    """
+    Distance Matrix API con tráfico a la hora de la consulta.
+    Si se pasa un AlmacenTiempos, solo se compran las celdas que no estén guardadas.
+    """
+
+    nombre = "google"
+    depende_de_hora = True
+
+    def __init__(self, cliente, almacen=None, limitador=None):
+        self.cliente = cliente
+        self.almacen = almacen
+        self.limitador = limitador
+
+    def bloque(self, origenes, destinos, salida=None):
+        salida = salida or datetime.now()
+
+        def _descargar(orig, dest):
+            return descargar_matriz(self.cliente, orig, dest, salida=salida, limitador=self.limitador)
+
+        if self.almacen is None:
+            return _descargar(list(origenes), list(destinos))
+        return self.almacen.bloque(origenes, destinos, franja_horaria(salida), _descargar)
+
+
+# ===================== RED VIAL LOCAL (OSM) =====================
+
+def _abrir(ruta):
+    if ruta.endswith(".gz"):
+        return gzip.open(ruta, "rb")
+    if ruta.endswith(".bz2"):
+        return bz2.open(ruta, "rb")
+    return open(ruta, "rb")
+
+
+def _velocidad(tags):
+    vmax = tags.get("maxspeed", "")
+    try:
+        return float(vmax.split()[0])
+    except (ValueError, IndexError):
+        return float(VELOCIDADES_KMH[tags["highway"]])
+
+
+def leer_osm(ruta):
+    """
+    Lee un extracto .osm (XML, opcionalmente .gz/.bz2) y devuelve las aristas transitables:
+    (coords_nodos (V×2), origen (E,), destino (E,), metros (E,), segundos (E,)).
+    """
+    nodos = {}
+    vias = []
+    for _, el in ET.iterparse(_abrir(ruta), events=("end",)):
+        if el.tag == "node":
+            nodos[el.get("id")] = (float(el.get("lat")), float(el.get("lon")))
+            el.clear()
+        elif el.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in el.findall("tag")}
+            if tags.get("highway") in VELOCIDADES_KMH and tags.get("access") not in ("no", "private"):
+                refs = [nd.get("ref") for nd in el.findall("nd")]
+                vias.append((refs, tags))
+            el.clear()
+
+    indice = {}
+    coords = []
+    u_l, v_l, vel_l, sentido_l = [], [], [], []
+    for refs, tags in vias:
+        refs = [r for r in refs if r in nodos]
+        vel = _velocidad(tags)
+        oneway = tags.get("oneway", "no")
+        if tags.get("junction") == "roundabout" and oneway == "no":
+            oneway = "yes"
+        for a, b in zip(refs, refs[1:]):
+            for r in (a, b):
+                if r not in indice:
+                    indice[r] = len(coords)
+                    coords.append(nodos[r])
+            u_l.append(indice[a])
+            v_l.append(indice[b])
+            vel_l.append(vel)
+            sentido_l.append(oneway)
+
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    u = np.asarray(u_l, dtype=np.int64)
+    v = np.asarray(v_l, dtype=np.int64)
+    vel = np.asarray(vel_l, dtype=np.float64)
+    sentido = np.asarray(sentido_l)
+    metros = haversine_metros(coords[u, 0], coords[u, 1], coords[v, 0], coords[v, 1])
+
+    ida = sentido != "-1"
+    vuelta = ~np.isin(sentido, ("yes", "true", "1"))
+    origen = np.concatenate([u[ida], v[vuelta]])
+    destino = np.concatenate([v[ida], u[vuelta]])
+    m = np.concatenate([metros[ida], metros[vuelta]])
+    s = m / (np.concatenate([vel[ida], vel[vuelta]]) * 1000 / 3600)
+    return coords, origen, destino, m, s
+
+
+class BackendRedLocal(BackendViaje):
+    """
+    Tiempos por la red vial de un extracto OSM, sin red ni API.
+    El grafo procesado se guarda junto al .osm (<archivo>.grafo.npz) para no re-parsear.
+    """
+
+    nombre = "osm"
+
+    def __init__(self, ruta_osm, vel_acceso_kmh=VEL_ACCESO_KMH):
+        from scipy.sparse import csr_matrix
+        from scipy.spatial import cKDTree
+
+        cache = ruta_osm + ".grafo.npz"
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(ruta_osm):
+            z = np.load(cache)
+            coords, origen, destino, metros, segundos = (z[k] for k in ("coords", "origen", "destino", "metros", "segundos"))
+        else:
+            coords, origen, destino, metros, segundos = leer_osm(ruta_osm)
+            np.savez(cache, coords=coords, origen=origen, destino=destino, metros=metros, segundos=segundos)
+
+        V = len(coords)
+        self.coords = coords
+        # Aristas paralelas: csr_matrix suma duplicados, así que nos quedamos con la más rápida
+        orden = np.lexsort((segundos, destino, origen))
+        origen, destino, metros, segundos = origen[orden], destino[orden], metros[orden], segundos[orden]
+        primera = np.ones(len(origen), dtype=bool)
+        primera[1:] = (origen[1:] != origen[:-1]) | (destino[1:] != destino[:-1])
+        origen, destino, metros, segundos = origen[primera], destino[primera], metros[primera], segundos[primera]
+        # Dijkstra ignora aristas de peso 0: se les da un mínimo positivo
+        self.g_seg = csr_matrix((np.maximum(segundos, 1e-3), (origen, destino)), shape=(V, V))
+        self.g_met = csr_matrix((metros, (origen, destino)), shape=(V, V))
+
+        self.lat0 = float(coords[:, 0].mean()) if V else 0.0
+        self._kd = cKDTree(self._proyectar(coords))
+        self.v_acceso = vel_acceso_kmh * 1000 / 3600
+
+    def _proyectar(self, coords):
+        """Proyección equirectangular local a metros (suficiente para buscar el nodo más cercano)."""
+        c = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack([
+            c[:, 0] * 111_320.0,
+            c[:, 1] * 111_320.0 * np.cos(np.radians(self.lat0)),
+        ])
+
+    def _enganchar(self, coords):
+        """Nodo de la red más cercano a cada punto y longitud del tramo de acceso (m)."""
+        c = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        _, nodo = self._kd.query(self._proyectar(c))
+        acceso = haversine_metros(c[:, 0], c[:, 1], self.coords[nodo, 0], self.coords[nodo, 1])
+        return nodo, acceso
+
+    def _metros_por_arbol(self, pred, destinos):
+        """
+        Metros a lo largo del camino MÁS RÁPIDO (árbol de predecesores de Dijkstra),
+        vía saltos de puntero vectorizados: O(V log profundidad) por lote.
+        """
+        k, V = pred.shape
+        filas = np.arange(k)[:, None]
+        padre = np.where(pred < 0, np.arange(V)[None, :], pred)
+        # peso de la arista padre -> v
+        w = np.asarray(self.g_met[padre.ravel(), np.tile(np.arange(V), k)]).reshape(k, V)
+        w[pred < 0] = 0.0
+        acum = w
+        while True:
+            sig = padre[filas, padre]
+            if np.array_equal(sig, padre):
+                break
+            acum = acum + acum[filas, padre]   # la raíz tiene acum 0
+            padre = sig
+        return acum[:, destinos]
+
+    def bloque(self, origenes, destinos, salida=None):
+        from scipy.sparse.csgraph import dijkstra
+
+        origenes = np.asarray(origenes, dtype=np.float64).reshape(-1, 2)
+        destinos = np.asarray(destinos, dtype=np.float64).reshape(-1, 2)
+        n_o, acc_o = self._enganchar(origenes)
+        n_d, acc_d = self._enganchar(destinos)
+        fuentes, inv = np.unique(n_o, return_inverse=True)
+
+        seg = np.empty((len(fuentes), len(n_d)), dtype=np.float64)
+        met = np.empty((len(fuentes), len(n_d)), dtype=np.float64)
+        for i0 in range(0, len(fuentes), FUENTES_POR_LOTE):
+            lote = fuentes[i0:i0 + FUENTES_POR_LOTE]
+            t, pred = dijkstra(self.g_seg, directed=True, indices=lote, return_predecessors=True)
+            seg[i0:i0 + len(lote)] = t[:, n_d]
+            met[i0:i0 + len(lote)] = self._metros_por_arbol(pred, n_d)
+
+        seg = seg[inv]
+        met = met[inv]
+        # Destinos inalcanzables (red desconectada): se usa la línea recta a velocidad de acceso
+        sin_camino = ~np.isfinite(seg)
+        if sin_camino.any():
+            recta = matrices_distancia_duracion(origenes, destinos,
+                                                vel_kmh=self.v_acceso * 3600 / 1000)
+            met[sin_camino] = recta[0][sin_camino]
+            seg[sin_camino] = recta[1][sin_camino]
+
+        acceso = acc_o[:, None] + acc_d[None, :]
+        dist = met + acceso
+        dur = seg + acceso / self.v_acceso
+        # mismo punto -> 0
+        mismo = (origenes[:, None, :] == destinos[None, :, :]).all(axis=2)
+        dist[mismo] = 0
+        dur[mismo] = 0
+        return dist.astype(np.int32), dur.astype(np.int32)
+
+
+def crear_backend(nombre, cliente=None, almacen=None, limitador=None, ruta_osm=None):
+    """Fábrica: 'google', 'haversine' u 'osm'."""
+    nombre = (nombre or "haversine").lower()
+    if nombre == "google":
+        return BackendGoogle(cliente, almacen=almacen, limitador=limitador)
+    if nombre == "osm":
+        if not ruta_osm or not os.path.exists(ruta_osm):
+            raise ValueError(f"Backend 'osm' requiere un extracto OSM existente (ruta: {ruta_osm!r})")
+        return BackendRedLocal(ruta_osm)
+    if nombre == "haversine":
+        return BackendHaversine()
+    raise ValueError(f"Backend de viaje desconocido: {nombre!r}")
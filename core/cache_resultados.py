@@ -0,0 +1,122 @@
+# core/cache_resultados.py
+# Caché de resultados de los solvers, indexada por la huella canónica de la instancia:
+# coordenadas, ventanas, servicios, demandas, flota, resumen (hash) de las matrices,
+# algoritmo y parámetros. Una misma consulta (otra sesión, otro conductor, volver a una
+# fecha/algoritmo ya vistos) se responde al instante sin volver a resolver.
+#   → SQLite bajo CACHE_DIR, con desalojo LRU (se conservan las MAX_ENTRADAS más usadas).
+#   → Las peticiones idénticas simultáneas las agrupa core.trabajos (un trabajo por huella).
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from core.almacen_tiempos import CACHE_DIR
+
+MAX_ENTRADAS  = 200
+VERSION_CACHE = 1      # subir cuando cambie el formato de resultados o los solvers
+
+_SQL_CREAR = """
+CREATE TABLE IF NOT EXISTS resultados (
+    huella    TEXT PRIMARY KEY,
+    resultado TEXT NOT NULL,
+    creado    REAL NOT NULL,
+    usado     REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def _resumen_matriz(m):
+    """sha256 de una matriz entera (n×n o franja×n×n)."""
+    if m is None:
+        return None
+    return hashlib.sha256(np.ascontiguousarray(m, dtype=np.int64).tobytes()).hexdigest()
+
+
+def huella_instancia(data, algoritmo, parametros=None):
+    """
+    Hash estable de la instancia canónica + algoritmo + parámetros.
+    No incluye data["initial_routes"] ni data["neighbors"]: cambian cómo se busca,
+    no el problema (los vecinos se derivan de lo que sí entra).
+    """
+    perfil = data.get("duration_profile")
+    canonica = {
+        "version": VERSION_CACHE,
+        "coords": [[round(float(la), 6), round(float(lo), 6)] for la, lo in data.get("coords") or []],
+        "time_windows": [list(map(int, w)) for w in data["time_windows"]],
+        "service_times": [int(s) for s in data.get("service_times") or []],
+        "demands": [int(d) for d in data.get("demands") or []],
+        "num_vehicles": int(data.get("num_vehicles", 1)),
+        "vehicle_capacities": [int(c) for c in data.get("vehicle_capacities") or []],
+        "vehicle_shifts": [list(map(int, t)) for t in data.get("vehicle_shifts") or []],
+        "starts": [int(s) for s in data.get("starts") or []],
+        "ends": [int(e) for e in data.get("ends") or []],
+        "depot": int(data["depot"]),
+        "distance_matrix": _resumen_matriz(data["distance_matrix"]),
+        "duration_matrix": _resumen_matriz(data["duration_matrix"]),
+        "duration_profile": None if perfil is None else [_resumen_matriz(perfil.duraciones), perfil.t0, perfil.paso],
+        "algoritmo": algoritmo,
+        "parametros": parametros or {},
+    }
+    texto = json.dumps(canonica, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _a_json(obj):
+    """Tipos NumPy dentro de los resultados -> tipos nativos."""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, set):
+        return sorted(obj)
+    raise TypeError(f"No serializable: {type(obj).__name__}")
+
+
+class CacheResultados:
+    """
+    Tabla SQLite huella -> resultado (JSON). Cada operación abre su propia conexión.
+    """
+
+    def __init__(self, ruta=None, max_entradas=MAX_ENTRADAS):
+        self.ruta = ruta or os.path.join(CACHE_DIR, "resultados_solver.sqlite")
+        self.max_entradas = max_entradas
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        with self._conectar() as con:
+            con.execute(_SQL_CREAR)
+
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with con:  # commit / rollback
+                yield con
+        finally:
+            con.close()
+
+    def obtener(self, huella):
+        """Resultado guardado o None (marca la entrada como usada recientemente)."""
+        with self._conectar() as con:
+            fila = con.execute("SELECT resultado FROM resultados WHERE huella = ?", (huella,)).fetchone()
+            if fila is None:
+                return None
+            con.execute("UPDATE resultados SET usado = ? WHERE huella = ?", (time.time(), huella))
+        return json.loads(fila[0])
+
+    def guardar(self, huella, resultado):
+        ahora = time.time()
+        texto = json.dumps(resultado, default=_a_json)
+        with self._conectar() as con:
+            con.execute("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?)", (huella, texto, ahora, ahora))
+            # LRU: se borran las menos usadas por encima del máximo
+            con.execute(
+                "DELETE FROM resultados WHERE huella IN ("
+                " SELECT huella FROM resultados ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+                (self.max_entradas,)
+            )
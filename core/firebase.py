@@ -130,3 +130,14 @@ def obtener_historial_corridas(db):
     if not df.empty and "fecha_corrida" in df.columns:
         df = df.sort_values("fecha_corrida", ascending=True)
     return df
+
+# ------------------- ÚLTIMA RUTA GUARDADA (ARRANQUE EN CALIENTE) -----------
+
+def obtener_ruta_guardada(db, fecha: str):
+    """
+    Último documento de la colección 'rutas' para la fecha ('YYYY-MM-DD'), o None.
+    """
+    docs = [doc.to_dict() for doc in db.collection("rutas").where("fecha", "==", fecha).stream()]
+    if not docs:
+        return None
+    return max(docs, key=lambda d: str(d.get("creado_en") or ""))
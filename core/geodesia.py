@@ -0,0 +1,64 @@
+# core/geodesia.py
+# Motor geodésico vectorizado (NumPy) compartido por algorithms/ y core/logsalt.py.
+# Reemplaza los dobles bucles con math.sin/math.asin por operaciones con broadcasting.
+
+import numpy as np
+
+R_TIERRA_M = 6371e3  # radio terrestre en metros
+
+
+def _a_radianes(coords):
+    """Convierte [(lat, lon), ...] a dos vectores float64 en radianes."""
+    arr = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    rad = np.radians(arr)
+    return rad[:, 0], rad[:, 1]
+
+
+def haversine_metros(lat1, lon1, lat2, lon2):
+    """
+    Distancia Haversine en metros. Acepta escalares o arrays (se aplica broadcasting),
+    por lo que sirve tanto para un par de puntos como para vectores completos.
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * R_TIERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _matriz_haversine_f64(origenes, destinos=None):
+    lat_o, lon_o = _a_radianes(origenes)
+    if destinos is None:
+        lat_d, lon_d = lat_o, lon_o
+    else:
+        lat_d, lon_d = _a_radianes(destinos)
+
+    dlat = lat_d[None, :] - lat_o[:, None]
+    dlon = lon_d[None, :] - lon_o[:, None]
+    a = (np.sin(dlat / 2) ** 2
+         + np.cos(lat_o)[:, None] * np.cos(lat_d)[None, :] * np.sin(dlon / 2) ** 2)
+    return 2 * R_TIERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def matriz_haversine(origenes, destinos=None):
+    """
+    Matriz (n_orig × n_dest) de distancias Haversine en metros (float32).
+    Si destinos es None se calcula la matriz cuadrada origenes × origenes.
+    """
+    return _matriz_haversine_f64(origenes, destinos).astype(np.float32)
+
+
+def matrices_distancia_duracion(origenes, destinos=None, vel_kmh=40.0):
+    """
+    Devuelve (dist_m, dur_s) como arrays int32 a partir de Haversine,
+    asumiendo velocidad constante vel_kmh para la duración.
+    Mismo redondeo (truncado) que la versión anterior con bucles.
+    """
+    d = _matriz_haversine_f64(origenes, destinos)
+    v_ms = vel_kmh * 1000 / 3600  # km/h -> m/s
+    dist = d.astype(np.int32)
+    dur = (d / v_ms).astype(np.int32)
+    if destinos is None:
+        np.fill_diagonal(dist, 0)
+        np.fill_diagonal(dur, 0)
+    return dist, dur
@@ -11,7 +11,6 @@
 ##################################################################################################################
 
 import os
-import math
 import time as tiempo
 from datetime import datetime
 import logging
@@ -28,6 +27,8 @@ from sklearn.cluster import AgglomerativeClustering
 import folium
 from streamlit_folium import st_folium
 
+from core.geodesia import haversine_metros, matriz_haversine, matrices_distancia_duracion
+
 # -------------------- INICIALIZAR FIREBASE --------------------
 ## Usa el JSON de servicio: 'lavanderia_key.json'
 #if not firebase_admin._apps:
@@ -67,25 +68,11 @@ def _haversine_dist_dur(coords, vel_kmh=40.0):
     Calcula matrices de distancias (en metros) y duraciones (en segundos)
     basadas en fórmula de Haversine asumiendo velocidad vel_kmh para la duración.
     coords = [(lat1, lon1), (lat2, lon2), ...]
+    Usa el motor vectorizado de core.geodesia (int32) y devuelve listas anidadas
+    para mantener el contrato con los solvers (dist[i][j] -> int).
     """
-    R = 6371e3  # radio terrestre en metros
-    n = len(coords)
-    dist = [[0]*n for _ in range(n)]
-    dur  = [[0]*n for _ in range(n)]
-    v_ms = vel_kmh * 1000 / 3600  # convertir km/h a m/s
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                continue
-            lat1, lon1 = map(math.radians, coords[i])
-            lat2, lon2 = map(math.radians, coords[j])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
-            d = 2 * R * math.asin(math.sqrt(a))
-            dist[i][j] = int(d)
-            dur[i][j]  = int(d / v_ms)
-    return dist, dur
+    dist, dur = matrices_distancia_duracion(coords, vel_kmh=vel_kmh)
+    return dist.tolist(), dur.tolist()
 
 @st.cache_data(ttl=3600, show_spinner=False)
 def _distancia_duracion_matrix(coords):
@@ -306,12 +293,7 @@ def agregar_ventana_margen(df, margen_segundos=15*60):
 
 def _haversine_meters(lat1, lon1, lat2, lon2):
     """Retorna distancia en metros entre dos puntos (lat, lon) usando Haversine."""
-    R = 6371e3  # metros
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return 2 * R * math.asin(math.sqrt(a))
+    return float(haversine_metros(lat1, lon1, lat2, lon2))
 
 def agrupar_puntos_aglomerativo(df, eps_metros=5):
     """
@@ -327,18 +309,9 @@ def agrupar_puntos_aglomerativo(df, eps_metros=5):
         return pd.DataFrame(), df.copy()
 
     coords = df[["lat", "lon"]].to_numpy()
-    n = len(coords)
-    # 1) Construir matriz de distancias en metros
-    dist_m = np.zeros((n, n), dtype=float)
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                dist_m[i, j] = 0.0
-            else:
-                dist_m[i, j] = _haversine_meters(
-                    coords[i, 0], coords[i, 1],
-                    coords[j, 0], coords[j, 1]
-                )
+    # 1) Construir matriz de distancias en metros (vectorizada)
+    dist_m = matriz_haversine(coords).astype(float)
+    np.fill_diagonal(dist_m, 0.0)
 
     # 2) Aplicar AgglomerativeClustering con distancia precomputada
     clustering = AgglomerativeClustering(
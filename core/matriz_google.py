@@ -0,0 +1,131 @@
+# core/matriz_google.py
+# Descarga concurrente de la Distance Matrix API por teselas (bloques origen × destino).
+#   → Cada tesela respeta los límites de Google: ≤25 orígenes, ≤25 destinos, ≤100 elementos.
+#   → Las teselas se piden en paralelo (ThreadPoolExecutor acotado) con un limitador
+#     token-bucket por elementos y reintentos con backoff exponencial.
+#   → Los resultados se escriben directamente en arrays NumPy preasignados.
+# El cliente se inyecta (googlemaps.Client o cualquier objeto con .distance_matrix),
+# así se puede probar con un cliente falso local.
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from googlemaps import exceptions as gexc
+
+MAX_ELEMENTOS   = 100   # celdas por petición
+MAX_ORIGENES    = 25
+MAX_DESTINOS    = 25
+HILOS           = 4
+ELEMENTOS_SEG   = 500   # tasa sostenida permitida (elementos por segundo)
+REINTENTOS      = 4
+BACKOFF_BASE    = 0.5   # segundos
+VALOR_DEFECTO   = 1     # igual que antes: si el elemento no trae dato se usa 1
+
+_ESTADOS_REINTENTABLES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+
+class LimitadorTokens:
+    """Token bucket thread-safe: 'tasa' tokens por segundo, ráfaga máxima 'capacidad'."""
+
+    def __init__(self, tasa=ELEMENTOS_SEG, capacidad=None):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad or max(tasa, MAX_ELEMENTOS))
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self, n=1):
+        """Bloquea hasta disponer de n tokens."""
+        n = min(float(n), self.capacidad)
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                espera = (n - self._tokens) / self.tasa
+            time.sleep(espera)
+
+
+def dividir_en_teselas(n_orig, n_dest, max_elem=MAX_ELEMENTOS,
+                       max_orig=MAX_ORIGENES, max_dest=MAX_DESTINOS):
+    """
+    Parte el problema n_orig × n_dest en rectángulos legales.
+    Retorna lista de (i0, i1, j0, j1) con rangos semiabiertos.
+    """
+    if n_orig == 0 or n_dest == 0:
+        return []
+    ancho = min(n_dest, max_dest, max_elem)
+    alto = max(1, min(n_orig, max_orig, max_elem // ancho))
+    return [
+        (i0, min(i0 + alto, n_orig), j0, min(j0 + ancho, n_dest))
+        for i0 in range(0, n_orig, alto)
+        for j0 in range(0, n_dest, ancho)
+    ]
+
+
+def _es_reintentable(exc):
+    """Fallos de red/timeout o estados de la API que Google documenta como transitorios."""
+    if isinstance(exc, (gexc.Timeout, gexc.TransportError)):
+        return True
+    return isinstance(exc, gexc.ApiError) and exc.status in _ESTADOS_REINTENTABLES
+
+
+def _pedir_con_reintentos(cliente, kwargs, reintentos, backoff):
+    for intento in range(reintentos + 1):
+        try:
+            return cliente.distance_matrix(**kwargs)
+        except Exception as exc:
+            if intento == reintentos or not _es_reintentable(exc):
+                raise
+            # backoff exponencial con jitter
+            time.sleep(backoff * (2 ** intento) * (1 + random.random()))
+
+
+def descargar_matriz(cliente, origenes, destinos, salida=None, hilos=HILOS,
+                     limitador=None, reintentos=REINTENTOS, backoff=BACKOFF_BASE):
+    """
+    Descarga la matriz origenes × destinos en paralelo.
+    Retorna (dist, dur) como arrays int32 (metros, segundos; usa duration_in_traffic si existe).
+    """
+    origenes = list(origenes)
+    destinos = list(destinos)
+    dist = np.full((len(origenes), len(destinos)), VALOR_DEFECTO, dtype=np.int32)
+    dur = np.full((len(origenes), len(destinos)), VALOR_DEFECTO, dtype=np.int32)
+    limitador = limitador or LimitadorTokens()
+
+    def _tesela(t):
+        i0, i1, j0, j1 = t
+        limitador.adquirir((i1 - i0) * (j1 - j0))
+        kwargs = dict(
+            origins=origenes[i0:i1],
+            destinations=destinos[j0:j1],
+            mode="driving",
+            units="metric",
+        )
+        if salida is not None:
+            kwargs.update(departure_time=salida, traffic_model="best_guess")
+        resp = _pedir_con_reintentos(cliente, kwargs, reintentos, backoff)
+        # Cada tesela escribe en una región disjunta: no hace falta lock
+        for i, row in enumerate(resp["rows"]):
+            for j, el in enumerate(row["elements"]):
+                dist[i0 + i, j0 + j] = el.get("distance", {}).get("value", VALOR_DEFECTO)
+                dur[i0 + i, j0 + j] = el.get("duration_in_traffic", {}).get(
+                    "value",
+                    el.get("duration", {}).get("value", VALOR_DEFECTO)
+                )
+
+    teselas = dividir_en_teselas(len(origenes), len(destinos))
+    if len(teselas) <= 1 or hilos <= 1:
+        for t in teselas:
+            _tesela(t)
+    else:
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            # list() propaga la primera excepción de cualquier tesela
+            list(pool.map(_tesela, teselas))
+    return dist, dur
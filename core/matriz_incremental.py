@@ -0,0 +1,186 @@
+# core/matriz_incremental.py
+# Matriz de distancias/duraciones que se actualiza de forma incremental durante el día.
+#   → Una matriz por día (y por franja horaria si el backend depende del tráfico), también en
+#     disco; la de otro día, otra franja o más vieja que EDAD_MAX_SEG no se reutiliza.
+#   → Acumula los sitios consultados en el día: dos sesiones con pedidos distintos no se pisan,
+#     cada una agrega sus sitios y solo se piden las celdas que faltan (O(n) por pedido nuevo).
+#   → Pedidos cancelados: simplemente no se seleccionan.
+
+import os
+import glob
+import time
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from core.almacen_tiempos import CACHE_DIR, DECIMALES_COORD, agrupar_faltantes, franja_horaria
+
+EDAD_MAX_SEG = 12 * 3600   # celdas de una matriz más vieja se vuelven a pedir
+MAX_NODOS    = 4000        # sitios acumulados por día; al superarlo se empieza de nuevo
+
+
+class MatrizIncremental:
+    """
+    consultar_bloque(orig, dest, salida) -> (dist, dur) es la fuente de datos (Google, Haversine, ...).
+    Un nodo se reconoce por su id si sus coordenadas (redondeadas) no cambiaron; si no, por sus
+    coordenadas (p. ej. clusters re-etiquetados). Un id cuyas coordenadas cambiaron es un sitio nuevo.
+    Con por_franja, la matriz vale solo para la franja horaria (MINUTOS_FRANJA) en que se pidió.
+    """
+
+    def __init__(self, consultar_bloque, prefijo=None, decimales=DECIMALES_COORD,
+                 por_franja=False, edad_max_seg=EDAD_MAX_SEG, max_nodos=MAX_NODOS):
+        self.consultar_bloque = consultar_bloque
+        self.prefijo = prefijo or os.path.join(CACHE_DIR, "matriz_dia")
+        self.escala = 10 ** decimales
+        self.por_franja = por_franja
+        self.edad_max_seg = edad_max_seg
+        self.max_nodos = max_nodos
+        self.elementos_consultados = 0   # total de celdas pedidas a la fuente
+        self._lock = threading.Lock()
+        self._clave = None
+        self._vaciar()
+
+    def _vaciar(self):
+        self.ids = []
+        self.coords = np.zeros((0, 2), dtype=np.float64)
+        self.dist = np.zeros((0, 0), dtype=np.int32)
+        self.dur = np.zeros((0, 0), dtype=np.int32)
+        self.conocido = np.zeros((0, 0), dtype=bool)
+        self.creado = time.time()
+
+    # ---------- persistencia ----------
+
+    def _ruta(self, fecha):
+        return f"{self.prefijo}_{fecha}.npz"
+
+    def _cargar(self, clave):
+        """Carga la matriz del día de 'clave' si es de la misma franja y no está vencida."""
+        self._vaciar()
+        self._clave = clave
+        ruta = self._ruta(clave[0])
+        if not os.path.exists(ruta):
+            return
+        try:
+            z = np.load(ruta, allow_pickle=False)
+            if int(z["franja"]) != clave[1] or time.time() - float(z["creado"]) > self.edad_max_seg:
+                return
+            self.ids = [str(i) for i in z["ids"]]
+            self.coords = z["coords"].astype(np.float64)
+            self.dist = z["dist"].astype(np.int32)
+            self.dur = z["dur"].astype(np.int32)
+            self.conocido = z["conocido"].astype(bool)
+            self.creado = float(z["creado"])
+        except (OSError, KeyError, ValueError):
+            # Archivo corrupto o de otra versión: se empieza de cero
+            self._vaciar()
+
+    def _guardar(self):
+        ruta = self._ruta(self._clave[0])
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        # Temporal propio en el mismo directorio: otros procesos pueden estar guardando a la vez
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(ruta) + ".", suffix=".tmp.npz",
+                                   dir=os.path.dirname(ruta) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, ids=np.asarray(self.ids, dtype=str), coords=self.coords,
+                         dist=self.dist, dur=self.dur, conocido=self.conocido,
+                         franja=self._clave[1], creado=self.creado)
+            os.replace(tmp, ruta)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        # Una matriz por día: las de días anteriores ya no se reutilizan
+        for viejo in glob.glob(f"{self.prefijo}_*.npz"):
+            if viejo != ruta and not viejo.endswith(".tmp.npz"):
+                try:
+                    os.remove(viejo)
+                except OSError:
+                    pass
+
+    # ---------- actualización ----------
+
+    def _claves(self, coords):
+        return [tuple(k) for k in np.rint(np.asarray(coords, dtype=np.float64).reshape(-1, 2) * self.escala).astype(np.int64)]
+
+    def _clave_de(self, salida):
+        return salida.date().isoformat(), franja_horaria(salida) if self.por_franja else -1
+
+    def _agregar(self, ids, coords):
+        """Agrega nodos al final (celdas desconocidas). Retorna sus posiciones."""
+        n0, k = len(self.ids), len(ids)
+        self.ids = self.ids + list(ids)
+        self.coords = np.vstack([self.coords, coords])
+        self.dist = np.pad(self.dist, ((0, k), (0, k)))
+        self.dur = np.pad(self.dur, ((0, k), (0, k)))
+        self.conocido = np.pad(self.conocido, ((0, k), (0, k)))
+        self.conocido[np.arange(n0, n0 + k), np.arange(n0, n0 + k)] = True
+        return np.arange(n0, n0 + k)
+
+    def actualizar_arcos(self, ids, coords, necesarias=None, salida=None):
+        """
+        Matriz (dist, dur) int32 en el orden de 'ids', para la hora 'salida' (por defecto, ahora).
+        Solo consulta las celdas 'necesarias' ((filas, cols) arrays de índices, None = todas) que
+        la matriz del día aún no tiene. Retorna (dist, dur, conocidas): las celdas no conocidas valen 0.
+        """
+        ids = [str(i) for i in ids]
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if len(ids) != len(coords):
+            raise ValueError("ids y coords deben tener el mismo tamaño")
+        salida = salida or datetime.now()
+
+        with self._lock:
+            clave = self._clave_de(salida)
+            if clave != self._clave or time.time() - self.creado > self.edad_max_seg:
+                self._cargar(clave)
+            if len(self.ids) + len(ids) > self.max_nodos:
+                self._vaciar()
+
+            claves_prev = self._claves(self.coords)
+            por_id = {i: p for p, i in enumerate(self.ids)}
+            por_coord = {}
+            for p, k in enumerate(claves_prev):
+                por_coord.setdefault(k, p)
+
+            claves = self._claves(coords)
+            pos = np.full(len(ids), -1, dtype=np.int64)
+            for q, (i, k) in enumerate(zip(ids, claves)):
+                p = por_id.get(i)
+                if p is None or claves_prev[p] != k:
+                    p = por_coord.get(k)
+                if p is not None:
+                    pos[q] = p
+            nuevos = np.flatnonzero(pos < 0)
+            if nuevos.size:
+                pos[nuevos] = self._agregar([ids[q] for q in nuevos], coords[nuevos])
+
+            # Celdas que faltan entre los nodos pedidos (nuevos × todos y las que otra sesión no pidió)
+            sub = np.ix_(pos, pos)
+            if necesarias is None:
+                faltan = ~self.conocido[sub]
+            else:
+                filas, cols = (np.asarray(x, dtype=np.int64) for x in necesarias)
+                faltan = np.zeros((len(ids), len(ids)), dtype=bool)
+                faltan[filas, cols] = ~self.conocido[pos[filas], pos[cols]]
+            lista = [tuple(c) for c in coords]
+            for filas, cols in agrupar_faltantes(faltan, densidad=1.0):
+                d_b, t_b = self.consultar_bloque([lista[i] for i in filas], [lista[j] for j in cols], salida)
+                blo = np.ix_(pos[filas], pos[cols])
+                self.dist[blo] = d_b
+                self.dur[blo] = t_b
+                self.conocido[blo] = True
+                self.elementos_consultados += len(filas) * len(cols)
+
+            if faltan.any() or nuevos.size:
+                self._guardar()
+            conocidas = self.conocido[sub]
+            dist = np.where(conocidas, self.dist[sub], 0).astype(np.int32)
+            dur = np.where(conocidas, self.dur[sub], 0).astype(np.int32)
+            np.fill_diagonal(dist, 0)
+            np.fill_diagonal(dur, 0)
+            np.fill_diagonal(conocidas, True)
+            return dist, dur, conocidas
@@ -0,0 +1,88 @@
+# core/perfiles_tiempo.py
+# Perfiles de tiempo de viaje dependientes de la hora de salida.
+# En vez de una sola foto del tráfico (departure_time=datetime.now()), se guarda una duración
+# por franja horaria de la jornada en un array compacto (franja × n × n).
+# Las franjas se piden a través del backend de viaje; con Google pasan por el almacén
+# persistente (clave con franja), así que los días siguientes no vuelven a comprar celdas.
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from core.almacen_tiempos import MINUTOS_FRANJA
+
+# Mismo ancho de franja que el almacén persistente, para que cada franja del perfil
+# corresponda exactamente a una clave guardada.
+MINUTOS_PERFIL = MINUTOS_FRANJA
+
+
+class PerfilTiempos:
+    """
+    duraciones: array int32 (B × n × n); la franja b cubre [t0 + b·paso, t0 + (b+1)·paso).
+    Antes de t0 se usa la primera franja y después de la última, la última.
+    """
+
+    def __init__(self, duraciones, t0_seg, paso_seg=MINUTOS_PERFIL * 60):
+        self.duraciones = duraciones
+        self.t0 = int(t0_seg)
+        self.paso = int(paso_seg)
+        self.num_franjas = duraciones.shape[0]
+
+    def franja(self, t_seg):
+        b = (int(t_seg) - self.t0) // self.paso
+        return min(max(b, 0), self.num_franjas - 1)
+
+    def duracion(self, i, j, t_seg):
+        """Segundos de viaje i -> j saliendo en t_seg (segundos desde medianoche)."""
+        return int(self.duraciones[self.franja(t_seg), i, j])
+
+    def matriz_en(self, t_seg):
+        """Matriz n×n vigente a la hora t_seg (vista, sin copia)."""
+        return self.duraciones[self.franja(t_seg)]
+
+    def promedio(self):
+        """Matriz n×n promedio de la jornada (para los modelos que usan tiempos estáticos)."""
+        return self.duraciones.mean(axis=0).astype(np.int32)
+
+
+def tiempo_viaje(data, i, j, t_salida):
+    """
+    Tiempo de viaje i -> j para un solver: usa data["duration_profile"] si existe
+    (saliendo de i en t_salida) y si no, la matriz estática data["duration_matrix"].
+    """
+    perfil = data.get("duration_profile")
+    if perfil is not None:
+        return perfil.duracion(i, j, t_salida)
+    return data["duration_matrix"][i][j]
+
+
+def _proxima_salida(segundos_dia, ahora=None):
+    """Próximo datetime (hoy o mañana) a esa hora: Google exige departure_time futuro."""
+    ahora = ahora or datetime.now()
+    base = ahora.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(seconds=int(segundos_dia))
+    return base if base > ahora else base + timedelta(days=1)
+
+
+def construir_perfil(coords, backend, inicio_seg, fin_seg, minutos=MINUTOS_PERFIL):
+    """
+    Pide al backend la matriz de duraciones de cada franja entre inicio_seg y fin_seg.
+    Para backends que no dependen de la hora se replica una única matriz sin copiarla.
+    Retorna (PerfilTiempos, dist_m) con dist_m (n×n int32) de la primera franja.
+    """
+    paso = minutos * 60
+    t0 = (int(inicio_seg) // paso) * paso
+    franjas = list(range(t0, int(fin_seg), paso)) or [t0]
+
+    if not getattr(backend, "depende_de_hora", False):
+        dist, dur = backend.matriz(coords)
+        dur = np.asarray(dur, dtype=np.int32)
+        return PerfilTiempos(np.broadcast_to(dur, (len(franjas),) + dur.shape), t0, paso), np.asarray(dist)
+
+    dist0 = None
+    capas = []
+    for t in franjas:
+        dist, dur = backend.matriz(coords, salida=_proxima_salida(t))
+        if dist0 is None:
+            dist0 = np.asarray(dist, dtype=np.int32)
+        capas.append(np.asarray(dur, dtype=np.int32))
+    return PerfilTiempos(np.stack(capas), t0, paso), dist0
@@ -0,0 +1,134 @@
+# core/sitios.py
+# Ajuste ("snapping") de coordenadas a sitios únicos antes de construir la matriz.
+# Varios pedidos en la misma sucursal o el mismo edificio se convierten en un solo sitio:
+# la Distance Matrix se pide solo para los sitios y el solver trabaja con un nodo por sitio
+# (pedidos con ventanas compatibles). Los índices pedido -> nodo permiten expandir el
+# resultado a cada pedido solo al reportarlo.
+
+import numpy as np
+
+from core.geodesia import haversine_metros
+
+METROS_POR_GRADO = 111_320.0   # aprox. en latitud
+
+
+def _tamanos_celda(lat_ref, metros):
+    """Tamaño de celda en grados (lat, lon) equivalente a 'metros' alrededor de lat_ref."""
+    dlat = metros / METROS_POR_GRADO
+    dlon = metros / (METROS_POR_GRADO * max(np.cos(np.radians(lat_ref)), 1e-6))
+    return dlat, dlon
+
+
+def ajustar_por_radio(coords, radio_m=5.0):
+    """
+    Agrupa coordenadas a menos de radio_m metros del primer punto de cada sitio (líder).
+    Usa una grilla auxiliar de radio_m para buscar solo en las 9 celdas vecinas: ~O(n).
+    Retorna (sitios, inverso): sitios (u×2, centroide de los miembros) e inverso (n,) int.
+    """
+    arr = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(arr)
+    inverso = np.empty(n, dtype=np.intp)
+    if n == 0:
+        return arr.copy(), inverso
+    if radio_m <= 0:
+        _, inverso = np.unique(arr, axis=0, return_inverse=True)
+        inverso = np.asarray(inverso, dtype=np.intp).reshape(-1)
+        return _centroides(arr, inverso), inverso
+
+    dlat, dlon = _tamanos_celda(arr[:, 0].mean(), radio_m)
+    celdas = np.column_stack([np.floor(arr[:, 0] / dlat), np.floor(arr[:, 1] / dlon)]).astype(np.int64)
+    lideres = []            # índice (en arr) del líder de cada sitio
+    por_celda = {}          # celda -> [sitios cuyo líder cae ahí]
+    for i in range(n):
+        ci, cj = celdas[i]
+        asignado = -1
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                for s in por_celda.get((ci + di, cj + dj), ()):
+                    lat_s, lon_s = arr[lideres[s]]
+                    if haversine_metros(arr[i, 0], arr[i, 1], lat_s, lon_s) <= radio_m:
+                        asignado = s
+                        break
+                if asignado >= 0:
+                    break
+            if asignado >= 0:
+                break
+        if asignado < 0:
+            asignado = len(lideres)
+            lideres.append(i)
+            por_celda.setdefault((ci, cj), []).append(asignado)
+        inverso[i] = asignado
+    return _centroides(arr, inverso), inverso
+
+
+def _centroides(arr, inverso):
+    u = int(inverso.max()) + 1 if len(inverso) else 0
+    cuenta = np.bincount(inverso, minlength=u).astype(np.float64)
+    lat = np.bincount(inverso, weights=arr[:, 0], minlength=u) / cuenta
+    lon = np.bincount(inverso, weights=arr[:, 1], minlength=u) / cuenta
+    return np.column_stack([lat, lon])
+
+
+def nodos_por_sitio(inverso, ventanas, fijos=()):
+    """
+    Nodos del solver: los pedidos de un mismo sitio cuyas ventanas se solapan comparten nodo
+    (ventana = intersección); los 'fijos' (depósito, bases) son siempre un nodo propio.
+    Los nodos se numeran por su primera fila, así las filas iniciales fijas conservan su índice.
+    Retorna (nodo_de_fila (n,) intp, filas_por_nodo [array de filas], ventanas de cada nodo).
+    """
+    nodo_de_fila = np.empty(len(inverso), dtype=np.intp)
+    filas, ventanas_nodo = [], []
+    abiertos = {}            # sitio -> nodos que aún pueden recibir pedidos
+    fijos = set(fijos)
+    for f, (s, (ini, fin)) in enumerate(zip(inverso, ventanas)):
+        destino = None
+        if f not in fijos:
+            for k in abiertos.get(s, ()):
+                a, b = ventanas_nodo[k]
+                if max(a, ini) <= min(b, fin):
+                    destino = k
+                    break
+        if destino is None:
+            destino = len(filas)
+            filas.append([])
+            ventanas_nodo.append((ini, fin))
+            if f not in fijos:
+                abiertos.setdefault(s, []).append(destino)
+        else:
+            a, b = ventanas_nodo[destino]
+            ventanas_nodo[destino] = (max(a, ini), min(b, fin))
+        filas[destino].append(f)
+        nodo_de_fila[f] = destino
+    return nodo_de_fila, [np.asarray(x, dtype=np.intp) for x in filas], ventanas_nodo
+
+
+def expandir_resultado(res, filas_por_nodo, servicio_por_fila):
+    """
+    Resultado del solver (índices de nodo) -> índices de pedido: cada nodo de una ruta se
+    reemplaza por sus pedidos en orden, y el k-ésimo llega cuando termina el servicio de los
+    anteriores. Los excluidos, las violaciones y las ventanas ampliadas se reportan por cada
+    pedido del nodo.
+    Retorna un dict nuevo; res no se modifica.
+    """
+    if res is None:
+        return None
+    out = dict(res)
+    rutas = []
+    for r in res["routes"]:
+        ruta, llegada = [], []
+        for nodo, t in zip(r["route"], r["arrival_sec"]):
+            for f in filas_por_nodo[nodo]:
+                ruta.append(int(f))
+                llegada.append(t)
+                t += servicio_por_fila[f]
+        nueva = dict(r, route=ruta, arrival_sec=llegada)
+        if r.get("end_node") is not None:
+            nueva["end_node"] = int(filas_por_nodo[r["end_node"]][0])
+        rutas.append(nueva)
+    out["routes"] = rutas
+    for clave in ("clientes_excluidos", "ventanas_ampliadas"):
+        if res.get(clave) is not None:
+            out[clave] = [int(f) for n in res[clave] for f in filas_por_nodo[n]]
+    if res.get("violaciones") is not None:
+        out["violaciones"] = [dict(x, node=int(f)) for x in res["violaciones"] for f in filas_por_nodo[x["node"]]]
+    return out
@@ -0,0 +1,208 @@
+# core/trabajos.py
+# Trabajos de optimización en segundo plano: la página encola la resolución en un pool de
+# procesos y recibe un id; el estado y el progreso (mejor costo hasta ahora, ruta parcial)
+# quedan en SQLite bajo CACHE_DIR, así cualquier rerun o sesión puede consultarlo o
+# retomarlo sin volver a lanzar el solver.
+#   → Una misma instancia (huella) en curso no se encola dos veces: se reutiliza su id.
+#   → Al terminar, el resultado también se guarda en la caché de resultados.
+
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from core.almacen_tiempos import CACHE_DIR
+from core.cache_resultados import CacheResultados, _a_json
+
+MAX_PROCESOS       = int(os.getenv("TRABAJOS_PROCESOS", "2"))
+GRACIA_SEG         = 60          # tras el plazo, un trabajo sin terminar se da por perdido
+MAX_COLA_SEG       = 15 * 60     # en cola más que esto (p. ej. reinicio del servidor) -> perdido
+VIGENCIA_SEG       = 24 * 3600   # los trabajos más antiguos se borran
+INTERVALO_PROGRESO = 0.5         # s mínimos entre escrituras de progreso
+
+EN_COLA, RESOLVIENDO, LISTO, SIN_SOLUCION, ERROR, PERDIDO = (
+    "en_cola", "resolviendo", "listo", "sin_solucion", "error", "perdido")
+ACTIVOS = (EN_COLA, RESOLVIENDO)
+
+RUTA_DB = os.path.join(CACHE_DIR, "trabajos.sqlite")
+
+_SQL_CREAR = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id          TEXT PRIMARY KEY,
+    huella      TEXT,
+    algoritmo   TEXT,
+    estado      TEXT NOT NULL,
+    plazo       REAL NOT NULL,
+    progreso    TEXT,
+    resultado   TEXT,
+    error       TEXT,
+    creado      REAL NOT NULL,
+    inicio      REAL,
+    fin         REAL
+) WITHOUT ROWID
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+_en_trabajo = False      # True en los procesos hijos del pool de trabajos
+
+
+@contextmanager
+def _conectar(ruta=RUTA_DB):
+    con = sqlite3.connect(ruta, timeout=30)
+    try:
+        with con:  # commit / rollback
+            con.execute(_SQL_CREAR)
+            yield con
+    finally:
+        con.close()
+
+
+def _actualizar(ruta, id_trabajo, **campos):
+    asignaciones = ", ".join(f"{k} = ?" for k in campos)
+    with _conectar(ruta) as con:
+        con.execute(f"UPDATE trabajos SET {asignaciones} WHERE id = ?", (*campos.values(), id_trabajo))
+
+
+def _obtener_pool():
+    """Pool de procesos único por servidor (se crea al primer trabajo)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_PROCESOS)
+        return _pool
+
+
+def procesos_disponibles():
+    """
+    Procesos que puede lanzar un solver paralelo (portafolio, sectores): todos los núcleos, o
+    dentro de un trabajo su parte de ellos, porque pueden correr MAX_PROCESOS trabajos a la vez.
+    """
+    nucleos = os.cpu_count() or 1
+    return max(1, nucleos // MAX_PROCESOS) if _en_trabajo else nucleos
+
+
+# ===================== PROCESO HIJO =====================
+
+class _Progreso:
+    """
+    Callback on_improvement(rutas, costo, segundos) que el motor invoca con cada mejora
+    (ver algorithms.progreso). Guarda la curva de convergencia completa y escribe en la
+    tabla como mucho cada INTERVALO_PROGRESO segundos (salvo la primera mejora).
+    """
+
+    def __init__(self, ruta_db, id_trabajo):
+        self.ruta_db = ruta_db
+        self.id_trabajo = id_trabajo
+        self.curva = []          # [segundos, costo] de cada mejora
+        self._ultima_escritura = 0.0
+
+    def __call__(self, rutas, costo, segundos):
+        self.curva.append([round(segundos, 2), costo])
+        ahora = time.time()
+        if len(self.curva) > 1 and ahora - self._ultima_escritura < INTERVALO_PROGRESO:
+            return
+        self._ultima_escritura = ahora
+        _actualizar(self.ruta_db, self.id_trabajo, progreso=json.dumps(self.resumen(rutas), default=_a_json))
+
+    def resumen(self, rutas=None):
+        """Mejor costo, cuándo se halló, número de mejoras, curva y (si se da) la ruta parcial."""
+        if not self.curva:
+            return None
+        t_mejor, costo = self.curva[-1]
+        return {"mejor_costo": costo, "t_mejor": t_mejor, "mejoras": len(self.curva),
+                "rutas": rutas or [], "curva": self.curva}
+
+
+def _ejecutar_trabajo(ruta_db, id_trabajo, fn, data, tiempo_max_seg, huella, kwargs):
+    """Corre en el proceso hijo: resuelve y deja el resultado (o el error) en la tabla."""
+    global _en_trabajo
+    _en_trabajo = True
+    _actualizar(ruta_db, id_trabajo, estado=RESOLVIENDO, inicio=time.time())
+    progreso = _Progreso(ruta_db, id_trabajo)
+    kwargs = dict(kwargs)
+    if "on_improvement" in inspect.signature(fn).parameters:
+        kwargs["on_improvement"] = progreso
+    try:
+        res = fn(data, tiempo_max_seg=tiempo_max_seg, **kwargs)
+    except Exception as exc:
+        _actualizar(ruta_db, id_trabajo, estado=ERROR, error=f"{type(exc).__name__}: {exc}", fin=time.time())
+        return
+    if not res:
+        _actualizar(ruta_db, id_trabajo, estado=SIN_SOLUCION, fin=time.time())
+        return
+    if huella:
+        CacheResultados().guardar(huella, res)
+    _actualizar(ruta_db, id_trabajo, estado=LISTO, resultado=json.dumps(res, default=_a_json), fin=time.time(),
+                progreso=json.dumps(progreso.resumen(), default=_a_json))
+
+
+# ===================== API =====================
+
+def trabajo_activo(huella, ruta_db=RUTA_DB):
+    """Id del trabajo en cola o resolviendo para esa huella, o None."""
+    with _conectar(ruta_db) as con:
+        filas = con.execute(
+            "SELECT id FROM trabajos WHERE huella = ? AND estado IN (?, ?) ORDER BY creado DESC",
+            (huella, *ACTIVOS)
+        ).fetchall()
+    for (id_trabajo,) in filas:
+        if estado_trabajo(id_trabajo, ruta_db)["estado"] in ACTIVOS:
+            return id_trabajo
+    return None
+
+
+def enviar_trabajo(fn, data, tiempo_max_seg, huella=None, algoritmo=None, ruta_db=RUTA_DB, **kwargs):
+    """
+    Encola fn(data, tiempo_max_seg=..., **kwargs) en el pool de procesos y retorna su id.
+    Si ya hay un trabajo activo con la misma huella, retorna ese id sin encolar otro.
+    """
+    if huella:
+        existente = trabajo_activo(huella, ruta_db)
+        if existente:
+            return existente
+    id_trabajo = uuid.uuid4().hex
+    ahora = time.time()
+    with _conectar(ruta_db) as con:
+        con.execute("DELETE FROM trabajos WHERE creado < ?", (ahora - VIGENCIA_SEG,))
+        con.execute(
+            "INSERT INTO trabajos (id, huella, algoritmo, estado, plazo, creado) VALUES (?, ?, ?, ?, ?, ?)",
+            (id_trabajo, huella, algoritmo, EN_COLA, float(tiempo_max_seg), ahora)
+        )
+    _obtener_pool().submit(_ejecutar_trabajo, ruta_db, id_trabajo, fn, data, tiempo_max_seg, huella, kwargs)
+    return id_trabajo
+
+
+def estado_trabajo(id_trabajo, ruta_db=RUTA_DB):
+    """
+    Dict con estado, progreso (o None), resultado (solo si 'listo'), error, plazo y
+    segundos transcurridos resolviendo. None si el id no existe (o ya se borró).
+    """
+    with _conectar(ruta_db) as con:
+        fila = con.execute(
+            "SELECT estado, plazo, progreso, resultado, error, creado, inicio, fin FROM trabajos WHERE id = ?",
+            (id_trabajo,)
+        ).fetchone()
+    if fila is None:
+        return None
+    estado, plazo, progreso, resultado, error, creado, inicio, fin = fila
+    ahora = time.time()
+    # Trabajos huérfanos (servidor reiniciado o proceso caído): nunca van a terminar
+    if (estado == RESOLVIENDO and ahora > inicio + plazo + GRACIA_SEG) or \
+       (estado == EN_COLA and ahora > creado + MAX_COLA_SEG):
+        estado = PERDIDO
+        _actualizar(ruta_db, id_trabajo, estado=PERDIDO, fin=ahora)
+    return {
+        "id": id_trabajo,
+        "estado": estado,
+        "plazo": plazo,
+        "progreso": json.loads(progreso) if progreso else None,
+        "resultado": json.loads(resultado) if resultado else None,
+        "error": error,
+        "transcurrido": ((fin or ahora) - inicio) if inicio else 0.0,
+    }
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import time as tiempo
 import io
 
@@ -14,29 +14,41 @@ import folium
 from streamlit_folium import st_folium
 
 from core.firebase import db
-from core.firebase import guardar_resultado_corrida, obtener_historial_corridas
+from core.firebase import guardar_resultado_corrida, obtener_historial_corridas, obtener_ruta_guardada
 from core.constants import GOOGLE_MAPS_API_KEY
+from core.cache_resultados import CacheResultados, huella_instancia
+from core.sitios import expandir_resultado
+from core.trabajos import enviar_trabajo, estado_trabajo, trabajo_activo, ACTIVOS, LISTO, SIN_SOLUCION
 
-from algorithms.algoritmo1 import optimizar_ruta_algoritmo22, cargar_pedidos, _crear_data_model, agrupar_puntos_aglomerativo, MARGEN, SHIFT_START_SEC,SHIFT_END_SEC
+from algorithms.algoritmo1 import optimizar_ruta_algoritmo22, cargar_pedidos, _crear_data_model, agrupar_puntos_radio, MARGEN, SHIFT_START_SEC,SHIFT_END_SEC
 from algorithms.algoritmo2 import optimizar_ruta_cw_tabu, DEPOT_SERVICE_SEC
 from algorithms.algoritmo3log import optimizar_ruta_cp_sat
 from algorithms.algoritmo4 import optimizar_ruta_lns
-
-COCHERA = {
-    "lat": -16.4141434959913,
-    "lon": -71.51839574233342,
-    "direccion": "Cochera",
-    "hora": "08:00",
-}
+from algorithms.portafolio import optimizar_ruta_portafolio
+from algorithms.descomposicion import optimizar_ruta_sectores
+from algorithms.flota import BASES, TURNO_DEFECTO, vehiculo, anteponer_bases
+from algorithms.arranque import cargar_ruta_local, guardar_ruta_local, rutas_desde_doc, mapear_rutas
+from algorithms.presupuesto import presupuesto_inicial, estancamiento_para
 
 gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+# Resultados por huella de instancia: compartidos entre sesiones, reruns y conductores
+cache_resultados = CacheResultados()
 
 ALG_MAP = {
     "Algoritmo 1 - PCA - GLS": optimizar_ruta_algoritmo22,
     "Algoritmo 2 - Clarke Wrigth + Tabu Search": optimizar_ruta_cw_tabu,
     "Algoritmo 3 - CP - SAT/ Nearest Insertion": optimizar_ruta_cp_sat,
     "Algoritmo 4 - LNS": optimizar_ruta_lns,
+    "Portafolio - todos en paralelo": optimizar_ruta_portafolio,
+    "Sectores - OR-Tools por zonas (días grandes)": optimizar_ruta_sectores,
 }
+# Algoritmos con soporte de flota (varios vehículos con base y turno propios)
+ALG_FLOTA = {optimizar_ruta_algoritmo22, optimizar_ruta_cw_tabu, optimizar_ruta_lns, optimizar_ruta_portafolio,
+             optimizar_ruta_sectores}
+# Algoritmos que resuelven con OR-Tools y aceptan ventanas_suaves / permitir_omitir
+ALG_VENTANAS_SUAVES = {optimizar_ruta_algoritmo22, optimizar_ruta_portafolio, optimizar_ruta_sectores}
+
+COLORES_RUTA = ["blue", "red", "green", "purple", "orange", "darkred", "cadetblue", "darkgreen", "pink", "gray"]
 
 def _hora_a_segundos(hhmm: str) -> int | None:
     if not isinstance(hhmm, str):
@@ -57,6 +69,9 @@ def _segundos_a_hora(segs: int) -> str:
     return f"{h:02}:{m:02}"
 
 def _ventana_extendida(row: pd.Series) -> str:
+    if pd.notna(row.get("ini_seg")):
+        # Cluster: su ventana ya es la intersección con margen (agrupar_puntos_radio)
+        return f"{_segundos_a_hora(int(row['ini_seg']))} - {_segundos_a_hora(int(row['fin_seg']))}"
     ini = _hora_a_segundos(row["time_start"])
     fin = _hora_a_segundos(row["time_end"])
     if ini is None or fin is None:
@@ -65,6 +80,70 @@ def _ventana_extendida(row: pd.Series) -> str:
     fin_m = min(24 * 3600, fin + MARGEN)
     return f"{_segundos_a_hora(ini_m)} - {_segundos_a_hora(fin_m)}"
 
+def _editar_flota() -> list:
+    """Tabla editable de la flota: capacidad (0 = sin límite), base de inicio/fin y turno."""
+    n = st.number_input("Vehículos", min_value=1, max_value=10, value=1, step=1)
+    df_def = pd.DataFrame([{
+        "nombre": f"Vehículo {k + 1}",
+        "capacidad": 0,
+        "inicio": "Cochera",
+        "fin": "Cochera",
+        "hora_inicio": TURNO_DEFECTO[0],
+        "hora_fin": TURNO_DEFECTO[1],
+    } for k in range(int(n))])
+    df_flota = st.data_editor(
+        df_def,
+        key=f"flota_{int(n)}",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "inicio": st.column_config.SelectboxColumn(options=list(BASES)),
+            "fin": st.column_config.SelectboxColumn(options=list(BASES)),
+        },
+    )
+    return [
+        vehiculo(
+            row["nombre"],
+            capacidad=int(row["capacidad"]) or None,
+            inicio=BASES[row["inicio"]],
+            fin=BASES[row["fin"]],
+            turno=(row["hora_inicio"], row["hora_fin"]),
+        )
+        for _, row in df_flota.iterrows()
+    ]
+
+def _ruta_previa(fecha):
+    """
+    Ruta para el arranque en caliente: corrida anterior del mismo día (almacén local o
+    colección 'rutas'); si no hay, la del día anterior. Retorna (rutas, origen) o (None, None).
+    """
+    for f, cuando in ((fecha, "corrida anterior"), (fecha - timedelta(days=1), "ruta de ayer")):
+        previa = cargar_ruta_local(f)
+        if previa:
+            return previa, cuando
+        try:
+            previa = rutas_desde_doc(obtener_ruta_guardada(db, f.strftime("%Y-%m-%d")))
+        except Exception:
+            previa = None
+        if previa:
+            return previa, cuando
+    return None, None
+
+def _tabla_ruta(df_f: pd.DataFrame, r: dict) -> pd.DataFrame:
+    """Orden de visita de un vehículo: base de inicio, paradas y base de fin (si se conoce)."""
+    nodos = list(r["route"])
+    etas = [_segundos_a_hora(t) for t in r["arrival_sec"]]
+    if r.get("end_node") is not None:
+        nodos.append(r["end_node"])
+        etas.append(_segundos_a_hora(r["end_sec"]) if r.get("end_sec") is not None else "—")
+    cols = ["nombre_cliente", "direccion", "time_start", "time_end"] + [c for c in ("ini_seg", "fin_seg") if c in df_f]
+    df_r = df_f.loc[nodos, cols].copy()
+    df_r["ventana_con_margen"] = df_r.apply(_ventana_extendida, axis=1)
+    df_r["ETA"] = etas
+    df_r["orden"] = range(len(nodos))
+    df_r["nodo"] = nodos
+    return df_r.reset_index(drop=True)
+
 # ---- FUNCION PRINCIPAL ----
 def ver_ruta_optimizada():
     st.title("🚚 Ver Ruta Optimizada")
@@ -74,198 +153,254 @@ def ver_ruta_optimizada():
     with c2:
         algoritmo = st.selectbox("Algoritmo", list(ALG_MAP.keys()))
 
+    with st.expander("🚐 Flota", expanded=False):
+        flota = _editar_flota()
+    arranque = st.checkbox("Arranque en caliente (partir de la ruta previa)", value=True)
+    alg_fn = ALG_MAP[algoritmo]
+    opciones = {}
+    if alg_fn in ALG_VENTANAS_SUAVES:
+        suaves = st.checkbox("Ventanas suaves (llegar tarde se penaliza y se omiten las paradas que no caben)",
+                             value=False)
+        opciones = {"ventanas_suaves": suaves, "permitir_omitir": suaves}
+    if alg_fn not in ALG_FLOTA and len(flota) > 1:
+        st.info("Este algoritmo resuelve un solo vehículo: se usa el primero de la flota (sus bases y turno).")
+        flota = flota[:1]
+
     if (st.session_state.get("fecha_actual") != fecha or
-        st.session_state.get("algoritmo_actual") != algoritmo):
-        for k in ["res","df_clusters","df_etiquetado","df_final","df_ruta","solve_t"]:
+        st.session_state.get("algoritmo_actual") != algoritmo or
+        st.session_state.get("flota_actual") != flota or
+        st.session_state.get("opciones_actual") != opciones):
+        for k in ["res","df_clusters","df_etiquetado","df_final","df_rutas","solve_t","data","huella","trabajo_id","curva","presupuesto"]:
             st.session_state[k] = None
-        st.session_state["leg_0"] = 0
+        for v in range(10):
+            st.session_state[f"leg_{v}"] = 0
         st.session_state["fecha_actual"] = fecha
         st.session_state["algoritmo_actual"] = algoritmo
+        st.session_state["flota_actual"] = flota
+        st.session_state["opciones_actual"] = opciones
 
     if st.session_state["res"] is None:
-        pedidos = cargar_pedidos(fecha, "Todos")
-        if not pedidos:
-            st.info("No hay pedidos para esa fecha.")
-            return
-
-        df_original = pd.DataFrame(pedidos)
-        df_clusters, df_et = agrupar_puntos_aglomerativo(df_original, eps_metros=5)
-        st.session_state["df_clusters"] = df_clusters.copy()
-        st.session_state["df_etiquetado"] = df_et.copy()
-
-        df_final = df_clusters.copy()
-        st.session_state["df_final"] = df_final.copy()
-
-        data = _crear_data_model(df_final, vehiculos=1)
-
-        alg_fn = ALG_MAP[algoritmo]
-        t0 = tiempo.time()
-        res = alg_fn(data, tiempo_max_seg=45)
-        st.session_state["solve_t"] = tiempo.time() - t0
-
-        if not res:
-            st.error("😕 Sin solución factible.")
-            return
+        # La instancia se arma una sola vez; los reruns mientras se resuelve solo consultan el trabajo
+        if st.session_state["data"] is None:
+            pedidos = cargar_pedidos(fecha, "Todos")
+            if not pedidos:
+                st.info("No hay pedidos para esa fecha.")
+                return
+
+            df_original = pd.DataFrame(pedidos)
+            df_clusters, df_et = agrupar_puntos_radio(df_original, eps_metros=5)
+            st.session_state["df_clusters"] = df_clusters.copy()
+            st.session_state["df_etiquetado"] = df_et.copy()
+
+            # Nodos: bases de la flota (0..m-1) + paradas
+            df_final = anteponer_bases(df_clusters, flota)
+            st.session_state["df_final"] = df_final.copy()
+
+            data = _crear_data_model(df_final, flota=flota)
+            if arranque:
+                previa, origen = _ruta_previa(fecha)
+                data["initial_routes"] = mapear_rutas(previa, df_final, data)
+                if data["initial_routes"]:
+                    st.caption(f"♻️ Arranque en caliente desde la {origen}.")
+            # Plazo según tamaño y ventanas del día; cada motor corta antes si se estanca
+            plazo = presupuesto_inicial(data)
+            presupuesto = {"tiempo_max_seg": plazo, "estancamiento_seg": estancamiento_para(plazo)}
+            st.session_state["data"] = data
+            st.session_state["presupuesto"] = presupuesto
+            st.session_state["huella"] = huella_instancia(data, algoritmo, {**presupuesto, **opciones})
+
+        data = st.session_state["data"]
+        presupuesto = st.session_state["presupuesto"]
+        huella = st.session_state["huella"]
+        df_final = st.session_state["df_final"]
+
+        res = None
+        if st.session_state["trabajo_id"] is None:
+            res = cache_resultados.obtener(huella)
+            if res is not None:
+                st.session_state["solve_t"] = 0.0
+                st.caption("⚡ Resultado desde caché (misma instancia ya resuelta).")
+            else:
+                # Otra sesión puede estar resolviendo ya la misma instancia: se retoma su trabajo
+                st.session_state["trabajo_id"] = trabajo_activo(huella) or enviar_trabajo(
+                    alg_fn, data, presupuesto["tiempo_max_seg"], huella=huella, algoritmo=algoritmo,
+                    estancamiento_seg=presupuesto["estancamiento_seg"], **opciones
+                )
+
+        if res is None:
+            est = estado_trabajo(st.session_state["trabajo_id"])
+            if est is not None and est["estado"] in ACTIVOS:
+                prog = est["progreso"]
+                texto = f"⏳ Optimizando ({est['transcurrido']:.0f} / {est['plazo']:.0f} s)"
+                if prog:
+                    paradas = sum(max(0, len(r) - 1) for r in prog["rutas"])
+                    texto += f" — mejor costo {prog['mejor_costo']:,.0f} ({prog['mejoras']} mejoras, {paradas} paradas)"
+                st.progress(min(1.0, est["transcurrido"] / est["plazo"]), text=texto)
+                tiempo.sleep(1)
+                st.rerun()
+            if est is not None and est["estado"] == SIN_SOLUCION:
+                st.error("😕 Sin solución factible." + (
+                    " Prueba con ventanas suaves para obtener la mejor ruta con su reporte de tardanzas."
+                    if opciones and not opciones["ventanas_suaves"] else ""))
+                return
+            if est is None or est["estado"] != LISTO:
+                st.session_state["trabajo_id"] = None
+                motivo = (est["error"] or est["estado"]) if est else "trabajo no encontrado"
+                st.error(f"😕 La optimización no terminó ({motivo}).")
+                st.button("🔁 Reintentar")
+                return
+            res = est["resultado"]
+            st.session_state["solve_t"] = est["transcurrido"]
+            st.session_state["curva"] = (est["progreso"] or {}).get("curva")
+
+        # Rutas sin base de fin (algoritmos de un vehículo): se cierra en la base del vehículo
+        for r in res["routes"]:
+            r.setdefault("end_node", data["ends"][r["vehicle"]])
+        # El solver trabaja por sitio: cada nodo vuelve a sus pedidos (filas de df_final)
+        res = expandir_resultado(res, data["filas_por_nodo"], data["servicio_por_fila"])
+        guardar_ruta_local(fecha, df_final, res)
 
         st.session_state["res"] = res
+        st.session_state["df_rutas"] = {
+            r["vehicle"]: _tabla_ruta(df_final, r)
+            for r in res["routes"] if len(r["route"]) > 1
+        }
+
+    df_f    = st.session_state["df_final"]
+    df_et   = st.session_state["df_etiquetado"]
+    res     = st.session_state["res"]
+    df_rutas = st.session_state["df_rutas"]
+    nombres = {v: flota[v]["nombre"] for v in df_rutas}
+    if not df_rutas:
+        st.warning("Ningún vehículo tiene paradas asignadas.")
+        return
+    if res.get("clientes_excluidos"):
+        st.warning(f"⚠️ {len(res['clientes_excluidos'])} parada(s) no caben en la flota.")
+    if res.get("ventanas_ampliadas"):
+        st.warning("🔄 Sin solución con las ventanas originales: se ampliaron a ±1 h las de "
+                   + ", ".join(df_f.loc[res["ventanas_ampliadas"], "nombre_cliente"].astype(str)) + ".")
+    if res.get("violaciones"):
+        st.subheader("⏰ Violaciones de ventana / turno")
+        st.dataframe(pd.DataFrame([{
+            "tipo": x["tipo"],
+            "vehículo": nombres.get(x["vehicle"], "—") if x["vehicle"] is not None else "—",
+            "parada": df_f.loc[x["node"], "nombre_cliente"],
+            "ventana": f"{_segundos_a_hora(x['ventana'][0])} - {_segundos_a_hora(x['ventana'][1])}",
+            "llegada": _segundos_a_hora(x["arrival_sec"]) if x["arrival_sec"] is not None else "—",
+            "retraso_min": round(x["tardanza_seg"] / 60, 1) if x["tardanza_seg"] is not None else None,
+        } for x in res["violaciones"]]), use_container_width=True)
+
+    if res.get("sectores"):
+        st.subheader(f"🧩 Resuelto por {len(res['sectores'])} sectores")
+        st.dataframe(pd.DataFrame(res["sectores"]), use_container_width=True)
+
+    if res.get("scoreboard"):
+        st.subheader(f"🏁 Portafolio — ganador: {res['motor']}")
+        st.dataframe(pd.DataFrame(res["scoreboard"]), use_container_width=True)
 
-        ruta = res["routes"][0]["route"]
-        arr  = res["routes"][0]["arrival_sec"]
-        df_r = df_final.loc[ruta, ["nombre_cliente","direccion","time_start","time_end"]].copy()
-        df_r["ventana_con_margen"] = df_r.apply(_ventana_extendida, axis=1)
-        df_r["ETA"]   = [ _segundos_a_hora(t) for t in arr ]
-        df_r["orden"] = range(len(ruta))
-        st.session_state["df_ruta"] = df_r.copy()
-
-    df_r = st.session_state["df_ruta"]
-    filas = []
-    vent_coch = _ventana_extendida(pd.Series({
-        "time_start": COCHERA["hora"],
-        "time_end":   COCHERA["hora"]
-    }))
-    filas.append({
-        "orden": 0,
-        "nombre_cliente": COCHERA["direccion"],
-        "direccion": COCHERA["direccion"],
-        "ventana_con_margen": vent_coch,
-        "ETA": COCHERA["hora"]
-    })
-    for _, row in df_r.sort_values("orden").iterrows():
-        filas.append({
-            "orden": int(row["orden"]) + 1,
-            "nombre_cliente": row["nombre_cliente"],
-            "direccion": row["direccion"],
-            "ventana_con_margen": row["ventana_con_margen"],
-            "ETA": row["ETA"]
-        })
-    df_display = pd.DataFrame(filas).sort_values("orden").reset_index(drop=True)
     st.subheader("📋 Orden de visita optimizada")
-    st.dataframe(df_display, use_container_width=True)
+    for v, df_r in df_rutas.items():
+        st.markdown(f"**{nombres[v]}** — {len(df_r) - 2} paradas")
+        st.dataframe(
+            df_r[["orden","nombre_cliente","direccion","ventana_con_margen","ETA"]],
+            use_container_width=True
+        )
 
 # — Pestañas —
     tab1, tab2 = st.tabs(["🚀 Tramo actual","ℹ️ Info general"])
-    df_f    = st.session_state["df_final"]
-    df_et   = st.session_state["df_etiquetado"]
-    res     = st.session_state["res"]
-    ruta    = res["routes"][0]["route"]
-    leg     = st.session_state["leg_0"]
-    L       = len(ruta)
 
-    # Tramo actual
+    # Tramo actual (por vehículo)
     with tab1:
-        total_legs = L + 1
-        if leg > total_legs:
+        v = st.selectbox("Vehículo", list(df_rutas), format_func=lambda k: nombres[k])
+        df_r = df_rutas[v]
+        leg = st.session_state[f"leg_{v}"]
+        total_legs = len(df_r) - 1
+        if leg >= total_legs:
             st.success("✅ Ruta completada")
-            return
-
-        if leg == 0:
-            orig = (COCHERA["lat"], COCHERA["lon"])
-            dest_idx = ruta[0]
-            dest = (df_f.loc[dest_idx,"lat"], df_f.loc[dest_idx,"lon"])
-            nombre_dest = df_f.loc[dest_idx,"nombre_cliente"]
-            ETA_dest = df_display.loc[df_display["orden"] == 1, "ETA"].iloc[0]
-        elif 1 <= leg < L:
-            idx_o = ruta[leg - 1]
-            idx_d = ruta[leg]
-            orig = (df_f.loc[idx_o,"lat"], df_f.loc[idx_o,"lon"])
-            dest = (df_f.loc[idx_d,"lat"], df_f.loc[idx_d,"lon"])
-            nombre_dest = df_f.loc[idx_d,"nombre_cliente"]
-            ETA_dest = df_display.loc[df_display["orden"] == leg + 1, "ETA"].iloc[0]
         else:
-            idx_o = ruta[L - 1]
-            orig = (df_f.loc[idx_o,"lat"], df_f.loc[idx_o,"lon"])
-            dest = (COCHERA["lat"], COCHERA["lon"])
-            nombre_dest = COCHERA["direccion"]
-            ETA_dest = "—"
-
-        st.markdown(
-            f"### Próximo → **{nombre_dest}**  \n"
-            f"📍 {dest[0]:.6f},{dest[1]:.6f} (ETA {ETA_dest})",
-            unsafe_allow_html=True
-        )
-        if st.button(f"✅ Llegué a {nombre_dest}"):
-            st.session_state["leg_0"] += 1
-            st.rerun()
-
-        try:
-            directions = gmaps.directions(
-                f"{orig[0]},{orig[1]}",
-                f"{dest[0]},{dest[1]}",
-                mode="driving",
-                departure_time=datetime.now(),
-                traffic_model="best_guess"
+            o, d = df_r.loc[leg], df_r.loc[leg + 1]
+            orig = (df_f.loc[o["nodo"],"lat"], df_f.loc[o["nodo"],"lon"])
+            dest = (df_f.loc[d["nodo"],"lat"], df_f.loc[d["nodo"],"lon"])
+            nombre_dest = d["nombre_cliente"]
+            ETA_dest = d["ETA"]
+
+            st.markdown(
+                f"### Próximo → **{nombre_dest}**  \n"
+                f"📍 {dest[0]:.6f},{dest[1]:.6f} (ETA {ETA_dest})",
+                unsafe_allow_html=True
             )
-            leg0 = directions[0]["legs"][0]
-            tiempo_traffic = leg0.get("duration_in_traffic", leg0["duration"])["text"]
-            overview = directions[0]["overview_polyline"]["points"]
-            segmento = [(p["lat"], p["lng"]) for p in decode_polyline(overview)]
-        except:
-            tiempo_traffic = None
-            segmento = [orig, dest]
-
-        m = folium.Map(location=segmento[0], zoom_start=14)
-        folium.PolyLine(
-            segmento,
-            weight=5, opacity=0.8,
-            tooltip=f"⏱ {tiempo_traffic}" if tiempo_traffic else None
-        ).add_to(m)
-        folium.Marker(segmento[0], icon=folium.Icon(color="green", icon="play", prefix="fa")).add_to(m)
-        folium.Marker(segmento[-1], icon=folium.Icon(color="blue", icon="flag", prefix="fa")).add_to(m)
-        st_folium(m, width=700, height=400)
+            if st.button(f"✅ Llegué a {nombre_dest}"):
+                st.session_state[f"leg_{v}"] += 1
+                st.rerun()
+
+            try:
+                directions = gmaps.directions(
+                    f"{orig[0]},{orig[1]}",
+                    f"{dest[0]},{dest[1]}",
+                    mode="driving",
+                    departure_time=datetime.now(),
+                    traffic_model="best_guess"
+                )
+                leg0 = directions[0]["legs"][0]
+                tiempo_traffic = leg0.get("duration_in_traffic", leg0["duration"])["text"]
+                overview = directions[0]["overview_polyline"]["points"]
+                segmento = [(p["lat"], p["lng"]) for p in decode_polyline(overview)]
+            except:
+                tiempo_traffic = None
+                segmento = [orig, dest]
+
+            m = folium.Map(location=segmento[0], zoom_start=14)
+            folium.PolyLine(
+                segmento,
+                weight=5, opacity=0.8,
+                tooltip=f"⏱ {tiempo_traffic}" if tiempo_traffic else None
+            ).add_to(m)
+            folium.Marker(segmento[0], icon=folium.Icon(color="green", icon="play", prefix="fa")).add_to(m)
+            folium.Marker(segmento[-1], icon=folium.Icon(color="blue", icon="flag", prefix="fa")).add_to(m)
+            st_folium(m, width=700, height=400)
 
     # Info general con API y métricas
     with tab2:
-        st.subheader("🗺️ Mapa de toda la ruta (via API)")
-        origin = f"{COCHERA['lat']},{COCHERA['lon']}"
-        depot_idx = ruta[0]
-        depot = f"{df_f.loc[depot_idx,'lat']},{df_f.loc[depot_idx,'lon']}"
-        waypoints = [depot] + [f"{df_f.loc[i,'lat']},{df_f.loc[i,'lon']}" for i in ruta[1:]] + [depot]
-        destination = origin
-
-        directions = gmaps.directions(
-            origin,
-            destination,
-            mode="driving",
-            departure_time=datetime.now(),
-            optimize_waypoints=False,
-            waypoints=waypoints
-        )
-
-        overview = directions[0]["overview_polyline"]["points"]
-        path = [(p["lat"], p["lng"]) for p in decode_polyline(overview)]
-
-        total_m = sum(leg["distance"]["value"] for leg in directions[0]["legs"])
-        total_s = sum(leg["duration"]["value"] for leg in directions[0]["legs"])
-
-        m = folium.Map(location=path[0], zoom_start=13)
-        folium.PolyLine(path, weight=4, opacity=0.7).add_to(m)
-
-        # Marcadores con tooltip
-        folium.Marker(
-            (COCHERA["lat"],COCHERA["lon"]),
-            popup="Cochera", tooltip="Cochera",
-            icon=folium.Icon(color="purple",icon="building",prefix="fa")
-        ).add_to(m)
-        folium.Marker(
-            (df_f.loc[ruta[0],"lat"],df_f.loc[ruta[0],"lon"]),
-            popup="Planta Lavandería", tooltip="CERRO SALAVERRY",
-            icon=folium.Icon(color="green",icon="home",prefix="fa")
-        ).add_to(m)
-        for idx in ruta[1:]:
-            lat, lon = df_f.loc[idx,["lat","lon"]]
-            nombre = df_f.loc[idx,"nombre_cliente"]
-            direccion = df_f.loc[idx,"direccion"]
+        st.subheader("🗺️ Mapa de todas las rutas (via API)")
+        m = folium.Map(location=(df_f.loc[0,"lat"], df_f.loc[0,"lon"]), zoom_start=13)
+        total_m = 0
+        total_s = 0
+        for k, (v, df_r) in enumerate(df_rutas.items()):
+            color = COLORES_RUTA[k % len(COLORES_RUTA)]
+            puntos = [f"{df_f.loc[i,'lat']},{df_f.loc[i,'lon']}" for i in df_r["nodo"]]
+            try:
+                directions = gmaps.directions(
+                    puntos[0],
+                    puntos[-1],
+                    mode="driving",
+                    departure_time=datetime.now(),
+                    optimize_waypoints=False,
+                    waypoints=puntos[1:-1]
+                )
+                overview = directions[0]["overview_polyline"]["points"]
+                path = [(p["lat"], p["lng"]) for p in decode_polyline(overview)]
+                total_m += sum(leg["distance"]["value"] for leg in directions[0]["legs"])
+                total_s += sum(leg["duration"]["value"] for leg in directions[0]["legs"])
+            except:
+                path = [(df_f.loc[i,"lat"], df_f.loc[i,"lon"]) for i in df_r["nodo"]]
+            folium.PolyLine(path, weight=4, opacity=0.7, color=color, tooltip=nombres[v]).add_to(m)
+
+            for _, row in df_r.iloc[1:-1].iterrows():
+                lat, lon = df_f.loc[row["nodo"], ["lat","lon"]]
+                folium.Marker(
+                    (lat,lon),
+                    popup=f"{row['nombre_cliente']}<br>{row['direccion']}<br>{nombres[v]} · ETA {row['ETA']}",
+                    tooltip=row["nombre_cliente"],
+                    icon=folium.Icon(color=color,icon="flag",prefix="fa")
+                ).add_to(m)
+
+        # Bases de la flota
+        for i in df_f.index[df_f["tipo"] == "Base"]:
             folium.Marker(
-                (lat,lon),
-                popup=f"{nombre}<br>{direccion}",
-                tooltip=nombre,
-                icon=folium.Icon(color="orange",icon="flag",prefix="fa")
+                (df_f.loc[i,"lat"], df_f.loc[i,"lon"]),
+                popup=df_f.loc[i,"direccion"], tooltip=df_f.loc[i,"direccion"],
+                icon=folium.Icon(color="black",icon="building",prefix="fa")
             ).add_to(m)
-        folium.Marker(
-            (COCHERA["lat"],COCHERA["lon"]),
-            popup="Cochera", tooltip="Cochera",
-            icon=folium.Icon(color="purple",icon="building",prefix="fa")
-        ).add_to(m)
 
         for _, row in df_et.iterrows():
             folium.CircleMarker(
@@ -280,13 +415,32 @@ def ver_ruta_optimizada():
         st.markdown(f"- Distancia total (Driving): **{total_m/1000:.2f} km**")
         st.markdown(f"- Duración estimada (Driving): **{total_s//60:.0f} min**")
 
-        # Métricas finales del VRP
+        # Métricas finales del VRP (por vehículo y totales)
         st.markdown("## 🔍 Métricas Finales")
+        filas = []
+        for r in res["routes"]:
+            if r["vehicle"] not in df_rutas:
+                continue
+            fin_ruta = r.get("end_sec") or max(r["arrival_sec"])
+            filas.append({
+                "vehículo": nombres[r["vehicle"]],
+                "paradas": len(r["route"]) - 1,
+                "salida": _segundos_a_hora(r["arrival_sec"][0]),
+                "regreso": _segundos_a_hora(fin_ruta),
+                "jornada_min": round((fin_ruta - r["arrival_sec"][0]) / 60, 1),
+            })
+        df_veh = pd.DataFrame(filas)
+        st.dataframe(df_veh, use_container_width=True)
+        num_puntos = int(df_veh["paradas"].sum())
+        tiempo_total_min = float(df_veh["jornada_min"].max())
+        st.markdown(f"- Vehículos usados: **{len(df_veh)}** de {len(flota)}")
         st.markdown(f"- Kilometraje total: **{res['distance_total_m']/1000:.2f} km**")
         st.markdown(f"- Tiempo de cómputo: **{st.session_state['solve_t']:.2f} s**")
-        tiempo_total_min = (max(res["routes"][0]["arrival_sec"]) - SHIFT_START_SEC) / 60
-        st.markdown(f"- Tiempo estimado total: **{tiempo_total_min:.2f} min**")
-        st.markdown(f"- Puntos visitados: **{len(ruta)}**")
+        st.markdown(f"- Jornada más larga: **{tiempo_total_min:.2f} min**")
+        st.markdown(f"- Puntos visitados: **{num_puntos}**")
+        if st.session_state["curva"]:
+            st.markdown("### 📉 Convergencia (costo del motor vs. segundos)")
+            st.line_chart(pd.DataFrame(st.session_state["curva"], columns=["segundos", "costo"]).set_index("segundos"))
 
         # === GUARDAR MÉTRICAS FINALES DEL ALGORITMO EN FIRESTORE ===
         # Siempre guarda, sin importar la combinación de fecha y algoritmo
@@ -298,7 +452,7 @@ def ver_ruta_optimizada():
                 distancia_km=round(res['distance_total_m']/1000, 2),    # redondea a 2 decimales
                 tiempo_min=round(tiempo_total_min, 2),
                 tiempo_computo_s=round(st.session_state['solve_t'], 2),
-                num_puntos=len(ruta)
+                num_puntos=num_puntos
             )
             st.success("🚀 Corrida guardada en historial.")
 
@@ -0,0 +1,166 @@
+# scripts/bench_cp_sat.py
+# Benchmark de optimizar_ruta_cp_sat (algorithms.algoritmo3log):
+#   - semilla (hint): inserción que recorre la ruta desde el depósito por cada parada y
+#     posición (antes) vs. inserción incremental con llegada/holgura en caché, más barata y
+#     regret-k (ahora); tiempo, paradas insertadas y objetivo del modelo;
+#   - modelo: un literal por arco + MTZ (antes) vs. AddCircuit sobre arcos admisibles
+#     (_modelo_circuito, ahora); tiempo de construcción, literales, tamaño del proto y estado
+#     de CP-SAT con LIMITE_SEG.
+# Instancias de 30 a 90 paradas con ventanas mixtas, un vehículo.
+# Uso:  python scripts/bench_cp_sat.py
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.geodesia import matrices_distancia_duracion
+from core.perfiles_tiempo import tiempo_viaje
+from ortools.sat.python import cp_model
+from algorithms.algoritmo3log import (_semilla_insercion, _costo_hint, _modelo_circuito, SHIFT_START,
+                                      SHIFT_END, ALLOWED_LATE, MAX_TRAVEL, MAX_WAIT, WAIT_WEIGHT, REGRET_K)
+
+# Centro aproximado de Arequipa
+LAT0, LON0 = -16.409, -71.537
+LIMITE_SEG = 20
+
+
+def _instancia(n, semilla=0):
+    """Depósito + (n-1) paradas: 70 % con toda la jornada, 30 % con ventana de 1 h; servicio de 3 min."""
+    rnd = random.Random(semilla)
+    coords = [(LAT0 + rnd.uniform(-0.03, 0.03), LON0 + rnd.uniform(-0.03, 0.03)) for _ in range(n)]
+    dist, dur = matrices_distancia_duracion(coords, vel_kmh=30)
+    ventanas = [(SHIFT_START, 17 * 3600)]
+    for _ in range(n - 1):
+        if rnd.random() < 0.3:
+            ini = rnd.randrange(9 * 3600, 15 * 3600, 1800)
+            ventanas.append((ini, ini + 3600))
+        else:
+            ventanas.append((SHIFT_START, 17 * 3600))
+    return {
+        "distance_matrix": dist.tolist(),
+        "duration_matrix": dur.tolist(),
+        "time_windows": ventanas,
+        "service_times": [0] + [180] * (n - 1),
+        "depot": 0,
+    }
+
+
+def _insercion_recorriendo(data):
+    """Semilla anterior: por cada parada y posición recalcula la hora desde el depósito."""
+    D, windows, service = data["distance_matrix"], data["time_windows"], data["service_times"]
+    visitados = [0]
+    restantes = set(range(1, len(D)))
+    while restantes:
+        best_cost, best_j, best_pos = float("inf"), None, None
+        for j in restantes:
+            for pos in range(1, len(visitados) + 1):
+                a = visitados[pos - 1]
+                b = visitados[pos] if pos < len(visitados) else None
+                t_acc = SHIFT_START
+                for idx, node in enumerate(visitados[:pos]):
+                    if idx > 0:
+                        prev = visitados[idx - 1]
+                        t_acc += service[prev]
+                        t_acc += tiempo_viaje(data, prev, node, t_acc)
+                t_arr0 = t_acc + service[a] + tiempo_viaje(data, a, j, t_acc + service[a])
+                ini, fin = windows[j]
+                wait_time, t_arr = (ini - t_arr0, ini) if t_arr0 < ini else (0, t_arr0)
+                if t_arr > fin + ALLOWED_LATE:
+                    continue
+                score = t_arr + D[a][j] + min(wait_time, MAX_WAIT) * WAIT_WEIGHT
+                if b is not None:
+                    score += D[j][b] - D[a][b]
+                if score < best_cost:
+                    best_cost, best_j, best_pos = score, j, pos
+        if best_j is None:
+            break
+        visitados.insert(best_pos, best_j)
+        restantes.remove(best_j)
+    return visitados
+
+
+def _tardias(ruta, data):
+    """Paradas a las que la ruta llega después de su fin + ALLOWED_LATE."""
+    T, windows, service = data["duration_matrix"], data["time_windows"], data["service_times"]
+    eta, tardias = SHIFT_START, 0
+    for prev, cur in zip(ruta, ruta[1:]):
+        eta = max(eta + service[prev] + T[prev][cur], windows[cur][0])
+        tardias += eta > windows[cur][1] + ALLOWED_LATE
+    return tardias
+
+
+def _modelo_mtz(data, service):
+    """Modelo anterior: Bool por cada arco (los largos fijados a 0), grados y MTZ; tiempo en todos los arcos."""
+    D, T, windows = data["distance_matrix"], data["duration_matrix"], data["time_windows"]
+    n = len(D)
+    model = cp_model.CpModel()
+    x = {}
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                x[i, j] = model.NewBoolVar(f"x_{i}_{j}")
+                if T[i][j] > MAX_TRAVEL:
+                    model.Add(x[i, j] == 0)
+    t = [model.NewIntVar(0, SHIFT_END + ALLOWED_LATE, f"t_{i}") for i in range(n)]
+    u = [model.NewIntVar(0, n - 1, f"u_{i}") for i in range(n)]
+    for j in range(n):
+        model.Add(sum(x[i, j] for i in range(n) if i != j) == 1)
+        model.Add(sum(x[j, i] for i in range(n) if i != j) == 1)
+    model.Add(t[0] == SHIFT_START)
+    for i, (ini, fin) in enumerate(windows):
+        model.Add(t[i] >= ini)
+        model.Add(t[i] <= fin + ALLOWED_LATE)
+    for (i, j), b in x.items():
+        model.Add(t[j] >= t[i] + service[i] + T[i][j]).OnlyEnforceIf(b)
+    model.Add(u[0] == 0)
+    for (i, j), b in x.items():
+        if i and j:
+            model.Add(u[i] + 1 <= u[j] + (n - 1) * (1 - b))
+    model.Minimize(sum(D[i][j] * b for (i, j), b in x.items()) + WAIT_WEIGHT * sum(t))
+    return model, x
+
+
+def _modelos():
+    print(f"\n{'n':>4} | {'modelo':<18} {'ms':>8} {'literales':>9} {'proto KB':>9} {'estado':>11} {'s':>6} {'brecha %':>9}")
+    for n in (30, 45, 60):
+        data = _instancia(n)
+        for nombre, fn in (("MTZ (antes)", _modelo_mtz), ("circuito (ahora)", _modelo_circuito)):
+            t = time.perf_counter()
+            model, x = fn(data, data["service_times"])[:2]
+            ms = (time.perf_counter() - t) * 1000
+            kb = model.Proto().ByteSize() / 1024
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = LIMITE_SEG
+            estado = solver.Solve(model)
+            brecha = "-"
+            if estado in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                obj, cota = solver.ObjectiveValue(), solver.BestObjectiveBound()
+                brecha = f"{100 * (obj - cota) / obj:.1f}"
+            print(f"{n:>4} | {nombre:<18} {ms:>8.1f} {len(x):>9} {kb:>9.1f} {solver.StatusName(estado):>11} "
+                  f"{solver.WallTime():>6.1f} {brecha:>9}")
+
+
+def main():
+    print(f"{'n':>4} | {'semilla':<22} {'ms':>9} {'paradas':>8} {'tardías':>8} {'objetivo':>14}")
+    for n in (30, 60, 90):
+        data = _instancia(n)
+        D, T = data["distance_matrix"], data["duration_matrix"]
+        variantes = [
+            ("recorriendo (antes)", _insercion_recorriendo),
+            ("más barata", lambda d: _semilla_insercion(d, regret_k=1)),
+            (f"regret-{REGRET_K}", lambda d: _semilla_insercion(d, regret_k=REGRET_K)),
+        ]
+        for nombre, fn in variantes:
+            t = time.perf_counter()
+            ruta = fn(data)
+            ms = (time.perf_counter() - t) * 1000
+            costo = _costo_hint(ruta, D, T, data["time_windows"], data["service_times"])
+            print(f"{n:>4} | {nombre:<22} {ms:>9.1f} {len(ruta) - 1:>8} {_tardias(ruta, data):>8} {costo:>14.0f}")
+    _modelos()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# scripts/bench_cw_tabu.py
+# Benchmark de CW + Tabu:
+#   - uniones CW: factibilidad recorriendo la ruta unida (antes) vs. prefijo + sufijo de
+#     algorithms.holguras (ahora, O(1));
+#   - Tabu sobre una ruta: descenso por intercambios recorriendo cada candidato (antes) vs.
+#     algorithms.busqueda_tabu (2-opt, Or-opt, relocate, cross-exchange granulares); tiempo y km;
+#   - corrida completa de optimizar_ruta_cw_tabu (tiempo y km);
+#   - construcción CW con 500 a 2000 paradas: todos los ahorros O(n²) ordenados (antes) vs.
+#     k vecinos y heap perezoso (_clarke_wright); tiempo, subrutas y km.
+# Instancias de 100, 200 y 300 paradas con ventanas mixtas y un solo vehículo.
+# Uso:  python scripts/bench_cw_tabu.py
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.geodesia import matrices_distancia_duracion
+from algorithms.algoritmo2 import (optimizar_ruta_cw_tabu, _check_feasible_and_time, _clarke_wright,
+                                   _route_distance, _ruta_citas_primero, _svc)
+from algorithms.busqueda_tabu import BusquedaTabu
+from algorithms.holguras import Holguras
+
+# Centro aproximado de Arequipa
+LAT0, LON0 = -16.409, -71.537
+T0, T_FIN = 8 * 3600 + 30 * 60, 23 * 3600
+UNIONES = 20_000
+
+
+def _instancia(n, semilla=0):
+    """Depósito + (n-1) paradas: 70 % sin hora, 30 % con ventana de 2 h; servicio corto."""
+    rnd = random.Random(semilla)
+    coords = [(LAT0 + rnd.uniform(-0.04, 0.04), LON0 + rnd.uniform(-0.04, 0.04)) for _ in range(n)]
+    dist, dur = matrices_distancia_duracion(coords, vel_kmh=30)
+    ventanas = [(T0, T_FIN)]
+    for _ in range(n - 1):
+        if rnd.random() < 0.3:
+            ini = rnd.randrange(9 * 3600, 18 * 3600, 1800)
+            ventanas.append((ini, ini + 2 * 3600))
+        else:
+            ventanas.append((T0, 20 * 3600))
+    return {
+        "distance_matrix": dist.tolist(),
+        "duration_matrix": dur.tolist(),
+        "time_windows": ventanas,
+        "demands": [0] + [1] * (n - 1),
+        "num_vehicles": 1,
+        "vehicle_capacities": [n],
+        "vehicle_shifts": [(T0, T_FIN)],
+        "starts": [0],
+        "ends": [0],
+        "depot": 0,
+        "service_times": [0] + [120] * (n - 1),
+        "neighbors": None,
+        "initial_routes": None,
+    }
+
+
+def _factible(data):
+    def f(rt):
+        feas, arr = _check_feasible_and_time(rt, data, t0=T0)
+        return feas and arr[-1] <= T_FIN
+    return f
+
+
+def _uniones(data, holg, ruta, semilla=1):
+    """UNIONES chequeos prefijo(0..i) + sufijo(j..fin) de la misma ruta base. Retorna (s_antes, s_ahora, iguales)."""
+    rnd = random.Random(semilla)
+    cortes = [tuple(sorted(rnd.sample(range(1, len(ruta) - 1), 2))) for _ in range(UNIONES)]
+    factible = _factible(data)
+
+    t = time.perf_counter()
+    antes = [factible(ruta[:i + 1] + ruta[j:]) for i, j in cortes]
+    s_antes = time.perf_counter() - t
+
+    t = time.perf_counter()
+    pref, suf = holg.prefijos(ruta), holg.sufijos(ruta)
+    ahora = [holg.unir(pref[i], suf[j]).retraso == 0 for i, j in cortes]
+    s_ahora = time.perf_counter() - t
+    return s_antes, s_ahora, antes == ahora
+
+
+def _intercambio_recorriendo(ruta, data, factible):
+    """Bucle Tabu anterior: copia, recorrido completo y distancia total por candidato."""
+    dist = _route_distance(ruta, data)
+    L = len(ruta)
+    for a in range(1, L - 2):
+        for b in range(a + 1, L - 1):
+            cand = ruta[:]
+            cand[a], cand[b] = cand[b], cand[a]
+            if not factible(cand):
+                continue
+            if _route_distance(cand, data) < dist - 1e-6:
+                return cand, None, (a, b)
+    return None
+
+
+def _descenso(data, ruta):
+    """Intercambios de primera mejora hasta óptimo local. Retorna (segundos, km)."""
+    factible = _factible(data)
+    t = time.perf_counter()
+    while True:
+        mov = _intercambio_recorriendo(ruta, data, factible)
+        if mov is None:
+            break
+        ruta = mov[0]
+    return time.perf_counter() - t, _route_distance(ruta, data) / 1000
+
+
+def _tabu(data, holg, ruta):
+    """BusquedaTabu sobre la misma ruta. Retorna (segundos, km)."""
+    t = time.perf_counter()
+    _, dist = BusquedaTabu(data, [ruta], [holg]).buscar(time.time() + 600)
+    return time.perf_counter() - t, dist / 1000
+
+
+def _cw_todos(data, nodos, holg):
+    """Construcción CW anterior: todos los pares i<j ordenados y prefijos/sufijos por ruta unida."""
+    D, depot = data["distance_matrix"], data["depot"]
+    ahorros = sorted(((D[depot][i] + D[depot][j] - D[i][j], i, j) for i in nodos for j in nodos if i < j),
+                     reverse=True)
+    padre = {i: i for i in nodos}
+    inicio, fin = dict(padre), dict(padre)
+    rutas = {i: [depot, i, depot] for i in nodos}
+    pref = {i: holg.prefijos(rutas[i]) for i in nodos}
+    suf = {i: holg.sufijos(rutas[i]) for i in nodos}
+
+    def raiz(i):
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    for _, i, j in ahorros:
+        ri, rj = raiz(i), raiz(j)
+        if ri == rj or fin[ri] != i or inicio[rj] != j:
+            continue
+        if holg.unir(pref[ri][-2], suf[rj][1]).retraso:
+            continue
+        unida = rutas[ri][:-1] + rutas[rj][1:]
+        pref[ri], suf[ri] = holg.prefijos(unida), holg.sufijos(unida)
+        padre[rj], fin[ri], rutas[ri] = ri, fin[rj], unida
+    return [rutas[r] for r in {raiz(i) for i in nodos}]
+
+
+def _construccion():
+    print(f"\n{'n':>5} {'CW antes (s)':>12} {'subrutas':>8} {'km':>7} | {'ahora (s)':>9} {'subrutas':>8} {'km':>7}")
+    for n in (500, 1000, 2000):
+        data = _instancia(n)
+        holg = Holguras(data, T0, T_FIN, [_svc(data, u) for u in range(n)])
+        nodos = list(range(1, n))
+        km = lambda rs: sum(_route_distance(r, data) for r in rs) / 1000
+        t = time.perf_counter()
+        antes = _cw_todos(data, nodos, holg)
+        s_antes = time.perf_counter() - t
+        t = time.perf_counter()
+        ahora = _clarke_wright(data, nodos, holg, None)
+        s_ahora = time.perf_counter() - t
+        print(f"{n:>5} {s_antes:>12.2f} {len(antes):>8} {km(antes):>7.1f} | "
+              f"{s_ahora:>9.2f} {len(ahora):>8} {km(ahora):>7.1f}")
+
+
+def main():
+    print(f"{'n':>5} {'uniones antes':>14} {'ahora':>8} {'x':>6} | {'swaps (s)':>9} {'km':>6} | "
+          f"{'tabu (s)':>8} {'km':>6} | {'cw_tabu (s)':>11} {'km':>6}")
+    for n in (100, 200, 300):
+        data = _instancia(n)
+        holg = Holguras(data, T0, T_FIN, [_svc(data, u) for u in range(n)])
+        paradas, _, _ = _ruta_citas_primero(list(range(1, n)), data, 0, T0, regreso=(0, T_FIN), forzar=False)
+        ruta = paradas + [0]
+
+        u_antes, u_ahora, iguales = _uniones(data, holg, ruta)
+        assert iguales, "los dos modos deben coincidir"
+        s_swaps, km_swaps = _descenso(data, ruta)
+        s_tabu, km_tabu = _tabu(data, holg, ruta)
+
+        t = time.perf_counter()
+        res = optimizar_ruta_cw_tabu(data, tiempo_max_seg=45)
+        total = time.perf_counter() - t
+        print(f"{n:>5} {u_antes:>14.3f} {u_ahora:>8.3f} {u_antes / u_ahora:>5.1f}x | {s_swaps:>9.2f} {km_swaps:>6.1f} | "
+              f"{s_tabu:>8.2f} {km_tabu:>6.1f} | {total:>11.2f} {res['distance_total_m'] / 1000:>6.1f}")
+    _construccion()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# scripts/bench_geodesia.py
+# Micro-benchmark: matrices Haversine con bucles Python vs. core.geodesia (NumPy).
+# Uso:  python scripts/bench_geodesia.py
+
+import os
+import sys
+import math
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.geodesia import matrices_distancia_duracion
+
+# Centro aproximado de Arequipa
+LAT0, LON0 = -16.409, -71.537
+
+
+def _referencia_bucles(coords, vel_kmh=40.0):
+    """Implementación original (doble bucle con math.*) usada como línea base."""
+    R = 6371e3
+    n = len(coords)
+    dist = [[0]*n for _ in range(n)]
+    dur  = [[0]*n for _ in range(n)]
+    v_ms = vel_kmh * 1000 / 3600
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            lat1, lon1 = map(math.radians, coords[i])
+            lat2, lon2 = map(math.radians, coords[j])
+            dlat = lat2 - lat1
+            dlon = lon2 - lon1
+            a = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
+            d = 2 * R * math.asin(math.sqrt(a))
+            dist[i][j] = int(d)
+            dur[i][j]  = int(d / v_ms)
+    return dist, dur
+
+
+def _coords_aleatorias(n, semilla=0):
+    rnd = random.Random(semilla)
+    return [(LAT0 + rnd.uniform(-0.06, 0.06), LON0 + rnd.uniform(-0.06, 0.06)) for _ in range(n)]
+
+
+def _medir(fn, *args, repeticiones=3):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn(*args)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def main():
+    print(f"{'n':>6} {'bucles (s)':>12} {'numpy (s)':>12} {'speedup':>9} {'máx |Δd| (m)':>14}")
+    for n in (50, 200, 1000):
+        coords = _coords_aleatorias(n)
+        rep = 1 if n >= 1000 else 3
+        t_ref = _medir(_referencia_bucles, coords, repeticiones=rep)
+        t_np = _medir(matrices_distancia_duracion, coords)
+
+        d_ref, _ = _referencia_bucles(coords)
+        d_np, _ = matrices_distancia_duracion(coords)
+        err = max(abs(d_ref[i][j] - int(d_np[i, j])) for i in range(n) for j in range(n))
+
+        print(f"{n:>6} {t_ref:>12.4f} {t_np:>12.4f} {t_ref / t_np:>8.1f}x {err:>14}")
+
+
+if __name__ == "__main__":
+    main()
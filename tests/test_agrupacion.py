@@ -0,0 +1,66 @@
+# tests/test_agrupacion.py
+# algorithms.algoritmo1: clusters partidos por ventanas de tiempo (agrupar_puntos_radio).
+# algoritmo1 abre Firestore al importarse: sin credenciales el módulo se salta.
+# Uso:  python -m pytest -q tests
+
+import itertools
+import os
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from algorithms.algoritmo1 import _dividir_por_ventanas, agrupar_puntos_radio
+except Exception as e:   # sin Firestore / secrets
+    pytest.skip(f"algoritmo1 no se puede importar: {e}", allow_module_level=True)
+
+
+def _minimo_de_grupos(ini, fin):
+    """Fuerza bruta: menor número de instantes que caen dentro de todas las ventanas."""
+    for k in range(1, len(ini) + 1):
+        for puntos in itertools.combinations(sorted(set(fin)), k):
+            if all(any(a <= p <= b for p in puntos) for a, b in zip(ini, fin)):
+                return k
+
+
+def test_grupos_con_ventanas_que_se_intersectan_y_minimos():
+    rnd = random.Random(5)
+    for _ in range(200):
+        n = rnd.randint(1, 7)
+        ini = np.array([rnd.randrange(8, 16) * 1800 for _ in range(n)], dtype=np.int64)
+        fin = ini + np.array([rnd.choice((1800, 3600, 7200)) for _ in range(n)], dtype=np.int64)
+        labels = np.array([rnd.randrange(2) for _ in range(n)])
+        nuevas = _dividir_por_ventanas(ini, fin, labels)
+        for g in set(nuevas.tolist()):
+            miembros = np.flatnonzero(nuevas == g)
+            assert len(set(labels[miembros].tolist())) == 1
+            assert ini[miembros].max() <= fin[miembros].min()
+        for c in set(labels.tolist()):
+            de_c = labels == c
+            assert len(set(nuevas[de_c].tolist())) == _minimo_de_grupos(ini[de_c], fin[de_c])
+
+
+def _pedidos(horas):
+    return pd.DataFrame({
+        "lat": [-16.41] * len(horas), "lon": [-71.50] * len(horas),
+        "time_start": [a for a, _ in horas], "time_end": [b for _, b in horas],
+        "nombre_cliente": [f"c{i}" for i in range(len(horas))], "direccion": ["x"] * len(horas),
+        "demand": [1] * len(horas),
+    })
+
+
+def test_mismo_punto_con_ventanas_disjuntas_da_dos_clusters():
+    clusters, etiquetado = agrupar_puntos_radio(_pedidos([("09:00", "10:00"), ("09:30", "11:00"), ("15:00", "16:00")]))
+    assert len(clusters) == 2
+    assert etiquetado["cluster"].iloc[0] == etiquetado["cluster"].iloc[1] != etiquetado["cluster"].iloc[2]
+    assert (clusters["ini_seg"] <= clusters["fin_seg"]).all()
+
+
+def test_ventana_invertida_se_reporta_con_su_cluster():
+    with pytest.raises(ValueError, match="cluster_0"):
+        agrupar_puntos_radio(_pedidos([("12:00", "09:00")]))
@@ -0,0 +1,67 @@
+# tests/test_ahorros.py
+# algorithms.algoritmo2: ahorros perezosos de Clarke–Wright frente a la lista completa.
+# Uso:  python -m pytest -q tests
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.algoritmo2 import _ahorros_perezosos
+
+
+def _data(n, semilla):
+    rnd = random.Random(semilla)
+    D = [[0 if i == j else rnd.randrange(100, 5000) for j in range(n)] for i in range(n)]
+    return {"distance_matrix": D, "depot": 0}
+
+
+def _lista_completa(data, clientes):
+    D, dep = data["distance_matrix"], data["depot"]
+    return {(i, j): D[i][dep] + D[dep][j] - D[i][j] for i in clientes for j in clientes if i != j}
+
+
+def test_con_todos_los_vecinos_es_la_lista_completa_ordenada():
+    for semilla in range(5):
+        data = _data(15, semilla)
+        clientes = list(range(1, 15))
+        completa = _lista_completa(data, clientes)
+        generados = list(_ahorros_perezosos(data, clientes, lambda u: True, k=len(clientes)))
+        # Cada par sale dos veces: en la lista de i (sale) y en la de j (entra)
+        assert len(generados) == 2 * len(completa)
+        assert {(i, j) for _, i, j in generados} == set(completa)
+        assert all(a == completa[(i, j)] for a, i, j in generados)
+        ahorros = [a for a, _, _ in generados]
+        assert ahorros == sorted(ahorros, reverse=True)
+
+
+def test_con_k_vecinos_da_los_pares_cercanos_en_orden():
+    data, k = _data(30, 11), 4
+    D = data["distance_matrix"]
+    clientes = list(range(1, 30))
+    completa = _lista_completa(data, clientes)
+    generados = list(_ahorros_perezosos(data, clientes, lambda u: True, k=k))
+    pares = {(i, j) for _, i, j in generados}
+    for u in clientes:
+        cerca = sorted((min(D[u][v], D[v][u]), v) for v in clientes if v != u)
+        for _, v in cerca[:k]:
+            assert (u, v) in pares and (v, u) in pares
+    assert all(a == completa[(i, j)] for a, i, j in generados)
+    ahorros = [a for a, _, _ in generados]
+    assert ahorros == sorted(ahorros, reverse=True)
+
+
+def test_un_cliente_interior_no_aporta_su_lista():
+    data = _data(12, 3)
+    clientes = list(range(1, 12))
+    completa = _lista_completa(data, clientes)
+    generados = list(_ahorros_perezosos(data, clientes, lambda u: u != 5, k=len(clientes)))
+    # Los pares con 5 salen una sola vez (desde la lista del otro cliente); el resto, dos
+    veces = {}
+    for _, i, j in generados:
+        veces[(i, j)] = veces.get((i, j), 0) + 1
+    assert set(veces) == set(completa)
+    assert all(c == (1 if 5 in par else 2) for par, c in veces.items())
+    ahorros = [a for a, _, _ in generados]
+    assert ahorros == sorted(ahorros, reverse=True)
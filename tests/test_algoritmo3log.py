@@ -0,0 +1,73 @@
+# tests/test_algoritmo3log.py
+# algorithms.algoritmo3log: el respaldo por inserción cierra la ruta en la base de fin del vehículo
+# y la semilla actualiza llegadas / holguras igual que el recálculo completo.
+# Uso:  python -m pytest -q tests
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.geodesia import matrices_distancia_duracion
+from algorithms.algoritmo3log import (_fallback_insertion, _insertar_en_tiempos, _tiempos_ruta,
+                                      optimizar_ruta_cp_sat)
+
+
+def _data(n_paradas=6, inicio=0, fin=0):
+    """Nodos 0 y 1 sin ventana (bases si son inicio/fin) + paradas con ventanas de una hora desde las 09:00."""
+    coords = [(-16.41, -71.52), (-16.40, -71.44)] + [
+        (-16.40 + 0.003 * k, -71.53 + 0.002 * k) for k in range(n_paradas)
+    ]
+    dist, dur = matrices_distancia_duracion(coords, vel_kmh=30)
+    return {
+        "distance_matrix": dist.tolist(),
+        "duration_matrix": dur.tolist(),
+        "time_windows": [(0, 86400)] * 2 + [(9 * 3600 + 600 * k, 10 * 3600 + 600 * k) for k in range(n_paradas)],
+        "service_times": [0, 0] + [300] * n_paradas,
+        "demands": [0] * len(coords),
+        "num_vehicles": 1,
+        "vehicle_capacities": [10**9],
+        "vehicle_shifts": [(8 * 3600, 17 * 3600)],
+        "starts": [inicio],
+        "ends": [fin],
+        "depot": 0,
+    }
+
+
+def _verificar(data, r, inicio, fin):
+    assert r["route"][0] == inicio
+    assert r["end_node"] == fin
+    assert sorted(r["route"][1:]) == sorted(set(range(len(data["time_windows"]))) - {inicio, fin})
+    assert r["end_sec"] >= r["arrival_sec"][-1]
+
+
+def test_respaldo_cierra_en_la_base_de_fin():
+    for inicio, fin in ((0, 0), (0, 1)):
+        data = _data(inicio=inicio, fin=fin)
+        _verificar(data, _fallback_insertion(data)["routes"][0], inicio, fin)
+
+
+def test_cp_sat_sale_de_su_base_a_la_hora_del_turno():
+    data = _data(inicio=0, fin=1)
+    r = optimizar_ruta_cp_sat(data, tiempo_max_seg=5)["routes"][0]
+    _verificar(data, r, 0, 1)
+    assert r["arrival_sec"][0] == 8 * 3600
+
+
+def test_insercion_actualiza_tiempos_como_el_recalculo_completo():
+    rnd = random.Random(3)
+    n = 25
+    T = [[0 if i == j else rnd.randrange(60, 1800) for j in range(n)] for i in range(n)]
+    windows = [(0, 86400)] + [(rnd.randrange(8, 14) * 3600, 0) for _ in range(n - 1)]
+    windows = [(a, b or a + rnd.choice((1800, 3600, 8 * 3600))) for a, b in windows]
+    service = [0] + [rnd.randrange(0, 600) for _ in range(n - 1)]
+    regreso = (0, 18 * 3600)
+    for _ in range(20):
+        ruta = [0]
+        tiempos = _tiempos_ruta(ruta, T, windows, service, 8 * 3600, regreso)
+        for j in rnd.sample(range(1, n), n - 1):
+            pos = rnd.randrange(1, len(ruta) + 1)
+            ruta.insert(pos, j)
+            _insertar_en_tiempos(ruta, pos, tiempos, T, windows, service, regreso)
+            assert list(tiempos) == list(_tiempos_ruta(ruta, T, windows, service, 8 * 3600, regreso))
@@ -0,0 +1,26 @@
+# tests/test_busqueda_tabu.py
+# algorithms.busqueda_tabu: vecindario relocate / Or-opt en ambos sentidos.
+# Uso:  python -m pytest -q tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.busqueda_tabu import BusquedaTabu, MOVER
+
+
+def _tabu():
+    """Dos rutas desde el depósito 0 sobre una recta: distancia = |i - j|."""
+    n = 9
+    data = {"distance_matrix": [[abs(i - j) for j in range(n)] for i in range(n)], "demands": [0] * n}
+    return BusquedaTabu(data, [[0, 1, 2, 3, 4, 0], [0, 5, 6, 7, 8, 0]], [None, None])
+
+
+def test_relocate_de_una_parada_antes_y_despues_de_la_cercana():
+    tabu = _tabu()
+    movs = [m for m in tabu._movimientos() if m[1] == MOVER]
+    # Parada 4 (ruta 0, posición 4) junto a su cercana 5 (ruta 1, posición 1)
+    uno = {(m[5], m[6]) for m in movs if m[2:5] == (0, 4, 4)}
+    assert (1, 1) in uno   # después de 5: arco 5 -> 4
+    assert (1, 0) in uno   # antes de 5: arco 4 -> 5
@@ -0,0 +1,60 @@
+# tests/test_descomposicion.py
+# algorithms.descomposicion: modo sectores con más sectores que vehículos.
+# Uso:  python -m pytest -q tests
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.geodesia import matrices_distancia_duracion
+from algorithms.algoritmo2 import optimizar_ruta_cw_tabu
+from algorithms.descomposicion import optimizar_ruta_sectores, repartir_turnos, repartir_vehiculos
+from algorithms.flota import PLANTA
+
+
+def _data(n_paradas=60, vehiculos=1, semilla=0):
+    """Planta + paradas en dos zonas, sin ventanas propias; turno de 08:00 a 19:00."""
+    rnd = random.Random(semilla)
+    coords = [(PLANTA["lat"], PLANTA["lon"])]
+    for c in range(n_paradas):
+        lat0, lon0 = (-16.38, -71.46) if c % 2 else (-16.42, -71.52)
+        coords.append((lat0 + rnd.uniform(-0.01, 0.01), lon0 + rnd.uniform(-0.01, 0.01)))
+    dist, dur = matrices_distancia_duracion(coords, vel_kmh=25)
+    n = len(coords)
+    return {
+        "distance_matrix": dist.tolist(),
+        "duration_matrix": dur.tolist(),
+        "time_windows": [(0, 86400)] + [(8 * 3600, 17 * 3600)] * n_paradas,
+        "service_times": [0] + [120] * n_paradas,
+        "demands": [0] * n,
+        "num_vehicles": vehiculos,
+        "vehicle_capacities": [10**9] * vehiculos,
+        "vehicle_shifts": [(8 * 3600, 19 * 3600)] * vehiculos,
+        "starts": [0] * vehiculos,
+        "ends": [0] * vehiculos,
+        "depot": 0,
+        "coords": coords,
+    }
+
+
+def test_sectores_consecutivos_comparten_vehiculo_y_reparten_el_turno():
+    vehiculos = repartir_vehiculos([20, 20, 20, 20], 2)
+    assert vehiculos == [[0], [0], [1], [1]]
+    turnos = repartir_turnos(_data(vehiculos=2), [10, 30, 20, 20], vehiculos)
+    assert turnos[0] == [(8 * 3600, 8 * 3600 + 11 * 3600 // 4)]
+    assert turnos[1][0][0] == turnos[0][0][1] and turnos[1][0][1] == 19 * 3600
+    assert turnos[2][0][0] == 8 * 3600
+
+
+def test_cada_parada_se_visita_una_vez():
+    data = _data()
+    res = optimizar_ruta_sectores(data, tiempo_max_seg=4, tamano_sector=20, motor=optimizar_ruta_cw_tabu,
+                                  max_procesos=2)
+    assert len(res["sectores"]) == 3
+    assert len(res["routes"]) == 1
+    ruta = res["routes"][0]["route"]
+    assert ruta[0] == 0 and res["routes"][0]["end_node"] == 0
+    visitadas = ruta[1:] + res["clientes_excluidos"]
+    assert sorted(visitadas) == list(range(1, len(data["time_windows"])))
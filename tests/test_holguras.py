@@ -0,0 +1,56 @@
+# tests/test_holguras.py
+# algorithms.holguras: la factibilidad por segmentos coincide con recorrer la ruta.
+# Uso:  python -m pytest -q tests
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithms.holguras import Holguras
+
+T0, T_FIN = 8 * 3600, 17 * 3600
+
+
+def _instancia(rnd, n=12):
+    T = [[0 if i == j else rnd.randrange(300, 2400) for j in range(n)] for i in range(n)]
+    W = [(0, 86400)]
+    for _ in range(n - 1):
+        a = rnd.randrange(8 * 3600, 15 * 3600, 900)
+        W.append((a, a + rnd.choice((1800, 3600, 4 * 3600))))
+    svc = [0] + [rnd.randrange(0, 900) for _ in range(n - 1)]
+    return {"duration_matrix": T, "time_windows": W}, svc
+
+
+def _recorrer(ruta, data, svc):
+    """Sale de ruta[0] a T0, espera si llega antes de la ventana; None si llega tarde a algún nodo."""
+    T, W = data["duration_matrix"], data["time_windows"]
+    t = T0
+    for u, v in zip(ruta, ruta[1:]):
+        t += svc[u] + T[u][v]
+        if t > W[v][1]:
+            return None
+        t = max(t, W[v][0])
+    return t if t <= T_FIN else None
+
+
+def test_segmentos_coinciden_con_recorrer_la_ruta():
+    rnd = random.Random(7)
+    factibles = infactibles = 0
+    for _ in range(300):
+        data, svc = _instancia(rnd)
+        holg = Holguras(data, T0, T_FIN, svc)
+        ruta = [0] + rnd.sample(range(1, 12), rnd.randint(1, 5)) + [0]
+        fin = _recorrer(ruta, data, svc)
+        pref, suf = holg.prefijos(ruta), holg.sufijos(ruta)
+        # Ruta completa, y unida en cada corte prefijo + sufijo
+        for seg in [pref[-1]] + [holg.unir(pref[k], suf[k + 1]) for k in range(len(ruta) - 1)]:
+            assert (seg.retraso == 0) == (fin is not None)
+            if fin is not None:
+                assert T0 + seg.duracion == fin
+        if fin is None:
+            infactibles += 1
+        else:
+            factibles += 1
+    assert factibles > 30 and infactibles > 30
@@ -0,0 +1,100 @@
+# tests/test_matriz_google.py
+# core.matriz_google con un cliente falso: teselas, limitador y reintentos.
+# Uso:  python -m pytest -q tests
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+from googlemaps import exceptions as gexc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.matriz_google import (LimitadorTokens, descargar_matriz, dividir_en_teselas,
+                                MAX_ELEMENTOS, MAX_ORIGENES, MAX_DESTINOS)
+
+
+class ClienteFalso:
+    """Responde distancia = 1000·origen + destino y duración = distancia // 10.
+    'fallos' es una lista de excepciones que se lanzan (una por llamada) antes de responder."""
+
+    def __init__(self, fallos=()):
+        self.fallos = list(fallos)
+        self.llamadas = []
+        self._lock = threading.Lock()
+
+    def distance_matrix(self, origins, destinations, **kwargs):
+        with self._lock:
+            self.llamadas.append((len(origins), len(destinations)))
+            if self.fallos:
+                raise self.fallos.pop(0)
+        return {"rows": [
+            {"elements": [
+                {"distance": {"value": 1000 * o + d}, "duration": {"value": (1000 * o + d) // 10}}
+                for d in destinations
+            ]}
+            for o in origins
+        ]}
+
+
+def test_teselas_respetan_limites_y_cubren_todo():
+    for n_orig, n_dest in ((1, 1), (7, 300), (30, 30), (101, 3)):
+        celdas = set()
+        for i0, i1, j0, j1 in dividir_en_teselas(n_orig, n_dest):
+            assert i1 - i0 <= MAX_ORIGENES and j1 - j0 <= MAX_DESTINOS
+            assert (i1 - i0) * (j1 - j0) <= MAX_ELEMENTOS
+            for i in range(i0, i1):
+                for j in range(j0, j1):
+                    assert (i, j) not in celdas
+                    celdas.add((i, j))
+        assert len(celdas) == n_orig * n_dest
+
+
+def test_descarga_concurrente_escribe_cada_celda():
+    origenes, destinos = list(range(37)), list(range(41))
+    cliente = ClienteFalso()
+    dist, dur = descargar_matriz(cliente, origenes, destinos, hilos=4,
+                                 limitador=LimitadorTokens(tasa=1e6))
+    assert len(cliente.llamadas) == len(dividir_en_teselas(37, 41))
+    for o in origenes:
+        for d in destinos:
+            assert dist[o, d] == 1000 * o + d
+            assert dur[o, d] == (1000 * o + d) // 10
+
+
+def test_limitador_acota_la_tasa():
+    # 400 elementos a 1000/s con ráfaga de 100: al menos 0,3 s
+    cliente = ClienteFalso()
+    t = time.monotonic()
+    descargar_matriz(cliente, list(range(20)), list(range(20)), hilos=4,
+                     limitador=LimitadorTokens(tasa=1000, capacidad=100))
+    assert time.monotonic() - t >= 0.28
+
+
+@pytest.mark.parametrize("fallo", [
+    gexc.ApiError("OVER_QUERY_LIMIT"),
+    gexc.ApiError("UNKNOWN_ERROR"),
+    gexc.TransportError("conexión reiniciada"),
+    gexc.Timeout(),
+])
+def test_reintenta_errores_transitorios(fallo):
+    cliente = ClienteFalso(fallos=[fallo, fallo])
+    dist, _ = descargar_matriz(cliente, [1], [2], reintentos=3, backoff=0)
+    assert dist[0, 0] == 1002
+    assert len(cliente.llamadas) == 3
+
+
+def test_no_reintenta_errores_de_la_peticion():
+    cliente = ClienteFalso(fallos=[gexc.ApiError("INVALID_REQUEST")])
+    with pytest.raises(gexc.ApiError):
+        descargar_matriz(cliente, [1], [2], reintentos=3, backoff=0)
+    assert len(cliente.llamadas) == 1
+
+
+def test_agota_reintentos_y_propaga():
+    cliente = ClienteFalso(fallos=[gexc.ApiError("OVER_QUERY_LIMIT")] * 5)
+    with pytest.raises(gexc.ApiError):
+        descargar_matriz(cliente, [1], [2], reintentos=2, backoff=0)
+    assert len(cliente.llamadas) == 3
@@ -0,0 +1,47 @@
+# tests/test_sitios.py
+# core.sitios: pedidos del mismo sitio comparten nodo y el resultado se expande a cada pedido.
+# Uso:  python -m pytest -q tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.sitios import ajustar_por_radio, expandir_resultado, nodos_por_sitio
+
+
+def test_pedidos_del_mismo_sitio_con_ventanas_compatibles_comparten_nodo():
+    # Fila 0: depósito; 1 y 2 a ~1 m; 3 en el mismo sitio pero sin solape; 4 lejos
+    coords = [(-16.40, -71.52), (-16.41, -71.50), (-16.410005, -71.500005), (-16.41, -71.50), (-16.45, -71.55)]
+    ventanas = [(0, 86400), (9 * 3600, 12 * 3600), (10 * 3600, 13 * 3600), (15 * 3600, 16 * 3600), (0, 86400)]
+    sitios, sitio_por_fila = ajustar_por_radio(coords, radio_m=5.0)
+    assert len(sitios) == 3
+    assert sitio_por_fila[1] == sitio_por_fila[2] == sitio_por_fila[3]
+    nodo_de_fila, filas_por_nodo, ventanas_nodo = nodos_por_sitio(sitio_por_fila, ventanas, fijos=(0,))
+    assert list(nodo_de_fila) == [0, 1, 1, 2, 3]
+    assert [list(f) for f in filas_por_nodo] == [[0], [1, 2], [3], [4]]
+    assert ventanas_nodo[1] == (10 * 3600, 12 * 3600)
+
+
+def test_expandir_resultado_lleva_nodos_a_pedidos():
+    filas_por_nodo = [[0], [1, 2], [3], [4, 5]]
+    servicio = [0, 300, 120, 60, 200, 100]
+    res = {
+        "routes": [{"vehicle": 0, "route": [0, 1, 2], "arrival_sec": [28800, 30000, 31000],
+                    "end_node": 0, "end_sec": 32000}],
+        "clientes_excluidos": [3],
+        "violaciones": [{"node": 1, "exceso_seg": 60}],
+        "total_distance": 1234,
+    }
+    out = expandir_resultado(res, filas_por_nodo, servicio)
+    r = out["routes"][0]
+    assert r["route"] == [0, 1, 2, 3]
+    # El segundo pedido del nodo 1 llega cuando termina el servicio del primero
+    assert r["arrival_sec"] == [28800, 30000, 30300, 31000]
+    assert r["end_node"] == 0 and r["end_sec"] == 32000
+    assert out["clientes_excluidos"] == [4, 5]
+    assert out["violaciones"] == [{"node": 1, "exceso_seg": 60}, {"node": 2, "exceso_seg": 60}]
+    assert out["total_distance"] == 1234
+    # res no se modifica
+    assert res["routes"][0]["route"] == [0, 1, 2] and res["clientes_excluidos"] == [3]
+    assert expandir_resultado(None, filas_por_nodo, servicio) is None
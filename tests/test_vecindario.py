@@ -0,0 +1,77 @@
+# tests/test_vecindario.py
+# algorithms.vecindario: CSR de sucesores sin máscaras n×n y celdas a pedir a la matriz del día.
+# Uso:  python -m pytest -q tests
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.matriz_incremental import MatrizIncremental
+from algorithms.vecindario import arcos_a_pedir, construir_vecinos
+
+
+def _data(n=40, semilla=0):
+    rnd = np.random.default_rng(semilla)
+    T = rnd.integers(60, 3600, (n, n))
+    np.fill_diagonal(T, 0)
+    ini = rnd.integers(8 * 3600, 14 * 3600, n)
+    ventanas = [(0, 86400)] + [(int(a), int(a) + 3600) for a in ini[1:]]
+    return {"duration_matrix": T.tolist(), "time_windows": ventanas, "service_times": [0] + [300] * (n - 1),
+            "num_vehicles": 1, "starts": [0], "ends": [1], "depot": 0}
+
+
+def test_vecinos_como_la_definicion():
+    data, k = _data(), 5
+    T = np.asarray(data["duration_matrix"])
+    W = np.asarray(data["time_windows"])
+    n = len(T)
+    compatible = (W[:, 0] + np.asarray(data["service_times"]))[:, None] + T <= W[None, :, 1]
+    np.fill_diagonal(compatible, False)
+    costo = np.where(compatible, T, np.iinfo(np.int64).max)
+    esperado = [set() for _ in range(n)]
+    for i in range(n):
+        for j in np.argsort(costo[i], kind="stable")[:k]:
+            if compatible[i, j]:
+                esperado[i].add(int(j))
+        for j in np.argsort(costo[:, i], kind="stable")[:k]:
+            if compatible[j, i]:
+                esperado[int(j)].add(i)
+    for b in (0, 1):
+        for j in range(n):
+            if j != b:
+                esperado[b].add(j)
+                esperado[j].add(b)
+
+    vecinos = construir_vecinos(data, k)
+    for i in range(n):
+        suc = vecinos.sucesores(i).tolist()
+        assert set(suc) == esperado[i]
+        assert T[i, suc].tolist() == sorted(T[i, suc].tolist())
+
+
+def test_solo_se_piden_las_celdas_necesarias(tmp_path):
+    rnd = np.random.default_rng(1)
+    coords = rnd.uniform([-16.45, -71.56], [-16.35, -71.46], (80, 2))
+    pedidas = []
+
+    def bloque(orig, dest, salida):
+        pedidas.append(len(orig) * len(dest))
+        return np.ones((len(orig), len(dest)), np.int32), np.ones((len(orig), len(dest)), np.int32)
+
+    necesarias = arcos_a_pedir(coords, fijos={0}, k=6)
+    filas, cols = necesarias.pares()
+    assert not (filas == cols).any()
+    assert necesarias.contiene(0, 79) and necesarias.contiene(79, 0)
+
+    m = MatrizIncremental(bloque, prefijo=str(tmp_path / "m"))
+    ids = [str(i) for i in range(len(coords))]
+    _, _, conocidas = m.actualizar_arcos(ids, coords, (filas, cols))
+    assert conocidas[filas, cols].all()
+    assert conocidas.sum() < 0.5 * len(coords) ** 2
+    # Segunda vez: nada que pedir
+    antes = m.elementos_consultados
+    m.actualizar_arcos(ids, coords, (filas, cols))
+    assert m.elementos_consultados == antes